@@ -0,0 +1,129 @@
+"""
+access_token缓存层
+
+查询分两级：
+1. 进程内LRU（每个gunicorn worker一份），容量有限，条目TTL较短；
+2. settings.ACCESS_TOKEN_CACHE_ALIAS指定的共享缓存，所有worker读写同一份数据。
+
+不存在的token也会以TOKEN_NOT_FOUND写入两级缓存（负缓存），有效期较短，
+避免同一个无效token反复查库。token生成、轮换、删除时通过信号失效共享缓存和
+当前worker的进程内缓存；其他worker的进程内条目最多在LOCAL_CACHE_TTL秒后过期。
+命中/未命中次数按worker（进程）单独统计。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# token缓存过期时间（秒）
+TOKEN_CACHE_TIMEOUT = 600
+# 不存在的token在共享缓存中的过期时间（秒）
+NEGATIVE_CACHE_TIMEOUT = getattr(settings, 'ACCESS_TOKEN_NEGATIVE_CACHE_TIMEOUT', 30)
+# 进程内缓存容量和过期时间（秒），TTL决定其他worker看到token变更的最大延迟
+LOCAL_CACHE_MAX_ENTRIES = getattr(settings, 'ACCESS_TOKEN_LOCAL_CACHE_MAX_ENTRIES', 10000)
+LOCAL_CACHE_TTL = getattr(settings, 'ACCESS_TOKEN_LOCAL_CACHE_TTL', 10)
+
+# 负缓存标记，不会与合法的IP地址冲突
+TOKEN_NOT_FOUND = '__token_not_found__'
+
+stats_lock = threading.Lock()
+cache_stats = {'local_hits': 0, 'hits': 0, 'misses': 0, 'negative_hits': 0, 'invalidations': 0}
+
+local_lock = threading.Lock()
+# access_token -> (token_ip或TOKEN_NOT_FOUND, 过期时间)，按最近使用排序
+local_cache = OrderedDict()
+
+
+def get_token_cache():
+    return caches[getattr(settings, 'ACCESS_TOKEN_CACHE_ALIAS', 'default')]
+
+
+def token_cache_key(access_token):
+    return f'token_{access_token}'
+
+
+def record_stat(name):
+    with stats_lock:
+        cache_stats[name] += 1
+
+
+def local_get(access_token):
+    with local_lock:
+        entry = local_cache.get(access_token)
+        if entry is None:
+            return None
+        token_ip, expires_at = entry
+        if expires_at <= time.monotonic():
+            del local_cache[access_token]
+            return None
+        local_cache.move_to_end(access_token)
+        return token_ip
+
+
+def local_set(access_token, token_ip, timeout):
+    expires_at = time.monotonic() + min(timeout, LOCAL_CACHE_TTL)
+    with local_lock:
+        local_cache[access_token] = (token_ip, expires_at)
+        local_cache.move_to_end(access_token)
+        while len(local_cache) > LOCAL_CACHE_MAX_ENTRIES:
+            local_cache.popitem(last=False)
+
+
+def get_cached_token_ip(access_token):
+    """
+    依次查询进程内缓存和共享缓存
+    返回token绑定的IP；token已确认不存在时返回TOKEN_NOT_FOUND；两级都未命中返回None
+    """
+    token_ip = local_get(access_token)
+    if token_ip is not None:
+        record_stat('negative_hits' if token_ip == TOKEN_NOT_FOUND else 'local_hits')
+        return token_ip
+
+    token_ip = get_token_cache().get(token_cache_key(access_token))
+    if token_ip is None:
+        record_stat('misses')
+        return None
+
+    record_stat('negative_hits' if token_ip == TOKEN_NOT_FOUND else 'hits')
+    local_set(access_token, token_ip, LOCAL_CACHE_TTL)
+    return token_ip
+
+
+def cache_token_ip(access_token, token_ip):
+    get_token_cache().set(token_cache_key(access_token), token_ip, TOKEN_CACHE_TIMEOUT)
+    local_set(access_token, token_ip, TOKEN_CACHE_TIMEOUT)
+
+
+def cache_token_missing(access_token):
+    """记录不存在的token，NEGATIVE_CACHE_TIMEOUT秒内不再查库"""
+    get_token_cache().set(token_cache_key(access_token), TOKEN_NOT_FOUND, NEGATIVE_CACHE_TIMEOUT)
+    local_set(access_token, TOKEN_NOT_FOUND, NEGATIVE_CACHE_TIMEOUT)
+
+
+def invalidate_token(*access_tokens):
+    """从两级缓存中删除token（包括负缓存），生成、轮换、删除token或IP校验失败时调用"""
+    tokens = [token for token in access_tokens if token]
+    if not tokens:
+        return
+    with local_lock:
+        for token in tokens:
+            local_cache.pop(token, None)
+    get_token_cache().delete_many([token_cache_key(token) for token in tokens])
+    record_stat('invalidations')
+
+
+def get_cache_stats():
+    """当前worker的缓存统计"""
+    with stats_lock:
+        stats = dict(cache_stats)
+    lookups = stats['local_hits'] + stats['hits'] + stats['misses'] + stats['negative_hits']
+    hits = lookups - stats['misses']
+    stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0
+    with local_lock:
+        stats['local_entries'] = len(local_cache)
+    stats['pid'] = os.getpid()
+    stats['backend'] = type(get_token_cache()).__name__
+    return stats
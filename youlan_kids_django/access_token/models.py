@@ -1,4 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_token
 
 class AccessToken(models.Model):
     id = models.AutoField(primary_key=True, verbose_name='自增ID')
@@ -12,4 +16,23 @@ class AccessToken(models.Model):
         verbose_name_plural = '访问令牌'
 
     def __str__(self):
-        return f'{self.access_token} ({self.ip_address})'
\ No newline at end of file
+        return f'{self.access_token} ({self.ip_address})'
+
+
+# 信号处理函数：记录加载时的token值，token被轮换时可以同时失效旧token的缓存
+@receiver(post_init, sender=AccessToken)
+def remember_original_token(sender, instance, **kwargs):
+    # 使用__dict__读取，避免only()/defer()加载的实例在初始化时触发额外查询
+    instance._original_access_token = instance.__dict__.get('access_token')
+
+
+# 信号处理函数：token生成、轮换、修改绑定IP或删除后，使共享缓存中的旧记录失效
+@receiver(post_save, sender=AccessToken)
+def invalidate_saved_token(sender, instance, **kwargs):
+    invalidate_token(instance._original_access_token, instance.access_token)
+    instance._original_access_token = instance.access_token
+
+
+@receiver(post_delete, sender=AccessToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance._original_access_token, instance.access_token)
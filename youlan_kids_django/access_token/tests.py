@@ -1,3 +1,70 @@
-from django.test import TestCase
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+
+from . import cache as token_cache
+from .models import AccessToken
+
+
+class SharedTokenCacheTests(TestCase):
+    """
+    使用文件缓存代替memcached作为共享缓存：同一目录的另一个FileBasedCache实例相当于另一个gunicorn worker，
+    清空进程内LRU模拟请求落到另一个worker
+    """
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+            }
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.other_worker = FileBasedCache(self.cache_dir, {})
+        token_cache.local_cache.clear()
+        for name in token_cache.cache_stats:
+            token_cache.cache_stats[name] = 0
+        self.token = AccessToken.objects.create(ip_address='127.0.0.1', access_token='token-a')
+
+    def request(self, access_token, ip_address='127.0.0.1'):
+        return self.client.get('/access_token/cache_stats', {'access_token': access_token}, REMOTE_ADDR=ip_address)
+
+    def test_token_cached_for_all_workers(self):
+        self.assertEqual(self.request('token-a').status_code, 200)
+        self.assertEqual(self.other_worker.get(token_cache.token_cache_key('token-a')), '127.0.0.1')
+
+        # 另一个worker：进程内缓存为空，从共享缓存命中，不查库
+        token_cache.local_cache.clear()
+        with self.assertNumQueries(0):
+            response = self.request('token-a')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['hits'], 1)
+        self.assertEqual(response.json()['data']['misses'], 1)
+
+    def test_rotated_token_invalidated_for_all_workers(self):
+        self.assertEqual(self.request('token-a').status_code, 200)
+
+        self.token.access_token = 'token-b'
+        self.token.save()
+        self.assertIsNone(self.other_worker.get(token_cache.token_cache_key('token-a')))
+
+        self.assertEqual(self.request('token-a').status_code, 401)
+        self.assertEqual(self.request('token-b').status_code, 200)
+
+    def test_ip_mismatch_invalidates_shared_entry(self):
+        self.assertEqual(self.request('token-a').status_code, 200)
+
+        self.assertEqual(self.request('token-a', ip_address='10.0.0.1').status_code, 401)
+        self.assertIsNone(self.other_worker.get(token_cache.token_cache_key('token-a')))
+
+    def test_missing_token_negative_cached(self):
+        self.assertEqual(self.request('unknown').status_code, 401)
+        token_cache.local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.request('unknown').status_code, 401)
+        self.assertEqual(self.other_worker.get(token_cache.token_cache_key('unknown')), token_cache.TOKEN_NOT_FOUND)
@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('get_token', views.get_token, name='get_token'),
     path('get_ips', views.get_ips, name='get_ips'),
+    path('cache_stats', views.cache_stats, name='cache_stats'),
 ]
@@ -2,6 +2,7 @@
 from django.utils import timezone
 from django.http import JsonResponse
 from .models import AccessToken
+from .cache import cache_token_ip, get_cache_stats
 import secrets
 from django.views.decorators.csrf import csrf_exempt
 import logging
@@ -44,6 +45,8 @@ def get_token(request):
                 access_token=access_token,
                 register_time=timezone.now()
             )
+            # 保存时已通过信号失效旧缓存，这里预热共享缓存，新token的首次请求无需查库
+            cache_token_ip(token_obj.access_token, token_obj.ip_address)
             return JsonResponse({
                 'code': 201,
                 'message': 'Token generated successfully',
@@ -80,3 +83,12 @@ def get_ips(request):
     except Exception as e:
         return JsonResponse({'code': 500, 'message': f'Server error: {str(e)}'}, status=500)
 
+
+@csrf_exempt
+def cache_stats(request):
+    """返回处理本次请求的worker的access_token缓存命中统计"""
+    return JsonResponse({
+        'code': 200,
+        'message': 'Cache stats retrieved successfully',
+        'data': get_cache_stats()
+    })
@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from django.db import models
 from commodity.models import Commodity
+from youlan_kids_django.table_versions import bump_version
 
 
 def activity_image_path(instance, filename):
@@ -37,3 +40,10 @@ class ActivityImage(models.Model):
         db_table = 'Activity_Image'
         verbose_name = '活动图'
         verbose_name_plural = '活动图'
+
+
+# 信号处理函数：活动图写入或删除后，递增batch_query_activity_images的ETag使用的版本号
+@receiver(post_save, sender=ActivityImage)
+@receiver(post_delete, sender=ActivityImage)
+def bump_activity_image_on_write(sender, **kwargs):
+    bump_version('activity_image')
@@ -1,3 +1,49 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError
 from django.test import TestCase
 
-# Create your tests here.
+from access_token.models import AccessToken
+
+from .models import ActivityImage
+
+
+class BatchQueryActivityImagesETagTests(TestCase):
+    """活动图批量查询：只有成功的响应带ETag，错误响应不会被客户端缓存"""
+
+    def setUp(self):
+        cache.clear()
+        AccessToken.objects.create(ip_address='127.0.0.1', access_token='token-a')
+
+    def request(self, method='POST', payload=None, **extra):
+        return self.client.generic(
+            method, '/activity/batch_query_activity_images?access_token=token-a',
+            json.dumps(payload or {'shopname': 'youlan_kids'}),
+            content_type='application/json', REMOTE_ADDR='127.0.0.1', **extra,
+        )
+
+    def test_success_tagged_and_revalidated(self):
+        response = self.request()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        response = self.request(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_get_not_allowed(self):
+        response = self.request(method='GET')
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_errors_not_tagged(self):
+        response = self.request(payload={'shopname': 'other'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+
+        with mock.patch.object(ActivityImage.objects, 'all', side_effect=DatabaseError('连接中断')):
+            response = self.request()
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(response.has_header('ETag'))
+        # 故障恢复后重新查询，返回正常结果
+        self.assertEqual(self.request().json()['code'], 200)
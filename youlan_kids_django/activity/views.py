@@ -4,10 +4,12 @@ from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from .models import ActivityImage
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
 import json
 from datetime import timedelta
 from commodity.models import Commodity
 from datetime import datetime
+from youlan_kids_django.table_versions import etag_from_versions
 @csrf_exempt
 def add_activity_img(request):      #添加活动图
     if request.method == 'POST':
@@ -81,48 +83,47 @@ def activity_image_online(request):    #上线活动图
         return JsonResponse({'code': 405, 'message': '不支持的请求方法'})
 
 @csrf_exempt
+@require_http_methods(['POST'])
+@etag_from_versions('activity_image')
 def batch_query_activity_images(request):    #批量查询
-    if request.method == 'POST':
-        try:
-            # 获取请求数据
-            data = json.loads(request.body)
-            shopname = data.get('shopname')
-
-            # 验证shopname
-            if shopname != 'youlan_kids':
-                return JsonResponse({'code': 400, 'message': 'shopname不正确'})
-
-            # 查询所有活动图
-            activity_images = ActivityImage.objects.all()
-            result = []
-
-            for img in activity_images:
-                # 处理时间字段，增加8小时并格式化
-                online_time = (img.online_time + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S') if img.online_time else None
-                offline_time = (img.offline_time + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S') if img.offline_time else None
-                created_at = (img.created_at + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')
-                updated_at = (img.updated_at + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')
-
-                # 构建返回数据
-                img_data = {
-                    'id': img.id,
-                    'image': request.build_absolute_uri(img.image.url) if img.image else None,
-                    'status': img.status,
-                    'online_time': online_time,
-                    'offline_time': offline_time,
-                    'commodities': img.commodities,
-                    'category': img.category,
-                    'notes': img.notes,
-                    'created_at': created_at,
-                    'updated_at': updated_at
-                }
-                result.append(img_data)
-
-            return JsonResponse({'code': 200, 'message': '查询成功', 'data': result})
-        except Exception as e:
-            return JsonResponse({'code': 500, 'message': f'查询失败: {str(e)}'})
-    else:
-        return JsonResponse({'code': 405, 'message': '不支持的请求方法'})
+    try:
+        # 获取请求数据
+        data = json.loads(request.body)
+        shopname = data.get('shopname')
+
+        # 验证shopname
+        if shopname != 'youlan_kids':
+            return JsonResponse({'code': 400, 'message': 'shopname不正确'}, status=400)
+
+        # 查询所有活动图
+        activity_images = ActivityImage.objects.all()
+        result = []
+
+        for img in activity_images:
+            # 处理时间字段，增加8小时并格式化
+            online_time = (img.online_time + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S') if img.online_time else None
+            offline_time = (img.offline_time + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S') if img.offline_time else None
+            created_at = (img.created_at + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')
+            updated_at = (img.updated_at + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')
+
+            # 构建返回数据
+            img_data = {
+                'id': img.id,
+                'image': request.build_absolute_uri(img.image.url) if img.image else None,
+                'status': img.status,
+                'online_time': online_time,
+                'offline_time': offline_time,
+                'commodities': img.commodities,
+                'category': img.category,
+                'notes': img.notes,
+                'created_at': created_at,
+                'updated_at': updated_at
+            }
+            result.append(img_data)
+
+        return JsonResponse({'code': 200, 'message': '查询成功', 'data': result})
+    except Exception as e:
+        return JsonResponse({'code': 500, 'message': f'查询失败: {str(e)}'}, status=500)
 
 @csrf_exempt
 def activity_image_offline(request):     #下线活动图
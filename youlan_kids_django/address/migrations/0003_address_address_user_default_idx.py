@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('address', '0002_auto_20250818_1805'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', '-is_default', 'created_at'], name='address_user_default_idx'),
+        ),
+    ]
@@ -23,6 +23,10 @@ class Address(models.Model):
         db_table = 'addresses'
         verbose_name = '用户地址'
         verbose_name_plural = '用户地址管理'
+        # 对应get_addresses中按用户过滤并按is_default、created_at排序的查询
+        indexes = [
+            models.Index(fields=['user', '-is_default', 'created_at'], name='address_user_default_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.nickname}的地址: {self.province}{self.city}{self.county}{self.detailed_address}'
@@ -0,0 +1,251 @@
+"""
+商品目录内存快照
+
+每个gunicorn worker持有一份只读的商品目录快照（全部商品、商品状态、款式上线状态和商品图片），
+goods_query、get_all_categories、get_category_tree、get_commodities_by_style_code
+直接从快照中读取，不再查询数据库。快照包含全部商品而不只是上线款式：goods_query不带demand时的商品列表
+和get_all_categories需要下线商品，内存占用随商品表大小增长（每个worker一份）。
+按商品ID查询的接口（batch_get_products_by_ids、search_commodity_data）仍然走主键索引直接查库，不读取快照。
+
+快照的版本号是table_versions中的catalogue数据集：商品、商品状态、款式状态、商品图片写入后
+（post_save/post_delete信号，以及bulk_update等不触发信号的批量写入）递增版本号。读取快照时发现版本号变化才重建（懒加载），
+重建期间其他线程等待同一次重建。其他服务（如Go服务）直接写库不会递增版本号，
+快照最长CATALOGUE_MAX_AGE秒后也会重建，即这类写入最多CATALOGUE_MAX_AGE秒（默认300秒）后才对上述接口可见。
+
+快照中的记录使用__slots__，建立后不再修改；重建时整体替换，正在使用旧快照的请求不受影响。
+类目树（类目 -> 商品分类 -> 上线款式数）随快照一起生成，并按内容计算ETag。
+"""
+import hashlib
+import json
+import threading
+import time
+from operator import attrgetter
+
+from django.conf import settings
+
+from youlan_kids_django.table_versions import bump_version, get_version
+
+from .models import Commodity, CommodityImage, CommoditySituation, StyleCodeSituation
+
+CATALOGUE_VERSION_NAME = 'catalogue'
+# 没有收到版本号变化时，快照的最长使用时间（秒）
+CATALOGUE_MAX_AGE = getattr(settings, 'CATALOGUE_MAX_AGE', 300)
+
+
+class CommodityRecord:
+    """商品快照记录，图片字段保存存储后端生成的相对URL，没有图片时为None"""
+    __slots__ = (
+        'commodity_id', 'name', 'style_code', 'category', 'category_detail', 'price', 'size', 'color',
+        'image_url', 'promo_image_url', 'color_image_url', 'created_at', 'status',
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+
+
+class ImageRecord:
+    """商品图片快照记录"""
+    __slots__ = ('id', 'url', 'is_main', 'created_at')
+
+    def __init__(self, id, url, is_main, created_at):
+        self.id = id
+        self.url = url
+        self.is_main = is_main
+        self.created_at = created_at
+
+
+class CatalogueSnapshot:
+    """
+    商品目录快照
+    records_by_id: commodity_id -> CommodityRecord
+    by_style_code: style_code -> 按created_at正序的记录元组（与款式索引commodity_style_created_idx的顺序一致）
+    by_category: category -> 按created_at倒序的记录元组
+    newest_first: 全部记录按created_at倒序（created_at相同按commodity_id）
+    categories: 全部商品类目，去重后排序
+    online_style_codes: StyleCodeSituation中上线的款式编码
+    online_newest_first / online_by_category: 只包含上线款式商品的newest_first / by_category
+    style_heads / style_heads_by_category: 上线款式去重后的列表（全部 / 按类目），
+        每个款式只保留（该类目中）created_at最新的商品，按created_at倒序；goods_query demand=style_code直接分页
+    images: commodity_id -> 按(created_at, id)排序的ImageRecord元组
+    category_tree: build_category_tree生成的类目树
+    category_tree_body: 类目树接口的JSON响应体
+    category_tree_etag: 响应体的MD5，内容不变时快照重建前后保持不变
+    """
+    __slots__ = (
+        'version', 'built_at', 'records_by_id', 'by_style_code', 'by_category',
+        'newest_first', 'categories', 'online_style_codes', 'images',
+        'online_newest_first', 'online_by_category', 'style_heads', 'style_heads_by_category',
+        'category_tree', 'category_tree_body', 'category_tree_etag',
+    )
+
+    def __init__(self, version, records, online_style_codes, images):
+        self.version = version
+        self.built_at = time.monotonic()
+        by_id = sorted(records, key=attrgetter('commodity_id'))
+        self.records_by_id = {record.commodity_id: record for record in by_id}
+        # 稳定排序：created_at相同的记录保持commodity_id顺序
+        self.newest_first = tuple(sorted(by_id, key=attrgetter('created_at'), reverse=True))
+
+        by_style_code = {}
+        by_category = {}
+        for record in sorted(by_id, key=attrgetter('created_at')):
+            by_style_code.setdefault(record.style_code, []).append(record)
+        for record in self.newest_first:
+            by_category.setdefault(record.category, []).append(record)
+        self.by_style_code = {key: tuple(value) for key, value in by_style_code.items()}
+        self.by_category = {key: tuple(value) for key, value in by_category.items()}
+        self.categories = tuple(sorted(by_category))
+        self.online_style_codes = frozenset(online_style_codes)
+        self.images = images
+
+        self.online_newest_first = tuple(r for r in self.newest_first if r.style_code in self.online_style_codes)
+        self.online_by_category = {
+            key: online for key, online in (
+                (key, tuple(r for r in value if r.style_code in self.online_style_codes))
+                for key, value in self.by_category.items()
+            ) if online
+        }
+        self.style_heads = dedupe_style_codes(self.online_newest_first)
+        self.style_heads_by_category = {key: dedupe_style_codes(value) for key, value in self.online_by_category.items()}
+
+        self.category_tree = build_category_tree(by_id, self.online_style_codes)
+        self.category_tree_body = json.dumps(
+            {'code': 200, 'message': '查询成功', 'data': self.category_tree}, ensure_ascii=False
+        ).encode('utf-8')
+        self.category_tree_etag = hashlib.md5(self.category_tree_body).hexdigest()
+
+
+def dedupe_style_codes(records):
+    """records已按created_at倒序，每个style_code保留第一条即created_at最新的记录"""
+    seen_style_codes = set()
+    heads = []
+    for record in records:
+        if record.style_code not in seen_style_codes:
+            seen_style_codes.add(record.style_code)
+            heads.append(record)
+    return tuple(heads)
+
+
+def build_category_tree(records, online_style_codes):
+    """
+    按类目、商品分类统计上线款式（StyleCodeSituation为online）的数量，只包含有上线款式的类目
+    返回[{'category': 类目, 'style_count': 款式数, 'details': [{'category_detail': 分类, 'style_count': 款式数}, ...]}, ...]，
+    类目和分类均按名称排序；同一款式的商品分布在多个分类时，在每个分类中各计一次
+    """
+    category_styles = {}
+    detail_styles = {}
+    for record in records:
+        if record.style_code not in online_style_codes:
+            continue
+        category_styles.setdefault(record.category, set()).add(record.style_code)
+        detail_styles.setdefault(record.category, {}).setdefault(record.category_detail, set()).add(record.style_code)
+
+    tree = []
+    for category in sorted(category_styles):
+        details = detail_styles[category]
+        tree.append({
+            'category': category,
+            'style_count': len(category_styles[category]),
+            'details': [
+                {'category_detail': detail, 'style_count': len(details[detail])}
+                for detail in sorted(details)
+            ],
+        })
+    return tree
+
+
+def get_catalogue_version():
+    return get_version(CATALOGUE_VERSION_NAME)
+
+
+def bump_catalogue_version():
+    """递增商品目录版本号，事务提交后生效"""
+    bump_version(CATALOGUE_VERSION_NAME)
+
+
+def file_url(field, name):
+    return field.storage.url(name) if name else None
+
+
+def build_snapshot(version):
+    """四次查询加载全部商品、商品状态、上线款式和商品图片"""
+    image_field = Commodity._meta.get_field('image')
+    promo_image_field = Commodity._meta.get_field('promo_image')
+    color_image_field = Commodity._meta.get_field('color_image')
+    statuses = dict(CommoditySituation.objects.values_list('commodity_id', 'status'))
+
+    records = [
+        CommodityRecord(
+            commodity_id=row['commodity_id'],
+            name=row['name'],
+            style_code=row['style_code'],
+            category=row['category'],
+            category_detail=row['category_detail'],
+            price=row['price'],
+            size=row['size'],
+            color=row['color'],
+            image_url=file_url(image_field, row['image']),
+            promo_image_url=file_url(promo_image_field, row['promo_image']),
+            color_image_url=file_url(color_image_field, row['color_image']),
+            created_at=row['created_at'],
+            status=statuses.get(row['commodity_id']),
+        )
+        for row in Commodity.objects.values(
+            'commodity_id', 'name', 'style_code', 'category', 'category_detail', 'price', 'size', 'color',
+            'image', 'promo_image', 'color_image', 'created_at',
+        ).iterator()
+    ]
+
+    online_style_codes = StyleCodeSituation.objects.filter(status='online').values_list('style_code', flat=True)
+
+    commodity_image_field = CommodityImage._meta.get_field('image')
+    images = {}
+    for image_id, commodity_id, name, is_main, created_at in (
+        CommodityImage.objects.order_by('created_at', 'id')
+        .values_list('id', 'commodity_id', 'image', 'is_main', 'created_at').iterator()
+    ):
+        images.setdefault(commodity_id, []).append(
+            ImageRecord(image_id, file_url(commodity_image_field, name), is_main, created_at)
+        )
+    images = {commodity_id: tuple(group) for commodity_id, group in images.items()}
+
+    return CatalogueSnapshot(version, records, online_style_codes, images)
+
+
+snapshot_lock = threading.Lock()
+current_snapshot = None
+stats_lock = threading.Lock()
+catalogue_stats = {'reads': 0, 'rebuilds': 0}
+
+
+def get_catalogue():
+    """返回当前worker的商品目录快照，版本号变化或超过CATALOGUE_MAX_AGE秒时重建"""
+    global current_snapshot
+    version = get_catalogue_version()
+    snapshot = current_snapshot
+    with stats_lock:
+        catalogue_stats['reads'] += 1
+    if snapshot is not None and snapshot.version == version and time.monotonic() - snapshot.built_at < CATALOGUE_MAX_AGE:
+        return snapshot
+
+    with snapshot_lock:
+        snapshot = current_snapshot
+        # 等待锁期间其他线程可能已经完成重建
+        if snapshot is None or snapshot.version != version or time.monotonic() - snapshot.built_at >= CATALOGUE_MAX_AGE:
+            snapshot = build_snapshot(version)
+            current_snapshot = snapshot
+            with stats_lock:
+                catalogue_stats['rebuilds'] += 1
+    return snapshot
+
+
+def get_catalogue_stats():
+    """当前worker的快照统计"""
+    with stats_lock:
+        stats = dict(catalogue_stats)
+    snapshot = current_snapshot
+    stats['version'] = snapshot.version if snapshot else None
+    stats['commodities'] = len(snapshot.records_by_id) if snapshot else 0
+    stats['age'] = round(time.monotonic() - snapshot.built_at, 1) if snapshot else None
+    return stats
@@ -1,7 +1,14 @@
 import sys
 import os
 import sys
+import json
+import random
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import uuid
 import requests,time,hashlib
+from requests.adapters import HTTPAdapter
 
 # 设置Django环境 - 确保从项目根目录运行
 # 获取当前文件所在目录
@@ -19,11 +26,16 @@ import django
 django.setup()
 
 # 导入Django模型
-from commodity.models import Commodity
-from tests import get_token
+from django.db import transaction
+from django.utils import timezone
+from commodity.catalogue import bump_catalogue_version
+from commodity.models import Commodity, CommodityMissingRecord
+from commodity.jushuitan import get_token
 
 app_key = "e50a8f2e66c845c188a04f34ebf4a663"
-access_token = get_token()
+# 本地联调时可通过环境变量指定token和接口地址（例如指向本地桩服务），避免请求正式环境
+access_token = os.environ.get('JUSHUITAN_ACCESS_TOKEN') or get_token()
+api_base_url = os.environ.get('JUSHUITAN_API_BASE_URL', 'https://openapi.jushuitan.com')
 timestamp = int(time.time())
 print(timestamp)
 charset = "UTF-8"
@@ -31,14 +43,69 @@ version = 2
 app_select = 'b7a7e5df75ed4ae38c42db4fbe060fb8'
 wms_co_id = 12740959
 
+# 断点文件：记录最后一个处理完成的批次，中断后重新运行从下一批继续
+checkpoint_file = os.environ.get(
+    'LEIMU_CHECKPOINT_FILE', os.path.join(tempfile.gettempdir(), 'leimu_sync_checkpoint.json')
+)
+# 并发拉取配置：拉取线程数、每秒最多请求数（令牌桶），可通过命令行参数覆盖
+fetch_workers = int(os.environ.get('LEIMU_WORKERS', 4))
+requests_per_second = float(os.environ.get('LEIMU_RATE', 5))
+# 请求超时（秒）和失败重试：网络错误、429和5xx按指数退避重试
+request_timeout = 30
+max_retries = 3
+retry_backoff = 1.0
+retry_status_codes = {429, 500, 502, 503, 504}
+# 对账删除阈值：连续多少次完整同步在接口中都查不到，才真正删除商品
+missing_runs_threshold = int(os.environ.get('LEIMU_MISSING_RUNS', 3))
+# 同步时需要比较和更新的字段：接口字段名 -> Commodity字段名
+sync_fields = {'other_6': 'category', 'vc_name': 'category_detail', 'sale_price': 'price'}
+
 
 def md5_encrypt(payment_str):   #进行MD5加密
     md5_hash = hashlib.md5()
     md5_hash.update(payment_str.encode('utf-8'))
     return md5_hash.hexdigest().lower()
 
+class TokenBucket:
+    """线程安全的令牌桶限流器：每秒补充rate个令牌，最多积累capacity个"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+rate_limiter = TokenBucket(requests_per_second)
+# 每个拉取线程复用自己的Session，保持keep-alive连接
+thread_local = threading.local()
+
+
+def get_session():
+    session = getattr(thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        thread_local.session = session
+    return session
+
+
 def send_inventory_query(app_key,access_token,timestamp,charset,version,sign,biz):
-    url = "https://openapi.jushuitan.com/open/sku/query"
+    url = f"{api_base_url}/open/sku/query"
     headers = {
         "Content-Type": "application/x-www-form-urlencoded"
     }
@@ -51,162 +118,387 @@ def send_inventory_query(app_key,access_token,timestamp,charset,version,sign,biz
         "sign": sign,
         "biz": biz
     }
-    try:
-        response = requests.post(url, headers=headers, data=data)
-        response.raise_for_status()  # 抛出HTTP错误
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"请求发送失败: {str(e)}")
-        return None
+    for attempt in range(max_retries + 1):
+        # 每次请求（包括重试）都先从令牌桶取令牌
+        rate_limiter.acquire()
+        try:
+            response = get_session().post(url, headers=headers, data=data, timeout=request_timeout)
+            response.raise_for_status()  # 抛出HTTP错误
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            if attempt >= max_retries or (status_code is not None and status_code not in retry_status_codes):
+                print(f"请求发送失败: {str(e)}")
+                return None
+            # 指数退避并加随机抖动，避免多个线程同时重试
+            delay = retry_backoff * (2 ** attempt) + random.uniform(0, retry_backoff)
+            print(f"请求失败，{delay:.1f}s后第{attempt + 1}次重试: {str(e)}")
+            time.sleep(delay)
 
 
-def get_commodity_ids():
-    """从Commodity模型中获取所有commodity_id"""
+def get_commodity_ids(after_id=None):
+    """从Commodity模型中获取commodity_id，按ID排序以便断点续传；after_id之前（含）的ID会被跳过"""
     try:
-        # 查询所有商品的commodity_id
-        commodities = Commodity.objects.values_list('commodity_id', flat=True)
-        return list(commodities)
+        commodities = Commodity.objects.order_by('commodity_id')
+        if after_id:
+            commodities = commodities.filter(commodity_id__gt=after_id)
+        return list(commodities.values_list('commodity_id', flat=True))
     except Exception as e:
         print(f"获取商品ID失败: {str(e)}")
         return []
 
 
-def batch_process_commodities():
-    """批量处理商品数据，每20个ID一组"""
+def load_checkpoint():
+    """读取断点，不存在或损坏时返回None"""
+    try:
+        with open(checkpoint_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(checkpoint):
+    # 先写临时文件再替换，避免中断时留下半个文件
+    tmp_file = f'{checkpoint_file}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_file, checkpoint_file)
+
+
+def clear_checkpoint():
+    try:
+        os.remove(checkpoint_file)
+    except FileNotFoundError:
+        pass
+
+
+def new_sync_run(dry_run=False, missing_runs=None):
+    """一次完整同步的上下文：同步ID、是否试运行、删除阈值，以及试运行时收集的差异报告"""
+    return {
+        'run_id': uuid.uuid4().hex,
+        'dry_run': dry_run,
+        'missing_runs': missing_runs or missing_runs_threshold,
+        'report': {'update': {}, 'missing': {}, 'restored': [], 'invalid': [], 'delete': []} if dry_run else None,
+    }
+
+
+def batch_process_commodities(restart=False, workers=None, dry_run=False, missing_runs=None, report_file=None):
+    """
+    批量处理商品数据，每20个ID一组；默认从上次中断的批次继续
+    多个线程并发调用接口（受令牌桶限流），主线程按完成顺序依次写库
+    接口查不到的商品先记入缺失暂存表，全部批次完成后统一删除连续缺失达到阈值的商品
+    dry_run=True时不写数据库也不记录断点，只输出将要发生的变更
+    """
+    workers = workers or fetch_workers
+    run = new_sync_run(dry_run, missing_runs)
+    checkpoint = None if restart or dry_run else load_checkpoint()
+    if checkpoint:
+        print(f"从断点继续：上次处理到 {checkpoint['last_commodity_id']}，已完成 {checkpoint['processed']} 个商品ID")
+        # 沿用中断前的同步ID，重复处理的批次不会重复累计缺失次数
+        run['run_id'] = checkpoint.setdefault('run_id', run['run_id'])
+    else:
+        checkpoint = {
+            'run_id': run['run_id'], 'last_commodity_id': None,
+            'processed': 0, 'updated': 0, 'missing': 0, 'deleted': 0, 'elapsed': 0.0,
+        }
+
     # 获取所有商品ID
-    all_commodity_ids = get_commodity_ids()
-    if not all_commodity_ids:
+    all_commodity_ids = get_commodity_ids(checkpoint['last_commodity_id'])
+    if not all_commodity_ids and not checkpoint['last_commodity_id']:
         print("没有找到商品ID")
+        clear_checkpoint()
         return
     
-    print(f"总共找到 {len(all_commodity_ids)} 个商品ID")
+    print(f"总共找到 {len(all_commodity_ids)} 个待处理商品ID，{workers} 个线程并发拉取，限流 {rate_limiter.rate}/s")
     
     # 分批处理，每20个ID一组
     batch_size = 20
-    for i in range(0, len(all_commodity_ids), batch_size):
-        # 获取当前批次的ID
-        batch_ids = all_commodity_ids[i:i+batch_size]
-        sku_ids = ",".join(batch_ids)
-        
-        print(f"处理批次 {i//batch_size + 1}，包含 {len(batch_ids)} 个商品ID")
-        
-        # 调用API查询这批商品
-        result = process_commodity_batch(sku_ids)
-        
-        # 如果处理失败，打印错误信息
-        if not result:
-            print(f"批次 {i//batch_size + 1} 处理失败")
-        
-        # 避免请求过于频繁
-        time.sleep(1)
+    batches = [all_commodity_ids[i:i+batch_size] for i in range(0, len(all_commodity_ids), batch_size)]
+    started = time.monotonic()
+    elapsed_before = checkpoint['elapsed']
+
+    # 批次完成顺序不固定，断点只推进到连续完成的最后一个批次
+    finished = {}
+    next_checkpoint_index = 0
+    next_submit_index = 0
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while next_submit_index < len(batches) or pending:
+            # 最多保持2倍线程数的批次在途，避免一次性提交全部批次
+            while next_submit_index < len(batches) and len(pending) < workers * 2:
+                future = executor.submit(fetch_commodity_batch, ",".join(batches[next_submit_index]))
+                pending[future] = (next_submit_index, time.monotonic())
+                next_submit_index += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, batch_started = pending.pop(future)
+                batch_ids = batches[index]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    print(f"批次 {index + 1} 拉取异常: {str(e)}")
+                    response = None
+
+                # 写库阶段：在主线程中执行，复用同一个数据库连接
+                result = apply_commodity_batch(",".join(batch_ids), response, run)
+                
+                # 如果处理失败，打印错误信息
+                if not result:
+                    print(f"批次 {index + 1} 处理失败，本批次商品保持不变")
+                finished[index] = result
 
+                batch_elapsed = time.monotonic() - batch_started
+                print(
+                    f"批次 {index + 1}：{len(batch_ids)} 个商品ID，{batch_elapsed:.2f}s，"
+                    f"{len(batch_ids) / batch_elapsed if batch_elapsed else 0:.1f} 行/秒"
+                )
+
+            while next_checkpoint_index in finished:
+                result = finished.pop(next_checkpoint_index)
+                if result:
+                    checkpoint['updated'] += result['updated']
+                    checkpoint['missing'] += result['missing']
+                    checkpoint['deleted'] += result['deleted']
+                checkpoint['last_commodity_id'] = batches[next_checkpoint_index][-1]
+                checkpoint['processed'] += len(batches[next_checkpoint_index])
+                next_checkpoint_index += 1
+            checkpoint['elapsed'] = elapsed_before + time.monotonic() - started
+            if not dry_run:
+                save_checkpoint(checkpoint)
+
+    # 全部批次完成后再统一删除连续缺失达到阈值的商品
+    checkpoint['deleted'] += reconcile_missing_commodities(run)
+
+    elapsed = checkpoint['elapsed']
+    print(
+        f"{'试运行' if dry_run else '同步'}完成：处理 {checkpoint['processed']} 个商品ID，更新 {checkpoint['updated']} 个，"
+        f"缺失 {checkpoint['missing']} 个，删除 {checkpoint['deleted']} 个，用时 {elapsed:.1f}s，"
+        f"平均 {checkpoint['processed'] / elapsed if elapsed else 0:.1f} 行/秒"
+    )
+    if dry_run:
+        print_dry_run_report(run['report'], report_file)
+    else:
+        clear_checkpoint()
+    return run['report']
 
-def process_commodity_batch(sku_ids):
-    """处理一批商品ID，调用API并更新数据库，同时删除查不到数据的商品"""
+
+def fetch_commodity_batch(sku_ids):
+    """拉取阶段：调用接口查询一批商品，在线程池中执行，不访问数据库"""
+    # 构建请求参数
+    timestamp = int(time.time())
+    biz = f'{{"page_index":"1","page_size":"100","sku_ids":"{sku_ids}"}}'
+    converted_str = f'{app_select}access_token{access_token}app_key{app_key}biz{biz}charset{charset}timestamp{timestamp}version{version}'
+    sign = md5_encrypt(converted_str)
+    
+    # 发送请求
+    return send_inventory_query(app_key, access_token, timestamp, charset, version, sign, biz)
+
+
+def process_commodity_batch(sku_ids, run=None):
+    """处理一批商品ID，调用API并更新数据库，查不到数据的商品记入缺失暂存表"""
+    return apply_commodity_batch(sku_ids, fetch_commodity_batch(sku_ids), run)
+
+
+def apply_commodity_batch(sku_ids, response, run=None):
+    """
+    写库阶段：根据接口返回结果更新数据库，查不到数据的商品记入缺失暂存表
+    接口失败、返回异常或处理出错时不做任何删除，本批次商品保持原状，等待下一次同步
+    """
+    run = run or new_sync_run()
     try:
         # 保存当前批次的所有商品ID列表
         batch_id_list = sku_ids.split(',')
         
-        # 构建请求参数
-        timestamp = int(time.time())
-        biz = f'{{"page_index":"1","page_size":"100","sku_ids":"{sku_ids}"}}'
-        converted_str = f'{app_select}access_token{access_token}app_key{app_key}biz{biz}charset{charset}timestamp{timestamp}version{version}'
-        sign = md5_encrypt(converted_str)
-        
-        # 发送请求
-        response = send_inventory_query(app_key, access_token, timestamp, charset, version, sign, biz)
-        
         if not response or response.get('code') != 0:
             print(f"API请求失败或返回异常: {response}")
-            # API失败时，删除当前批次的所有商品
-            delete_commodities_not_found(batch_id_list, [])
             return False
         
         # 处理返回的数据
         data = response.get('data')
         if not data:
             print("API返回数据为空")
-            # 数据为空时，删除当前批次的所有商品
-            delete_commodities_not_found(batch_id_list, [])
             return False
         
-        datas = data.get('datas', [])
+        datas = data.get('datas') or []
         
         # 获取在API响应中找到的商品ID
-        found_ids = [item.get('sku_id') for item in datas if item.get('sku_id')]
+        found_ids = {item.get('sku_id') for item in datas if item.get('sku_id')}
+        missing_ids = [sku_id for sku_id in batch_id_list if sku_id not in found_ids]
         
-        # 删除在API响应中找不到的商品
-        delete_commodities_not_found(batch_id_list, found_ids)
+        # 记录缺失的商品，同时清除重新出现的商品的缺失记录
+        mark_commodities_missing(missing_ids, found_ids, run)
         
         # 如果有找到的数据，更新数据库
+        stats = {'found': len(found_ids), 'missing': len(missing_ids), 'updated': 0, 'deleted': 0}
         if datas:
-            update_commodity_data(datas)
+            updated_count, invalid_count = update_commodity_data(datas, run)
+            stats['updated'] = updated_count
+            stats['deleted'] = invalid_count
         
-        return True
+        return stats
     except Exception as e:
         print(f"处理商品批次失败: {str(e)}")
-        # 异常情况下，也删除当前批次的所有商品
-        try:
-            batch_id_list = sku_ids.split(',')
-            delete_commodities_not_found(batch_id_list, [])
-        except:
-            pass
         return False
 
-def delete_commodities_not_found(batch_id_list, found_ids):
-    """删除在API响应中找不到的商品记录"""
-    # 找出在批次中但不在API响应中的商品ID
-    not_found_ids = [sku_id for sku_id in batch_id_list if sku_id not in found_ids]
-    
-    if not not_found_ids:
+
+def mark_commodities_missing(missing_ids, found_ids, run):
+    """
+    对账第一阶段：缺失商品的连续缺失次数加1（同一次同步只计一次），重新查到的商品清除缺失记录
+    试运行时只把结果写入报告
+    """
+    report = run['report']
+    restored = CommodityMissingRecord.objects.filter(commodity_id__in=found_ids)
+    if run['dry_run']:
+        report['restored'].extend(restored.values_list('commodity_id', flat=True))
+    elif found_ids:
+        restored.delete()
+
+    if not missing_ids:
         return
-    
-    # 删除这些商品记录
-    deleted_count = Commodity.objects.filter(commodity_id__in=not_found_ids).delete()[0]
-    
-    if deleted_count > 0:
-        print(f"删除了 {deleted_count} 个在API中找不到数据的商品记录")
-    else:
-        print(f"没有需要删除的商品记录")
 
+    records = CommodityMissingRecord.objects.in_bulk(missing_ids)
+    now = timezone.now()
+    new_records = []
+    changed_records = []
+    for sku_id in missing_ids:
+        record = records.get(sku_id)
+        if record is None:
+            record = CommodityMissingRecord(commodity_id=sku_id, missing_runs=0)
+            new_records.append(record)
+        elif record.last_run_id == run['run_id']:
+            continue
+        else:
+            changed_records.append(record)
+        record.missing_runs += 1
+        record.last_run_id = run['run_id']
+        record.last_missing_at = now
+        if run['dry_run']:
+            report['missing'][sku_id] = record.missing_runs
+            if record.missing_runs >= run['missing_runs']:
+                report['delete'].append(sku_id)
 
-def update_commodity_data(datas):
-    """根据API返回的数据更新Commodity模型"""
-    for item in datas:
-        try:
-            # 获取商品ID
-            sku_id = item.get('sku_id')
-            if not sku_id:
-                continue
-            
-            # 根据用户需求，检查必要字段是否存在
-            category = item.get('other_6')
-            category_detail = item.get('vc_name')
-            price = item.get('sale_price')
-            
-            # 尝试获取商品记录
-            commodity = Commodity.objects.get(commodity_id=sku_id)
-            
-            # 检查必要字段是否存在，如果不存在则删除记录
-            if category is None or category_detail is None or price is None:
-                print(f"必要字段缺失，删除商品记录: {sku_id}")
-                commodity.delete()
-                continue
-            
-            # 更新商品信息
-            commodity.category = category
-            commodity.category_detail = category_detail
-            commodity.price = price
-            commodity.save()
-            
-            print(f"更新商品成功: {sku_id}, category: {category}, category_detail: {category_detail}, price: {price}")
-        except Commodity.DoesNotExist:
+    if not run['dry_run']:
+        CommodityMissingRecord.objects.bulk_create(new_records)
+        CommodityMissingRecord.objects.bulk_update(changed_records, ['missing_runs', 'last_run_id', 'last_missing_at'])
+        print(f"本批次 {len(missing_ids)} 个商品在接口中查不到，已记入缺失暂存表")
+
+
+def reconcile_missing_commodities(run):
+    """对账第二阶段：一次性删除连续缺失次数达到阈值的商品及其缺失记录，返回删除的商品数量"""
+    if run['dry_run']:
+        return len(run['report']['delete'])
+
+    expired = CommodityMissingRecord.objects.filter(missing_runs__gte=run['missing_runs'])
+    expired_ids = list(expired.values_list('commodity_id', flat=True))
+    if not expired_ids:
+        return 0
+
+    with transaction.atomic():
+        # delete()返回值包含级联删除的图片等记录，这里只统计商品本身
+        deleted_count = Commodity.objects.filter(commodity_id__in=expired_ids).delete()[1].get(Commodity._meta.label, 0)
+        CommodityMissingRecord.objects.filter(commodity_id__in=expired_ids).delete()
+    print(f"删除了 {deleted_count} 个连续 {run['missing_runs']} 次同步都查不到的商品记录")
+    return deleted_count
+
+
+def print_dry_run_report(report, report_file=None):
+    """输出试运行的差异报告，指定report_file时同时写入JSON文件"""
+    print(f"将更新 {len(report['update'])} 个商品：")
+    for sku_id, changes in report['update'].items():
+        print(f"  {sku_id}: " + ", ".join(f"{field} {old!r} -> {new!r}" for field, (old, new) in changes.items()))
+    print(f"将记为缺失 {len(report['missing'])} 个商品，恢复 {len(report['restored'])} 个商品")
+    print(f"将删除 {len(report['delete'])} 个商品（连续缺失达到阈值）：{', '.join(report['delete'])}")
+    print(f"将删除 {len(report['invalid'])} 个必要字段缺失的商品：{', '.join(report['invalid'])}")
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"差异报告已写入 {report_file}")
+
+
+def update_commodity_data(datas, run=None):
+    """
+    根据API返回的数据批量更新Commodity模型
+    一次查询取出本批次的全部商品，只对发生变化的字段执行bulk_update；
+    必要字段缺失的商品一次性删除。返回(更新数量, 删除数量)
+    """
+    items = {item['sku_id']: item for item in datas if item.get('sku_id')}
+    if not items:
+        return 0, 0
+    report = run['report'] if run else None
+
+    commodities = Commodity.objects.only('commodity_id', *sync_fields.values()).in_bulk(list(items))
+
+    changed_commodities = []
+    changed_fields = set()
+    invalid_ids = []
+    for sku_id, item in items.items():
+        commodity = commodities.get(sku_id)
+        if commodity is None:
             print(f"商品不存在: {sku_id}")
-        except Exception as e:
+            continue
+
+        # 根据用户需求，检查必要字段是否存在，如果不存在则删除记录
+        if any(item.get(api_field) is None for api_field in sync_fields):
+            print(f"必要字段缺失，删除商品记录: {sku_id}")
+            invalid_ids.append(sku_id)
+            continue
+
+        try:
+            new_values = {
+                'category': item['other_6'],
+                'category_detail': item['vc_name'],
+                'price': float(item['sale_price']),
+            }
+        except (TypeError, ValueError) as e:
             print(f"处理商品失败: {sku_id}, 错误: {str(e)}")
+            continue
+
+        changes = {}
+        for field, value in new_values.items():
+            if getattr(commodity, field) != value:
+                changes[field] = (getattr(commodity, field), value)
+                setattr(commodity, field, value)
+                changed_fields.add(field)
+        if changes:
+            changed_commodities.append(commodity)
+            if report is not None:
+                report['update'][sku_id] = changes
+
+    if report is not None:
+        report['invalid'].extend(invalid_ids)
+        return len(changed_commodities), len(invalid_ids)
+
+    # bulk_update不触发post_save；Commodity的post_save只处理新建记录，更新时无需触发，
+    # 但需要手动递增商品目录快照的版本号
+    if changed_commodities:
+        Commodity.objects.bulk_update(changed_commodities, sorted(changed_fields))
+        bump_catalogue_version()
+    deleted_count = 0
+    if invalid_ids:
+        deleted_count = Commodity.objects.filter(commodity_id__in=invalid_ids).delete()[1].get(Commodity._meta.label, 0)
+
+    print(f"本批次更新 {len(changed_commodities)} 个商品（字段: {', '.join(sorted(changed_fields)) or '无'}），"
+          f"删除 {deleted_count} 个")
+    return len(changed_commodities), deleted_count
 
 
 if __name__ == '__main__':
-    # 开始批量处理商品
-    batch_process_commodities()
+    import argparse
 
+    parser = argparse.ArgumentParser(description='从聚水潭同步商品类目、分类和价格')
+    parser.add_argument('--restart', action='store_true', help='忽略断点，从头开始')
+    parser.add_argument('--workers', type=int, default=fetch_workers, help='并发拉取线程数')
+    parser.add_argument('--rate', type=float, default=requests_per_second, help='每秒最多请求数')
+    parser.add_argument('--missing-runs', type=int, default=missing_runs_threshold,
+                        help='连续多少次完整同步查不到才删除商品')
+    parser.add_argument('--dry-run', action='store_true', help='只输出差异报告，不修改数据库')
+    parser.add_argument('--report', help='试运行时把差异报告写入该JSON文件')
+    args = parser.parse_args()
+
+    # 开始批量处理商品
+    rate_limiter = TokenBucket(args.rate)
+    batch_process_commodities(
+        restart=args.restart, workers=args.workers, dry_run=args.dry_run,
+        missing_runs=args.missing_runs, report_file=args.report,
+    )
@@ -0,0 +1,73 @@
+import json
+import secrets
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from access_token.models import AccessToken
+
+# 压测的读接口和请求体
+ENDPOINTS = [
+    ('goods_query', '/commodity/goods_query', {'shopname': 'youlan_kids', 'page': 1, 'page_size': 20}),
+    ('goods_query(style_code)', '/commodity/goods_query', {'shopname': 'youlan_kids', 'demand': 'style_code', 'page': 1, 'page_size': 20}),
+    ('get_all_categories', '/commodity/get_all_categories', {'shopname': 'youlan_kids'}),
+    ('search_style_codes', '/commodity/search_style_codes', {'shopname': 'youlan_kids', 'search_keyword': '儿童', 'page': 1, 'page_size': 10}),
+    ('batch_query_activity_images', '/activity/batch_query_activity_images', {'shopname': 'youlan_kids'}),
+]
+
+
+class Command(BaseCommand):
+    help = '对比读接口完整响应与携带If-None-Match返回304时的耗时、CPU时间和响应字节数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='每个接口每种方式的请求次数')
+        parser.add_argument('--force', action='store_true', help='允许在DEBUG=False的环境中执行')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('该命令会创建临时access_token，只能在本地环境执行（DEBUG=True），或显式指定--force')
+
+        # 测试客户端的请求来自127.0.0.1，创建临时token，结束后删除
+        token = AccessToken.objects.create(ip_address='127.0.0.1', access_token=f'bench_{secrets.token_hex(16)}')
+        client = Client()
+        try:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'==== 每种方式 {options["requests"]} 次请求 ===='))
+            total_saved_bytes = 0
+            for label, path, payload in ENDPOINTS:
+                url = f'{path}?access_token={token.access_token}'
+                body = json.dumps(payload)
+                etag = client.post(url, data=body, content_type='application/json').get('ETag')
+                if not etag:
+                    self.stdout.write(self.style.WARNING(f'{label}: 响应没有ETag，跳过'))
+                    continue
+
+                full = self.run_requests(client, url, body, options['requests'])
+                conditional = self.run_requests(client, url, body, options['requests'], HTTP_IF_NONE_MATCH=etag)
+                total_saved_bytes += full['bytes'] - conditional['bytes']
+                self.stdout.write(
+                    f'{label}: 200 平均 {full["ms"]:.2f}ms / CPU {full["cpu_ms"]:.2f}ms / {full["bytes"] // options["requests"]}B，'
+                    f'304 平均 {conditional["ms"]:.2f}ms / CPU {conditional["cpu_ms"]:.2f}ms / {conditional["bytes"] // options["requests"]}B'
+                    f'（304占比 {conditional["not_modified"]}/{options["requests"]}）'
+                )
+            self.stdout.write(self.style.SUCCESS(f'304共节省响应体 {total_saved_bytes / 1024:.1f}KB'))
+        finally:
+            token.delete()
+
+    def run_requests(self, client, url, body, count, **headers):
+        """返回平均耗时、平均CPU时间（毫秒）、响应体总字节数和304次数"""
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        total_bytes = 0
+        not_modified = 0
+        for _ in range(count):
+            response = client.post(url, data=body, content_type='application/json', **headers)
+            total_bytes += len(response.content)
+            not_modified += response.status_code == 304
+        return {
+            'ms': (time.perf_counter() - started) * 1000 / count,
+            'cpu_ms': (time.process_time() - cpu_started) * 1000 / count,
+            'bytes': total_bytes,
+            'not_modified': not_modified,
+        }
@@ -0,0 +1,126 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from commodity.models import Commodity, StyleCodeData
+from commodity.search import search_by_name
+
+# 压测数据统一使用的前缀，便于清理
+BENCH_PREFIX = 'BENCHSEARCH'
+# 拼接商品名称的词表
+NAME_WORDS = [
+    '儿童', '男童', '女童', '宝宝', '婴儿', '纯棉', '加绒', '加厚', '薄款', '春秋', '夏季', '冬季',
+    '卫衣', '外套', '羽绒服', '连衣裙', '半身裙', '长裤', '短裤', '打底裤', 'T恤', '衬衫', '毛衣', '马甲',
+    '套装', '睡衣', '背心', '牛仔', '运动', '休闲', '卡通', '条纹', '格子', '碎花', '韩版', '洋气',
+]
+
+
+class Command(BaseCommand):
+    help = '生成商品压测数据，对比名称搜索LIKE查询与全文索引查询（分页+COUNT）的耗时分布'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help='先写入压测数据')
+        parser.add_argument('--rows', type=int, default=100000, help='写入的商品数量，默认10万')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create每批写入数量')
+        parser.add_argument('--queries', type=int, default=200, help='每种查询方式执行的搜索次数')
+        parser.add_argument('--page-size', type=int, default=10, help='每次搜索取的条数')
+        parser.add_argument('--cleanup', action='store_true', help='删除之前写入的压测数据后退出')
+        parser.add_argument('--force', action='store_true', help='允许在DEBUG=False的环境中执行')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('该命令会写入大量数据，只能在本地环境执行（DEBUG=True），或显式指定--force')
+
+        if options['cleanup']:
+            self.cleanup()
+            return
+
+        if options['seed']:
+            self.seed(options['rows'], options['batch_size'])
+
+        random.seed(20250102)
+        keywords = [''.join(random.sample(NAME_WORDS, random.choice([1, 1, 2]))) for _ in range(options['queries'])]
+
+        results = {}
+        for label, model, order_by in [
+            ('search_products_by_name', Commodity, ['commodity_id']),
+            ('search_style_codes', StyleCodeData, ['style_code']),
+        ]:
+            results[f'{label}(LIKE)'] = self.run_queries(
+                keywords, options['page_size'],
+                lambda keyword: model.objects.filter(name__icontains=keyword).order_by(*order_by),
+            )
+            if connection.vendor == 'mysql':
+                results[f'{label}(FULLTEXT)'] = self.run_queries(
+                    keywords, options['page_size'],
+                    lambda keyword: search_by_name(model.objects.all(), keyword, order_by)[0],
+                )
+
+        if connection.vendor != 'mysql':
+            self.stdout.write(self.style.WARNING(f'当前数据库为{connection.vendor}，全文索引只在MySQL上可用，仅统计LIKE查询'))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'==== {len(keywords)} 次搜索耗时（分页+COUNT） ===='))
+        for label, timings in results.items():
+            timings.sort()
+            p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f'{label}: p50 {statistics.median(timings):.2f}ms, p95 {p95:.2f}ms, '
+                f'平均 {statistics.mean(timings):.2f}ms'
+            )
+
+    def run_queries(self, keywords, page_size, build_queryset):
+        """与搜索接口一致：先COUNT再取第一页，返回每次搜索的耗时（毫秒）"""
+        timings = []
+        for keyword in keywords:
+            started = time.perf_counter()
+            queryset = build_queryset(keyword)
+            queryset.count()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def seed(self, rows, batch_size):
+        """写入商品rows条，款式rows/10条，名称由词表随机拼接"""
+        random.seed(20250101)
+        started = time.monotonic()
+        style_rows = max(rows // 10, 1)
+
+        self.stdout.write(f'写入 {style_rows} 条款式数据...')
+        for start in range(0, style_rows, batch_size):
+            StyleCodeData.objects.bulk_create([
+                StyleCodeData(
+                    style_code=f'{BENCH_PREFIX}{i:08d}',
+                    name=''.join(random.sample(NAME_WORDS, 4)),
+                    category='压测',
+                    price=99.0,
+                    image='',
+                )
+                for i in range(start, min(start + batch_size, style_rows))
+            ], batch_size=batch_size)
+
+        self.stdout.write(f'写入 {rows} 条商品数据...')
+        for start in range(0, rows, batch_size):
+            # bulk_create不会触发post_save信号，不会生成图片等关联记录
+            Commodity.objects.bulk_create([
+                Commodity(
+                    commodity_id=f'{BENCH_PREFIX}{i:09d}',
+                    name=''.join(random.sample(NAME_WORDS, 4)),
+                    style_code=f'{BENCH_PREFIX}{i // 10:08d}',
+                    category='压测',
+                    price=99.0,
+                    image='',
+                )
+                for i in range(start, min(start + batch_size, rows))
+            ], batch_size=batch_size)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'压测数据写入完成，用时 {elapsed:.1f}s'))
+
+    def cleanup(self):
+        deleted_commodities = Commodity.objects.filter(commodity_id__startswith=BENCH_PREFIX).delete()[0]
+        deleted_styles = StyleCodeData.objects.filter(style_code__startswith=BENCH_PREFIX).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'已删除压测数据：商品 {deleted_commodities} 条，款式 {deleted_styles} 条'))
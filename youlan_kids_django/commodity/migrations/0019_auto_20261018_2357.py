@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commodity', '0018_stylecodedata'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commodity',
+            index=models.Index(fields=['style_code', 'created_at'], name='commodity_style_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commodity',
+            index=models.Index(fields=['category', 'created_at'], name='commodity_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commodity',
+            index=models.Index(fields=['created_at'], name='commodity_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commoditysituation',
+            index=models.Index(fields=['status'], name='situation_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commoditysituation',
+            index=models.Index(fields=['style_code', 'status'], name='situation_style_status_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commodity', '0019_auto_20261018_2357'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommodityMissingRecord',
+            fields=[
+                ('commodity_id', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='商品ID')),
+                ('missing_runs', models.PositiveIntegerField(default=0, verbose_name='连续缺失次数')),
+                ('last_run_id', models.CharField(blank=True, max_length=32, verbose_name='最后缺失的同步ID')),
+                ('first_missing_at', models.DateTimeField(auto_now_add=True, verbose_name='首次缺失时间')),
+                ('last_missing_at', models.DateTimeField(auto_now=True, verbose_name='最后缺失时间')),
+            ],
+            options={
+                'verbose_name': '商品缺失记录',
+                'verbose_name_plural': '商品缺失记录',
+                'db_table': 'Commodity_Missing',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:23
+
+from django.db import migrations, models
+
+# 商品名称和款式名称的ngram全文索引，仅在MySQL上创建
+FULLTEXT_INDEXES = [
+    ('Commodity_data', 'commodity_name_ft'),
+    ('StyleCode_Data', 'stylecode_name_ft'),
+]
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, index_name in FULLTEXT_INDEXES:
+        schema_editor.execute(f'ALTER TABLE `{table}` ADD FULLTEXT INDEX `{index_name}` (`name`) WITH PARSER ngram')
+
+
+def remove_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, index_name in FULLTEXT_INDEXES:
+        schema_editor.execute(f'ALTER TABLE `{table}` DROP INDEX `{index_name}`')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commodity', '0020_commoditymissingrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stylecodedata',
+            index=models.Index(fields=['name'], name='stylecode_name_idx'),
+        ),
+        migrations.RunPython(add_fulltext_indexes, remove_fulltext_indexes),
+    ]
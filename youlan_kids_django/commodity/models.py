@@ -1,6 +1,7 @@
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from youlan_kids_django.table_versions import bump_version
 from django.core.files.base import ContentFile
 import os
 import hashlib
@@ -23,7 +24,7 @@ def generate_unique_filename(instance, filename):
                 file_hash = hashlib.md5(f.read()).hexdigest()
         else:
             # 如果无法获取文件内容，检查是否有已知的文件路径
-            # 这是为了处理tests.py中通过临时文件上传的情况
+            # 这是为了处理jushuitan.py中通过临时文件上传的情况
             if hasattr(instance, '_temp_image_path') and os.path.exists(instance._temp_image_path):
                 with open(instance._temp_image_path, 'rb') as f:
                     file_hash = hashlib.md5(f.read()).hexdigest()
@@ -111,6 +112,12 @@ class Commodity(models.Model):
         db_table = 'Commodity_data'
         verbose_name = '商品数据'
         verbose_name_plural = '商品数据'
+        # 对应goods_query中按style_code/category过滤并按created_at倒序排序的查询
+        indexes = [
+            models.Index(fields=['style_code', 'created_at'], name='commodity_style_created_idx'),
+            models.Index(fields=['category', 'created_at'], name='commodity_cat_created_idx'),
+            models.Index(fields=['created_at'], name='commodity_created_idx'),
+        ]
 
 
 class CommodityImage(models.Model):
@@ -147,6 +154,26 @@ class CommoditySituation(models.Model):
         db_table = 'Commodity_Situation'
         verbose_name = '商品状态'
         verbose_name_plural = '商品状态'
+        # 对应goods_query的status过滤以及款式上下线时按style_code批量更新
+        indexes = [
+            models.Index(fields=['status'], name='situation_status_idx'),
+            models.Index(fields=['style_code', 'status'], name='situation_style_status_idx'),
+        ]
+
+
+class CommodityMissingRecord(models.Model):
+    """商品同步对账暂存表：记录连续多少次完整同步在聚水潭接口中查不到该商品，达到阈值后才删除"""
+    commodity_id = models.CharField(max_length=100, primary_key=True, verbose_name='商品ID')
+    missing_runs = models.PositiveIntegerField(default=0, verbose_name='连续缺失次数')
+    # 最后一次记为缺失的同步批次ID，断点续传重复处理同一批次时不会重复计数
+    last_run_id = models.CharField(max_length=32, blank=True, verbose_name='最后缺失的同步ID')
+    first_missing_at = models.DateTimeField(auto_now_add=True, verbose_name='首次缺失时间')
+    last_missing_at = models.DateTimeField(auto_now=True, verbose_name='最后缺失时间')
+
+    class Meta:
+        db_table = 'Commodity_Missing'
+        verbose_name = '商品缺失记录'
+        verbose_name_plural = '商品缺失记录'
 
 
 class StyleCodeData(models.Model):
@@ -163,6 +190,10 @@ class StyleCodeData(models.Model):
         db_table = 'StyleCode_Data'
         verbose_name = '款式数据'
         verbose_name_plural = '款式数据'
+        # search_suggestions按款式名称前缀联想
+        indexes = [
+            models.Index(fields=['name'], name='stylecode_name_idx'),
+        ]
 
     def __str__(self):
         return f'{self.style_code} - {self.name}'
@@ -293,3 +324,23 @@ def create_related_records(sender, instance, created, **kwargs):
                 print(f"为无款式代码的商品 {instance.commodity_id} 创建了主图记录")
 
 
+# 信号处理函数：商品、商品状态、款式状态、商品图片写入或删除后，递增商品目录快照的版本号
+@receiver(post_save, sender=Commodity)
+@receiver(post_delete, sender=Commodity)
+@receiver(post_save, sender=CommoditySituation)
+@receiver(post_delete, sender=CommoditySituation)
+@receiver(post_save, sender=StyleCodeSituation)
+@receiver(post_delete, sender=StyleCodeSituation)
+@receiver(post_save, sender=CommodityImage)
+@receiver(post_delete, sender=CommodityImage)
+def bump_catalogue_on_write(sender, **kwargs):
+    # catalogue模块依赖本模块的模型，在函数内导入
+    from .catalogue import bump_catalogue_version
+    bump_catalogue_version()
+
+
+# 信号处理函数：款式数据写入或删除后，递增search_style_codes的ETag使用的版本号
+@receiver(post_save, sender=StyleCodeData)
+@receiver(post_delete, sender=StyleCodeData)
+def bump_style_code_data_on_write(sender, **kwargs):
+    bump_version('style_code_data')
@@ -0,0 +1,67 @@
+"""
+商品名称全文搜索
+
+MySQL上使用ngram分词的FULLTEXT索引（迁移0021创建，ngram_token_size默认为2），
+以BOOLEAN MODE的短语匹配代替name LIKE '%关键词%'的全表扫描，并按相关度排序。
+ngram索引无法匹配短于ngram_token_size的词（如单个汉字），这类关键词和非MySQL数据库
+（本地开发的sqlite）仍使用LIKE查询。两种方式按同样的规则拆分关键词，每个关键词都必须出现在名称中，
+同一个搜索词无论走哪种方式，匹配到的商品一致。
+
+联想词使用款式名称上的普通索引做前缀匹配（LIKE '前缀%'）。
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import StyleCodeData
+
+# 与MySQL的ngram_token_size一致
+NGRAM_TOKEN_SIZE = 2
+# BOOLEAN MODE中有特殊含义的字符，关键词中出现时按空格处理
+BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+# 联想词最多返回的条数
+SUGGESTION_LIMIT = 10
+
+
+def split_keywords(search_str):
+    return BOOLEAN_OPERATORS.sub(' ', search_str).split()
+
+
+def fulltext_enabled(keywords):
+    return connection.vendor == 'mysql' and bool(keywords) and all(len(word) >= NGRAM_TOKEN_SIZE for word in keywords)
+
+
+def search_by_name(queryset, search_str, order_by):
+    """
+    按名称搜索queryset，返回(结果queryset, 是否使用全文索引)
+    使用全文索引时按相关度倒序排序，相关度相同时按order_by排序；否则退回name__icontains并按order_by排序
+    多个关键词（空格分隔）需要同时匹配
+    """
+    keywords = split_keywords(search_str)
+    if not fulltext_enabled(keywords):
+        # 与BOOLEAN MODE的+"关键词"一致：每个关键词分别LIKE匹配，全部满足；没有可用关键词时按原字符串匹配
+        condition = Q()
+        for word in keywords or [search_str]:
+            condition &= Q(name__icontains=word)
+        return queryset.filter(condition).order_by(*order_by), False
+
+    # 每个关键词作为必须出现的短语：+"关键词1" +"关键词2"
+    against = ' '.join(f'+"{word}"' for word in keywords)
+    column = f'{connection.ops.quote_name(queryset.model._meta.db_table)}.{connection.ops.quote_name("name")}'
+    relevance = RawSQL(f'MATCH({column}) AGAINST (%s IN BOOLEAN MODE)', [against])
+    queryset = queryset.annotate(relevance=relevance).filter(relevance__gt=0)
+    return queryset.order_by('-relevance', *order_by), True
+
+
+def suggest_style_names(prefix, limit=SUGGESTION_LIMIT):
+    """以prefix开头的款式名称，去重后按名称排序"""
+    # istartswith在MySQL上生成LIKE '前缀%'，可以使用stylecode_name_idx索引
+    return list(
+        StyleCodeData.objects
+        .filter(name__istartswith=prefix)
+        .order_by('name')
+        .values_list('name', flat=True)
+        .distinct()[:limit]
+    )
@@ -0,0 +1,92 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from access_token.models import AccessToken
+
+from . import catalogue
+from .models import Commodity, CommodityImage, CommoditySituation, StyleCodeSituation
+
+
+class GoodsQueryQueryCountTests(TestCase):
+    """goods_query的查询次数不随每页商品数增长（商品和图片从商品目录快照中读取）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AccessToken.objects.create(ip_address='127.0.0.1', access_token='test-token')
+        # bulk_create不触发post_save信号，不会自动生成图片记录
+        commodity_ids = [(f'QC{i:04d}', f'QS{i // 3:03d}') for i in range(60)]
+        Commodity.objects.bulk_create([
+            Commodity(commodity_id=commodity_id, name=commodity_id, style_code=style_code, category='上衣', price=99.0, image='')
+            for commodity_id, style_code in commodity_ids
+        ])
+        CommoditySituation.objects.bulk_create([
+            CommoditySituation(commodity_id=commodity_id, style_code=style_code, status='online')
+            for commodity_id, style_code in commodity_ids
+        ])
+        CommodityImage.objects.bulk_create([
+            CommodityImage(commodity_id=commodity_id, image=f'commodities/{commodity_id}_{kind}.jpg', is_main=kind == 'main')
+            for commodity_id, _ in commodity_ids for kind in ('main', 'other')
+        ])
+        StyleCodeSituation.objects.bulk_create([
+            StyleCodeSituation(style_code=f'QS{j:03d}', status='online') for j in range(20)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        # 预热access_token缓存，之后的请求只统计接口本身的查询
+        self.post('goods_query', {'shopname': 'youlan_kids'})
+
+    def post(self, endpoint, payload):
+        return self.client.post(
+            f'/commodity/{endpoint}?access_token=test-token', data=json.dumps(payload), content_type='application/json',
+        )
+
+    def count_queries(self, endpoint, payload):
+        # 丢弃当前worker的商品目录快照，统计包括快照加载在内的全部查询
+        catalogue.current_snapshot = None
+        with CaptureQueriesContext(connection) as context:
+            response = self.post(endpoint, payload)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def test_goods_query_count_independent_of_page_size(self):
+        for demand in [None, 'goods', 'style_code']:
+            counts = []
+            for page_size in [1, 20, 50]:
+                count, body = self.count_queries('goods_query', {
+                    'shopname': 'youlan_kids', 'demand': demand, 'page_size': page_size,
+                })
+                self.assertEqual(len(body['data']), min(page_size, 20 if demand == 'style_code' else 60))
+                counts.append(count)
+            # 快照加载：商品状态、商品、上线款式、商品图片各一次
+            self.assertEqual(counts, [4, 4, 4], demand)
+
+    def test_goods_query_images_grouped(self):
+        _, body = self.count_queries('goods_query', {'shopname': 'youlan_kids', 'page_size': 50})
+        item = body['data'][0]
+        self.assertTrue(item['main_image']['url'].endswith('_main.jpg'))
+        self.assertEqual(len(item['other_images']), 1)
+        self.assertEqual(len(item['images']), 2)
+
+    def test_warm_snapshot_needs_no_queries(self):
+        self.post('goods_query', {'shopname': 'youlan_kids'})
+        with self.assertNumQueries(0):
+            self.post('goods_query', {'shopname': 'youlan_kids', 'page_size': 50})
+            self.post('style-code/commodities', {'shopname': 'youlan_kids', 'style_code': 'QS001'})
+
+    def test_batch_get_by_ids_reads_database(self):
+        self.post('goods_query', {'shopname': 'youlan_kids'})
+        # 绕过Django信号的写入（如Go服务）不会递增快照版本号
+        Commodity.objects.filter(commodity_id='QC0001').update(name='新名称')
+        with self.assertNumQueries(1):
+            response = self.post('batch_get_products_by_ids', {'commodity_ids': ['QC0001', 'QC0000', 'missing']})
+        self.assertEqual(
+            [(item['commodity_id'], item['name']) for item in response.json()['data']],
+            [('QC0000', 'QC0000'), ('QC0001', '新名称')],
+        )
+        # 快照读取的接口在CATALOGUE_MAX_AGE内仍返回旧数据
+        self.assertEqual(catalogue.get_catalogue().records_by_id['QC0001'].name, 'QC0001')
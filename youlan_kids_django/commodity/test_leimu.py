@@ -0,0 +1,176 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import Commodity, CommodityMissingRecord
+
+
+class InventoryStubHandler(BaseHTTPRequestHandler):
+    """聚水潭/open/sku/query的本地桩：按server.products返回商品，server.fail_status不为空时返回该HTTP状态码"""
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        sku_ids = json.loads(form['biz'][0])['sku_ids'].split(',')
+        self.server.requests.append(sku_ids)
+        if self.server.fail_status:
+            self.send_response(self.server.fail_status)
+            self.end_headers()
+            return
+        datas = [dict(self.server.products[sku_id], sku_id=sku_id) for sku_id in sku_ids if sku_id in self.server.products]
+        body = json.dumps({'code': 0, 'msg': '', 'data': {'datas': datas}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LeimuSyncTests(TestCase):
+    """commodity/leimu.py的聚水潭商品同步：批量更新、断点续传、缺失商品两阶段对账、令牌桶限流"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # leimu导入时读取token，只在导入期间设置，不会请求正式环境，也不影响其他测试
+        with mock.patch.dict(os.environ, {'JUSHUITAN_ACCESS_TOKEN': 'test-token'}):
+            from commodity import leimu
+        cls.leimu = leimu
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), InventoryStubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        checkpoint_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, checkpoint_dir, True)
+        for name, value in {
+            'api_base_url': f'http://127.0.0.1:{self.server.server_port}',
+            'checkpoint_file': os.path.join(checkpoint_dir, 'checkpoint.json'),
+            'rate_limiter': self.leimu.TokenBucket(1000),
+            'max_retries': 0,
+        }.items():
+            patcher = mock.patch.object(self.leimu, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.commodity_ids = [f'SKU{i:03d}' for i in range(50)]
+        Commodity.objects.bulk_create([
+            Commodity(commodity_id=commodity_id, name=commodity_id, style_code='S1', category='旧类目', price=1.0, image='')
+            for commodity_id in self.commodity_ids
+        ])
+        self.server.requests = []
+        self.server.fail_status = None
+        self.server.products = {
+            commodity_id: {'other_6': '上衣', 'vc_name': 'T恤', 'sale_price': '59.9'} for commodity_id in self.commodity_ids
+        }
+
+    def sync(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return self.leimu.batch_process_commodities(workers=1, **kwargs)
+
+    def sync_interrupted_at_second_batch(self, **kwargs):
+        """第二个批次写库时模拟同步进程中断，断点停在第一个批次"""
+        apply_commodity_batch = self.leimu.apply_commodity_batch
+        calls = []
+
+        def crash_on_second_batch(sku_ids, response, run=None):
+            calls.append(sku_ids)
+            if len(calls) == 2:
+                raise RuntimeError('模拟同步进程中断')
+            return apply_commodity_batch(sku_ids, response, run)
+
+        with mock.patch.object(self.leimu, 'apply_commodity_batch', crash_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.sync(**kwargs)
+
+    def test_sync_updates_only_changed_rows(self):
+        self.server.products['SKU007']['sale_price'] = '99'
+        self.sync()
+        self.assertEqual(Commodity.objects.filter(category='上衣', category_detail='T恤', price=59.9).count(), 49)
+        self.assertEqual(Commodity.objects.get(commodity_id='SKU007').price, 99.0)
+        # 每批最多20个商品ID
+        self.assertEqual([len(ids) for ids in self.server.requests], [20, 20, 10])
+
+        # 数据没有变化时不执行UPDATE
+        with CaptureQueriesContext(connection) as context:
+            self.sync()
+        self.assertFalse([query for query in context.captured_queries if query['sql'].startswith('UPDATE "Commodity"')])
+
+    def test_resume_from_checkpoint_after_failure(self):
+        self.sync_interrupted_at_second_batch()
+        checkpoint = self.leimu.load_checkpoint()
+        self.assertEqual(checkpoint['last_commodity_id'], 'SKU019')
+        self.assertEqual(checkpoint['processed'], 20)
+        self.assertEqual(Commodity.objects.filter(category='上衣').count(), 20)
+
+        self.server.requests = []
+        self.sync()
+        # 从断点的下一个商品继续，已完成的批次不再请求
+        self.assertEqual(self.server.requests[0][0], 'SKU020')
+        self.assertEqual(sum(len(ids) for ids in self.server.requests), 30)
+        self.assertEqual(Commodity.objects.filter(category='上衣').count(), 50)
+        self.assertIsNone(self.leimu.load_checkpoint())
+
+    def test_resumed_run_counts_missing_once(self):
+        del self.server.products['SKU003']
+        self.sync_interrupted_at_second_batch(missing_runs=3)
+        self.sync(missing_runs=3)
+        self.assertEqual(CommodityMissingRecord.objects.get(commodity_id='SKU003').missing_runs, 1)
+
+    def test_missing_commodities_deleted_after_threshold(self):
+        del self.server.products['SKU003']
+        del self.server.products['SKU004']
+
+        for run in range(1, 3):
+            self.sync(missing_runs=3)
+            self.assertEqual(Commodity.objects.filter(commodity_id__in=['SKU003', 'SKU004']).count(), 2)
+            self.assertEqual(
+                dict(CommodityMissingRecord.objects.values_list('commodity_id', 'missing_runs')),
+                {'SKU003': run, 'SKU004': run},
+            )
+
+        # SKU004重新出现：缺失记录被清除，不会被删除
+        self.server.products['SKU004'] = {'other_6': '上衣', 'vc_name': 'T恤', 'sale_price': '59.9'}
+        self.sync(missing_runs=3)
+        self.assertFalse(Commodity.objects.filter(commodity_id='SKU003').exists())
+        self.assertTrue(Commodity.objects.filter(commodity_id='SKU004').exists())
+        self.assertFalse(CommodityMissingRecord.objects.exists())
+
+    def test_api_failure_changes_nothing(self):
+        self.server.fail_status = 503
+        self.sync(missing_runs=1)
+        self.assertEqual(Commodity.objects.filter(category='旧类目').count(), 50)
+        self.assertFalse(CommodityMissingRecord.objects.exists())
+
+    def test_token_bucket_limits_rate(self):
+        bucket = self.leimu.TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # 第一个令牌立即可用，之后每个令牌间隔1/50秒
+        self.assertGreaterEqual(time.monotonic() - started, 5 / 50 * 0.9)
+
+        with mock.patch.object(self.leimu, 'rate_limiter', self.leimu.TokenBucket(rate=20, capacity=1)):
+            started = time.monotonic()
+            self.sync()
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertGreaterEqual(time.monotonic() - started, 2 / 20 * 0.9)
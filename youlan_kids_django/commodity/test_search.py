@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from . import search
+from .models import Commodity
+
+
+class SearchByNameTests(TestCase):
+    """名称搜索：LIKE回退与FULLTEXT BOOLEAN MODE使用同样的关键词拆分，所有关键词都要匹配"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Commodity.objects.bulk_create([
+            Commodity(commodity_id=commodity_id, name=name, style_code=commodity_id, category='裙装', price=99.0, image='')
+            for commodity_id, name in [
+                ('S001', '红色 碎花 连衣裙'),
+                ('S002', '连衣裙 红色'),
+                ('S003', '蓝色 连衣裙'),
+                ('S004', '红色 卫衣'),
+            ]
+        ])
+
+    def search_ids(self, search_str):
+        queryset, fulltext = search.search_by_name(Commodity.objects.all(), search_str, ['commodity_id'])
+        return list(queryset.values_list('commodity_id', flat=True)), fulltext
+
+    def test_fallback_matches_every_keyword(self):
+        # sqlite不支持全文索引，走LIKE回退；关键词顺序、间隔的其他文字不影响匹配
+        self.assertEqual(self.search_ids('红色 连衣裙'), (['S001', 'S002'], False))
+        self.assertEqual(self.search_ids('连衣裙 红色'), (['S001', 'S002'], False))
+        # BOOLEAN MODE的运算符按空格处理
+        self.assertEqual(self.search_ids('+红色 -连衣裙'), (['S001', 'S002'], False))
+        self.assertEqual(self.search_ids('连衣裙'), (['S001', 'S002', 'S003'], False))
+        self.assertEqual(self.search_ids('红 裙'), (['S001', 'S002'], False))
+
+    def test_short_keyword_uses_fallback_on_mysql(self):
+        with mock.patch.object(search.connection, 'vendor', 'mysql'):
+            queryset, fulltext = search.search_by_name(Commodity.objects.all(), '红 连衣裙', ['commodity_id'])
+        self.assertFalse(fulltext)
+        self.assertEqual(list(queryset.values_list('commodity_id', flat=True)), ['S001', 'S002'])
+
+    def test_fulltext_requires_every_keyword(self):
+        with mock.patch.object(search.connection, 'vendor', 'mysql'):
+            queryset, fulltext = search.search_by_name(Commodity.objects.all(), '红色 连衣裙', ['commodity_id'])
+        self.assertTrue(fulltext)
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn('MATCH(', sql)
+        self.assertIn('IN BOOLEAN MODE', sql)
+        self.assertIn('+"红色" +"连衣裙"', params)
@@ -3,7 +3,9 @@ from . import views
 
 urlpatterns = [
     path('get_all_categories', views.get_all_categories, name='get_all_categories'),
+    path('get_category_tree', views.get_category_tree, name='get_category_tree'),
     path('search_style_codes', views.search_style_codes, name='search_style_codes'),
+    path('search_suggestions', views.search_suggestions, name='search_suggestions'),
     path('add_goods',views.add_goods),
     path('delete_goods',views.delete_goods),
     path('search_commodity_data', views.search_commodity_data, name='search_commodity_data'),
@@ -19,4 +21,5 @@ urlpatterns = [
     path('style-code/status/offline', views.change_style_code_status_offline, name='change_style_code_status_offline'),
     # 根据style_code查询具体商品
     path('style-code/commodities', views.get_commodities_by_style_code, name='get_commodities_by_style_code'),
+    path('catalogue_stats', views.catalogue_stats, name='catalogue_stats'),
 ]
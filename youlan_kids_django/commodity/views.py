@@ -3,17 +3,23 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from .models import Commodity, CommoditySituation, CommodityImage, StyleCodeSituation, StyleCodeData
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 from django.db import IntegrityError, transaction, models
 import logging
 import json
-from django.http import JsonResponse
+from operator import attrgetter
+from django.http import HttpResponse, JsonResponse
+from django.utils.http import quote_etag
+from youlan_kids_django.table_versions import etag_from_versions
+from .catalogue import dedupe_style_codes, get_catalogue, get_catalogue_stats
+from .search import SUGGESTION_LIMIT, search_by_name, suggest_style_names
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 # 初始化审计日志
 logger = logging.getLogger(__name__)
 audit_logger = logging.getLogger('audit')
 
+
 @csrf_exempt
 @require_http_methods("POST")
 def batch_get_products_by_ids(request):  # 批量根据ID查询商品
@@ -25,8 +31,12 @@ def batch_get_products_by_ids(request):  # 批量根据ID查询商品
         if not commodity_ids or not isinstance(commodity_ids, list):
             return JsonResponse({'code': 400, 'message': '商品ID列表不能为空且必须是数组'}, status=400)
 
-        # 批量查询商品
-        commodities = Commodity.objects.filter(commodity_id__in=commodity_ids)
+        # 按主键批量查询，不使用商品目录快照：按ID查询总是返回最新数据，包括绕过Django信号的写入
+        commodities = Commodity.objects.filter(
+            commodity_id__in={str(commodity_id) for commodity_id in commodity_ids}
+        ).only(
+            'commodity_id', 'name', 'style_code', 'category', 'price', 'image', 'promo_image', 'size', 'color', 'created_at',
+        ).order_by('commodity_id')
 
         # 构建响应数据
         result = []
@@ -82,8 +92,8 @@ def search_products_by_name(request):  # 根据名称搜索商品
         if not search_str:
             return JsonResponse({'code': 400, 'message': '搜索字符串不能为空'}, status=400)
         
-        # 搜索商品名称中包含搜索字符串的商品
-        commodities_query = Commodity.objects.filter(name__icontains=search_str)
+        # 搜索商品名称中包含搜索字符串的商品，MySQL上使用全文索引并按相关度排序
+        commodities_query, _ = search_by_name(Commodity.objects.all(), search_str, ['commodity_id'])
         
         # 计算总记录数和总页数
         total_count = commodities_query.count()
@@ -131,6 +141,7 @@ def search_products_by_name(request):  # 根据名称搜索商品
 
 @csrf_exempt
 @require_http_methods("POST")
+@etag_from_versions('catalogue')
 def get_all_categories(request):   #获取所有商品类别
 
     try:
@@ -140,20 +151,41 @@ def get_all_categories(request):   #获取所有商品类别
         if data.get('shopname') != 'youlan_kids':
             return JsonResponse({'code': 400, 'message': '无效的店铺名称'}, status=400)
         
-        # 查询所有不重复的商品类别
-        categories = Commodity.objects.values_list('category', flat=True).distinct().order_by('category')
-        # 转换为列表
-        category_list = list(categories)
+        # 商品目录快照中所有不重复的商品类别
+        category_list = list(get_catalogue().categories)
         return JsonResponse({'code': 200, 'message': '查询成功', 'data': category_list})
     except json.JSONDecodeError:
         return JsonResponse({'error': '无效的JSON格式'}, status=400)
     except Exception as e:
         logger.error(f'查询类别失败: {str(e)}', exc_info=True)
-        return JsonResponse({'code': 500, 'message': f'查询失败: {str(e)}'})
+        return JsonResponse({'code': 500, 'message': f'查询失败: {str(e)}'}, status=500)
+
+
+
+def category_tree_etag(request):
+    return get_catalogue().category_tree_etag
 
 
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=category_tree_etag)
+def get_category_tree(request):  # 获取类目树：类目 -> 商品分类 -> 上线款式数
+    # 验证shop参数
+    if request.GET.get('shopname') != 'youlan_kids':
+        return JsonResponse({'code': 400, 'message': '无效的店铺名称'}, status=400)
+
+    # 类目树随商品目录快照生成，响应体已提前序列化；客户端携带If-None-Match且内容未变化时由condition返回304
+    catalogue = get_catalogue()
+    response = HttpResponse(catalogue.category_tree_body, content_type='application/json')
+    # ETag与响应体取自同一份快照
+    response['ETag'] = quote_etag(catalogue.category_tree_etag)
+    # 客户端可以缓存，但每次使用前需要携带ETag重新验证
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 @csrf_exempt
 @require_http_methods("POST")
+@etag_from_versions('style_code_data')
 def search_style_codes(request):  # 搜索款式编码名称
     try:
         # 解析请求体
@@ -181,8 +213,8 @@ def search_style_codes(request):  # 搜索款式编码名称
         except ValueError:
             return JsonResponse({'code': 400, 'message': '分页参数必须为正整数'}, status=400)
         
-        # 根据关键词筛选StyleCodeData模型中的name字段
-        style_code_data_list = StyleCodeData.objects.filter(name__icontains=search_keyword).order_by('style_code')
+        # 根据关键词筛选StyleCodeData模型中的name字段，MySQL上使用全文索引并按相关度排序
+        style_code_data_list, _ = search_by_name(StyleCodeData.objects.all(), search_keyword, ['style_code'])
         
         # 计算总条数
         total_count = style_code_data_list.count()
@@ -229,7 +261,39 @@ def search_style_codes(request):  # 搜索款式编码名称
         return JsonResponse({'error': '无效的JSON格式'}, status=400)
     except Exception as e:
         logger.error(f'搜索款式编码名称失败: {str(e)}', exc_info=True)
-        return JsonResponse({'code': 500, 'message': f'查询失败: {str(e)}'})
+        return JsonResponse({'code': 500, 'message': f'查询失败: {str(e)}'}, status=500)
+
+
+@csrf_exempt
+@require_http_methods("POST")
+def search_suggestions(request):  # 款式名称前缀联想
+    try:
+        data = json.loads(request.body)
+        # 验证shop参数
+        if data.get('shopname') != 'youlan_kids':
+            return JsonResponse({'code': 400, 'message': '无效的店铺名称'}, status=400)
+
+        prefix = data.get('prefix', '').strip()
+        if not prefix:
+            return JsonResponse({'code': 400, 'message': '联想前缀不能为空'}, status=400)
+
+        try:
+            limit = min(int(data.get('limit', SUGGESTION_LIMIT)), 50)
+            if limit < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            return JsonResponse({'code': 400, 'message': 'limit必须为正整数'}, status=400)
+
+        return JsonResponse({
+            'code': 200,
+            'message': '查询成功',
+            'data': suggest_style_names(prefix, limit)
+        })
+    except json.JSONDecodeError:
+        return JsonResponse({'code': 400, 'message': '无效的JSON格式'}, status=400)
+    except Exception as e:
+        logger.error(f'款式名称联想失败: {str(e)}', exc_info=True)
+        return JsonResponse({'code': 500, 'message': f'查询失败: {str(e)}'}, status=500)
 
 @csrf_exempt
 @require_http_methods(['POST'])
@@ -576,7 +640,7 @@ def search_commodity_data(request):   #查询商品信息
                         result[field] = value
 
         # 添加所有图片信息
-        commodity_images = CommodityImage.objects.filter(commodity_id=commodity_id)
+        commodity_images = CommodityImage.objects.filter(commodity_id=commodity.commodity_id).order_by('created_at', 'id')
         images = []
         for img in commodity_images:
             image_info = {
@@ -739,18 +803,10 @@ def get_commodities_by_style_code(request):
         if not style_code:
             return JsonResponse({'error': '缺少style_code参数'}, status=400)
         
-        # 查询该style_code下的所有商品
-        commodities = Commodity.objects.filter(style_code=style_code)
-        
-        # 查询商品状态，只返回上线商品
-        online_commodity_ids = CommoditySituation.objects.filter(
-            status='online', 
-            commodity_id__in=commodities.values_list('commodity_id', flat=True)
-        ).values_list('commodity_id', flat=True)
-        
-        # 过滤出上线的商品
-        commodities = commodities.filter(commodity_id__in=online_commodity_ids)
-        
+        # 从商品目录快照中读取该style_code下的上线商品
+        catalogue = get_catalogue()
+        commodities = [commodity for commodity in catalogue.by_style_code.get(style_code, ()) if commodity.status == 'online']
+
         # 构建响应数据
         result = {
             'name': '',
@@ -771,12 +827,12 @@ def get_commodities_by_style_code(request):
                 result['price'] = commodity.price
                 
                 # 获取该商品的所有图片信息（作为style_code的图片组）
-                commodity_images = CommodityImage.objects.filter(commodity=commodity)
+                commodity_images = catalogue.images.get(commodity.commodity_id, ())
                 images = []
                 for img in commodity_images:
                     image_info = {
                         'id': img.id,
-                        'url': request.build_absolute_uri(img.image.url) if img.image else None,
+                        'url': request.build_absolute_uri(img.url) if img.url else None,
                         'is_main': img.is_main,
                         'created_at': (img.created_at + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")
                     }
@@ -785,8 +841,8 @@ def get_commodities_by_style_code(request):
                 # 如果没有从CommodityImage获取到图片，使用商品本身的图片作为备选
                 if not images:
                     # 优先使用image字段
-                    if commodity.image:
-                        main_image_url = request.build_absolute_uri(commodity.image.url)
+                    if commodity.image_url:
+                        main_image_url = request.build_absolute_uri(commodity.image_url)
                         images.append({
                             'id': None,
                             'url': main_image_url,
@@ -794,8 +850,8 @@ def get_commodities_by_style_code(request):
                             'created_at': (commodity.created_at + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")
                         })
                     # 再检查promo_image字段
-                    elif commodity.promo_image:
-                        promo_image_url = request.build_absolute_uri(commodity.promo_image.url)
+                    elif commodity.promo_image_url:
+                        promo_image_url = request.build_absolute_uri(commodity.promo_image_url)
                         images.append({
                             'id': None,
                             'url': promo_image_url,
@@ -812,9 +868,9 @@ def get_commodities_by_style_code(request):
                 result['other_images'] = other_images
             
             # 获取color_image，如果为空则使用image
-            color_image = request.build_absolute_uri(commodity.color_image.url) if hasattr(commodity, 'color_image') and commodity.color_image else None
-            if not color_image and commodity.image:
-                color_image = request.build_absolute_uri(commodity.image.url)
+            color_image = request.build_absolute_uri(commodity.color_image_url) if commodity.color_image_url else None
+            if not color_image and commodity.image_url:
+                color_image = request.build_absolute_uri(commodity.image_url)
             
             # 按颜色分组
             color = commodity.color
@@ -852,6 +908,7 @@ def get_commodities_by_style_code(request):
 
 @csrf_exempt
 @require_http_methods(['POST'])
+@etag_from_versions('catalogue')
 def goods_query(request):   #
     try:
         data = json.loads(request.body)
@@ -861,33 +918,41 @@ def goods_query(request):   #
         
         # 获取demand参数
         demand = data.get('demand')
-        
-        # 如果指定了demand为style_code或goods，使用特定逻辑
+
+        # 从商品目录快照中筛选，快照中的商品已按created_at倒序排列
+        catalogue = get_catalogue()
+
+        # 如果指定了demand为style_code或goods，只返回StyleCodeSituation中status为online的商品，
+        # 使用快照中预先过滤好的索引
         if demand in ['style_code', 'goods']:
-            # 获取style_code和category参数
-            style_code = data.get('style_code')
-            category = data.get('category')
-            
-            # 只返回StyleCodeSituation中status为online的商品
-            online_style_codes = StyleCodeSituation.objects.filter(status='online').values_list('style_code', flat=True)
-            
-            # 构建查询集
-            commodities = Commodity.objects.filter(style_code__in=online_style_codes)
-            
-            # 如果demand不是style_code，但提供了style_code，进一步过滤
-            if demand != 'style_code' and style_code:
-                commodities = commodities.filter(style_code=style_code)
-            
-            # 如果提供了category，进一步过滤
-            if category:
-                if isinstance(category, list):
-                    commodities = commodities.filter(category__in=category)
-                else:
-                    commodities = commodities.filter(category=category)
+            newest_first, by_category = catalogue.online_newest_first, catalogue.online_by_category
         else:
-            # 原始逻辑：查询所有商品
-            commodities = Commodity.objects.all().only('commodity_id', 'name', 'style_code', 'category', 'price', 'created_at')
-        
+            newest_first, by_category = catalogue.newest_first, catalogue.by_category
+
+        # 处理类目过滤，支持单个类目或类目列表筛选；单个类目直接使用快照的类目索引
+        category = data.get('category')
+        if not category:
+            commodities = newest_first
+        elif isinstance(category, list):
+            categories = set(category)
+            commodities = [c for c in newest_first if c.category in categories]
+        else:
+            commodities = by_category.get(category, ())
+
+        # 如果demand不是style_code，但提供了style_code，只取该款式的商品
+        style_code = data.get('style_code')
+        if demand == 'goods' and style_code:
+            if style_code in catalogue.online_style_codes:
+                # 款式索引按created_at正序，稳定倒序排序后同一时间的商品仍按commodity_id排列，与newest_first一致
+                style_commodities = sorted(catalogue.by_style_code.get(style_code, ()), key=attrgetter('created_at'), reverse=True)
+                if not category:
+                    commodities = style_commodities
+                else:
+                    categories = set(category) if isinstance(category, list) else {category}
+                    commodities = [c for c in style_commodities if c.category in categories]
+            else:
+                commodities = []
+
         # 处理状态过滤
         status = data.get('status')
         if status:
@@ -895,20 +960,10 @@ def goods_query(request):   #
             valid_statuses = [choice[0] for choice in CommoditySituation.STATUS_CHOICES]
             if status not in valid_statuses:
                 return JsonResponse({'error': '无效的状态值'}, status=400)
-            
-            # 获取符合状态的商品ID列表
-            situation_ids = CommoditySituation.objects.filter(status=status).values_list('commodity_id', flat=True)
-            commodities = commodities.filter(commodity_id__in=situation_ids)
-        
-        # 处理类目过滤
-        category = data.get('category')
-        if category and demand != 'style_code':  # style_code需求时不重复应用类目过滤
-            # 支持单个类目或类目列表筛选
-            if isinstance(category, list):
-                commodities = commodities.filter(category__in=category)
-            else:
-                commodities = commodities.filter(category=category)
-        
+
+            # 只保留符合状态的商品
+            commodities = [c for c in commodities if c.status == status]
+
         # 处理分页参数
         page = data.get('page', 1)
         page_size = data.get('page_size', 20)
@@ -925,32 +980,20 @@ def goods_query(request):   #
         except (ValueError, TypeError):
             return JsonResponse({'error': '无效的分页参数'}, status=400)
         
-        # 对查询集进行排序
-        commodities = commodities.order_by('-created_at')
-        
         # 当demand为style_code时，相同的style_code只返回一条记录
         if demand == 'style_code':
-            # 首先执行查询获取所有记录
-            all_commodities = list(commodities)
-            
-            # 使用字典去重，确保每个style_code只保留一条最新记录
-            unique_commodities = []
-            seen_style_codes = set()
-            
-            for commodity in all_commodities:
-                if commodity.style_code not in seen_style_codes:
-                    seen_style_codes.add(commodity.style_code)
-                    unique_commodities.append(commodity)
-            
-            # 将去重后的结果转换为一个自定义的分页器兼容对象
-            from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-            
-            # 手动处理分页
+            if status or isinstance(category, list):
+                # 按状态或多个类目过滤后的结果需要在请求中去重
+                unique_commodities = dedupe_style_codes(commodities)
+            elif category:
+                # 快照建立时已按类目去重，直接分页
+                unique_commodities = catalogue.style_heads_by_category.get(category, ())
+            else:
+                unique_commodities = catalogue.style_heads
+
             total = len(unique_commodities)
             start = (page - 1) * page_size
             end = start + page_size
-            
-            # 获取当前页的数据
             current_page_commodities = unique_commodities[start:end]
             
             # 创建一个简单的对象来模拟查询集和分页结果
@@ -982,21 +1025,24 @@ def goods_query(request):   #
                 # 如果页码超出范围，返回最后一页
                 commodities_page = paginator.page(paginator.num_pages)
         
+        # 当前页商品的图片从快照中读取
+        page_commodities = list(commodities_page)
+
         result = []
-        for commodity in commodities_page:
+        for commodity in page_commodities:
             # 根据demand参数决定返回数据格式
             if demand in ['style_code', 'goods']:
                 # 对于style_code或goods需求，只返回指定字段
                 # 构建promo_image_url，当为空时使用image的值
-                if commodity.promo_image:
-                    promo_image_url = request.build_absolute_uri(commodity.promo_image.url)
-                elif commodity.image:
-                    promo_image_url = request.build_absolute_uri(commodity.image.url)
+                if commodity.promo_image_url:
+                    promo_image_url = request.build_absolute_uri(commodity.promo_image_url)
+                elif commodity.image_url:
+                    promo_image_url = request.build_absolute_uri(commodity.image_url)
                 else:
                     # 查找第一个主图作为备用
-                    main_image = CommodityImage.objects.filter(commodity=commodity, is_main=True).first()
+                    main_image = next((img for img in catalogue.images.get(commodity.commodity_id, ()) if img.is_main), None)
                     if main_image:
-                        promo_image_url = request.build_absolute_uri(main_image.image.url)
+                        promo_image_url = request.build_absolute_uri(main_image.url)
                     else:
                         promo_image_url = None
                 
@@ -1013,14 +1059,14 @@ def goods_query(request):   #
                 formatted_time = created_time.strftime('%Y-%m-%d %H:%M:%S')
                 
                 # 获取商品的所有图片
-                commodity_images = CommodityImage.objects.filter(commodity=commodity).order_by('created_at')
+                commodity_images = catalogue.images.get(commodity.commodity_id, ())
                 
                 # 构建图片URL列表
                 image_urls = []
                 for img in commodity_images:
                     image_urls.append({
                         'id': img.id,
-                        'url': request.build_absolute_uri(img.image.url),
+                        'url': request.build_absolute_uri(img.url),
                         'is_main': img.is_main,
                         'created_at': img.created_at.strftime('%Y-%m-%d %H:%M:%S')
                     })
@@ -1032,7 +1078,7 @@ def goods_query(request):   #
                     'style': commodity.style_code,
                     'category': commodity.category,
                     'price': commodity.price,
-                    'promo_image_url': request.build_absolute_uri(commodity.promo_image.url) if commodity.promo_image else None,
+                    'promo_image_url': request.build_absolute_uri(commodity.promo_image_url) if commodity.promo_image_url else None,
                     'images': image_urls,
                     'main_image': next((img for img in image_urls if img['is_main']), None),
                     'other_images': [img for img in image_urls if not img['is_main']],
@@ -1046,7 +1092,7 @@ def goods_query(request):   #
             'pagination': {
                 'total': commodities_page.paginator.count,
                 'page': commodities_page.number,
-                'page_size': commodities_page.paginator.page_size,
+                'page_size': page_size,
                 'pages': commodities_page.paginator.num_pages
             }
         })
@@ -1057,3 +1103,11 @@ def goods_query(request):   #
         return JsonResponse({'error': '服务器处理失败'}, status=500)
 
 
+@csrf_exempt
+def catalogue_stats(request):
+    """返回处理本次请求的worker的商品目录快照统计"""
+    return JsonResponse({
+        'code': 200,
+        'message': '查询成功',
+        'data': get_catalogue_stats()
+    })
@@ -1,9 +1,13 @@
+import hashlib
 import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+import openpyxl
 import pandas as pd
-from datetime import datetime
 from decimal import Decimal
-from django.db import transaction
+from django.db import connections, transaction
 from django.utils import timezone
 
 # 设置Django环境
@@ -14,179 +18,425 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'youlan_kids_django.settings')
 import django
 django.setup()
 
-from finance.models import DaikuanXlsxIndex
+from finance.models import DaikuanImportManifest, DaikuanXlsxIndex
+from finance.rollup import refresh_period_rollups
 
+# 字段映射：Excel中的中文列名到模型字段名
+field_mapping = {
+    '账期': 'billing_period',
+    '账单大类': 'billing_category',
+    '业务大类': 'business_category',
+    '业务小类': 'business_subcategory',
+    '订单号': 'order_number',
+    '子订单号': 'sub_order_number',
+    '下单时间': 'order_time',
+    '确认收货时间': 'delivery_time',
+    '商品ID': 'product_id',
+    'sku': 'sku',
+    '商品名称': 'product_name',
+    '数量': 'quantity',
+    '单价（元）': 'unit_price',
+    '订单实际金额（元）': 'actual_amount',
+    '退款单号': 'refund_number',
+    '退款金额（元）': 'refund_amount',
+    '收/付渠道': 'payment_channel',
+    '业务流水号': 'transaction_id',
+    '商户订单号': 'merchant_order_number',
+    '打款时间': 'payment_time',
+    '打款更新时间': 'payment_update_time',
+    '备注': 'remarks'
+}
+# 需要按列统一转换类型的字段
+quantity_fields = ['quantity']
+amount_fields = ['unit_price', 'actual_amount', 'refund_amount']
+datetime_fields = ['order_time', 'delivery_time', 'payment_time', 'payment_update_time']
+# 每次bulk_create写入的记录数
+bulk_create_batch_size = 1000
+# 流式解析：超过该大小的文件用openpyxl只读模式按块读取，每块的行数
+stream_min_file_size = 20 * 1024 * 1024
+stream_chunk_size = 5000
 
-def import_all_xlsx_to_db(folder_path):
+
+def coerce_dataframe(df):
+    """
+    按列把Excel数据转换为模型字段类型，返回(转换后的DataFrame, 跳过的行数, 日期无法识别的行数)
+    子订单号为空、必填字段为空或字符串超长的行会被跳过（逐行保存时这些行同样会写入失败）
+    日期时间有值但无法识别的行仍然导入（该字段为空），行数单独统计并打印示例
+    """
+    # 子订单号为空则跳过
+    df = df[df['子订单号'].notna() & (df['子订单号'].astype(str).str.strip() != '')]
+    result = pd.DataFrame(index=df.index)
+    bad_dates = pd.Series(False, index=df.index)
+
+    for excel_col, model_field in field_mapping.items():
+        column = df[excel_col]
+        missing = column.isna()
+
+        if model_field in quantity_fields:
+            # 清除空格并转换为整数，空字符串按0处理
+            values = pd.to_numeric(column.astype(str).str.strip().replace('', '0'), errors='coerce')
+            result[model_field] = values.where(~missing).apply(lambda v: None if pd.isna(v) else int(v))
+        elif model_field in amount_fields:
+            # 清除空格并转换为Decimal，空字符串或无法转换的值按0处理
+            values = pd.to_numeric(column.astype(str).str.strip(), errors='coerce').fillna(0).round(2)
+            result[model_field] = values.where(~missing).apply(lambda v: None if pd.isna(v) else Decimal(f'{v:.2f}'))
+        elif model_field in datetime_fields:
+            # 逐个值推断日期格式（format='mixed'）：pandas 2.x默认按第一个值推断整列的格式，
+            # 同一列中其他格式的日期会被转换为空；没有时区信息的按当前时区处理
+            values = pd.to_datetime(column, errors='coerce', format='mixed')
+            if values.dt.tz is None:
+                values = values.dt.tz_localize(str(timezone.get_current_timezone()), ambiguous='NaT', nonexistent='NaT')
+            unparsed = values.isna() & ~missing & (column.astype(str).str.strip() != '')
+            if unparsed.any():
+                samples = ', '.join(repr(value) for value in column[unparsed].head(5))
+                print(f"{excel_col}有 {int(unparsed.sum())} 个值无法识别为日期时间，按空值导入，例如: {samples}")
+                bad_dates |= unparsed
+            result[model_field] = pd.Series(values.dt.to_pydatetime(), index=values.index, dtype=object).where(values.notna(), None)
+        else:
+            # sku等字段可能为数字，统一转换为字符串
+            result[model_field] = column.astype(str).where(~missing, None)
+
+    # 按模型定义校验必填字段和字符串长度
+    invalid = pd.Series(False, index=result.index)
+    for field in DaikuanXlsxIndex._meta.concrete_fields:
+        if field.name not in result.columns:
+            continue
+        if not field.null:
+            invalid |= result[field.name].isna()
+        if field.get_internal_type() == 'CharField':
+            invalid |= result[field.name].str.len() > field.max_length
+
+    return result[~invalid], int(invalid.sum()), int((bad_dates & ~invalid).sum())
+
+
+def natural_key(record):
+    """DaikuanXlsxIndex的自然键，与模型中的唯一约束一致"""
+    return record['sub_order_number'], record['billing_period'], record['billing_category']
+
+
+def should_replace(new_amount, existing_amount):
+    """重复记录的更新规则：新记录的订单实际金额不为0且与已有记录不同时才更新"""
+    return new_amount is not None and new_amount != Decimal('0') and new_amount != existing_amount
+
+
+def upsert_records(records):
+    """
+    按自然键批量写入记录，返回(新增数量, 更新数量, 未变化数量)
+    每批先用一次查询取出已存在的自然键，新记录bulk_create，需要更新的记录bulk_update，
+    其余记录不产生写操作，重复导入同一批文件时只有查询开销
+    """
+    # 文件内部的重复自然键按出现顺序套用同样的更新规则
+    latest = {}
+    for record in records:
+        key = natural_key(record)
+        if key not in latest or should_replace(record['actual_amount'], latest[key]['actual_amount']):
+            latest[key] = record
+
+    update_fields = [field for field in field_mapping.values() if field != 'sub_order_number'] + ['updated_at']
+    created_count = updated_count = unchanged_count = 0
+    keys = list(latest)
+    for start in range(0, len(keys), bulk_create_batch_size):
+        batch_keys = keys[start:start + bulk_create_batch_size]
+        existing = {
+            (sub_order_number, billing_period, billing_category): (record_id, actual_amount)
+            for record_id, sub_order_number, billing_period, billing_category, actual_amount in (
+                DaikuanXlsxIndex.objects
+                .filter(sub_order_number__in={key[0] for key in batch_keys})
+                .values_list('id', 'sub_order_number', 'billing_period', 'billing_category', 'actual_amount')
+            )
+        }
+
+        records_to_create = []
+        records_to_update = []
+        now = timezone.now()
+        for key in batch_keys:
+            record = latest[key]
+            if key not in existing:
+                records_to_create.append(DaikuanXlsxIndex(**record))
+            elif should_replace(record['actual_amount'], existing[key][1]):
+                records_to_update.append(DaikuanXlsxIndex(id=existing[key][0], updated_at=now, **record))
+            else:
+                unchanged_count += 1
+
+        # 预查询已区分新增和更新，新增数量即实际写入的行数；写库只在当前进程中执行，
+        # 如果另一个导入进程同时写入了同一自然键，唯一约束报错，整个文件回滚并记为失败，清单不更新，下次重新导入
+        DaikuanXlsxIndex.objects.bulk_create(records_to_create)
+        if records_to_update:
+            DaikuanXlsxIndex.objects.bulk_update(records_to_update, update_fields)
+        created_count += len(records_to_create)
+        updated_count += len(records_to_update)
+
+    return created_count, updated_count, unchanged_count
+
+
+def file_sha256(file_path):
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return {'file_path': os.path.abspath(file_path), 'file_size': stat.st_size, 'file_mtime': stat.st_mtime}
+
+
+def is_file_unchanged(fingerprint, manifests, known_hashes):
+    """
+    大小和修改时间与清单一致时直接认为未变化；否则计算sha256，
+    内容与任意已导入文件相同（例如只是被复制或touch过）也认为未变化
+    计算出的sha256写回fingerprint
+    """
+    manifest = manifests.get(fingerprint['file_path'])
+    if manifest and manifest.file_size == fingerprint['file_size'] and manifest.file_mtime == fingerprint['file_mtime']:
+        fingerprint['sha256'] = manifest.sha256
+        return True
+    fingerprint['sha256'] = file_sha256(fingerprint['file_path'])
+    return fingerprint['sha256'] in known_hashes
+
+
+def save_manifest(fingerprint, row_count=None):
+    # 强制导入时跳过了变化检查，只在写入清单时计算一次哈希
+    if not fingerprint.get('sha256'):
+        fingerprint['sha256'] = file_sha256(fingerprint['file_path'])
+    defaults = {
+        'file_size': fingerprint['file_size'],
+        'file_mtime': fingerprint['file_mtime'],
+        'sha256': fingerprint['sha256'],
+    }
+    if row_count is not None:
+        defaults['row_count'] = row_count
+    DaikuanImportManifest.objects.update_or_create(file_path=fingerprint['file_path'], defaults=defaults)
+
+
+def check_columns(columns):
+    # 检查是否有必要的列
+    missing_columns = [col for col in field_mapping.keys() if col not in columns]
+    if missing_columns:
+        raise ValueError(f"缺少必要列: {', '.join(missing_columns)}")
+
+
+def parse_xlsx_file(file_path):
+    """
+    解析阶段：读取xlsx并整列转换类型，不访问数据库，可以在子进程中执行
+    缺少必要列时抛出ValueError
+    """
+    started = time.monotonic()
+    # 读取Excel文件；dtype=object保留单元格原值，与流式解析一致：
+    # 按列推断类型时，有空值的整数列会变成float，订单号等字段会被转换为'123.0'
+    df = pd.read_excel(file_path, dtype=object)
+    check_columns(df.columns)
+
+    records, skipped_count, bad_date_count = coerce_dataframe(df)
+    return {
+        'records': records.to_dict('records'),
+        'rows': len(df),
+        'skipped': skipped_count,
+        'bad_dates': bad_date_count,
+        'read_elapsed': time.monotonic() - started,
+    }
+
+
+def iter_xlsx_chunks(file_path, chunk_size=None):
+    """
+    流式解析：用openpyxl只读模式逐行读取，每chunk_size行转换一次类型后生成一个解析结果
+    内存占用只与chunk_size有关，与文件大小无关；缺少必要列时抛出ValueError
+    """
+    chunk_size = chunk_size or stream_chunk_size
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(value).strip() if value is not None else '' for value in header]
+        check_columns(columns)
+
+        while True:
+            started = time.monotonic()
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            # 与parse_xlsx_file一样保留单元格原值，不按块推断列类型，否则同一列在不同块中的转换结果可能不同
+            df = pd.DataFrame(chunk, columns=columns, dtype=object)
+            records, skipped_count, bad_date_count = coerce_dataframe(df)
+            yield {
+                'records': records.to_dict('records'),
+                'rows': len(df),
+                'skipped': skipped_count,
+                'bad_dates': bad_date_count,
+                'read_elapsed': time.monotonic() - started,
+            }
+    finally:
+        workbook.close()
+
+
+def write_parsed_file(parsed_chunks, fingerprint):
+    """
+    写库阶段：在一个事务中按自然键逐块写入记录，并更新账期汇总和导入清单，失败时整体回滚
+    parsed_chunks可以是整个文件的一次解析结果，也可以是流式解析的生成器
+    """
+    stats = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'bad_dates': 0, 'read_elapsed': 0.0}
+    write_elapsed = 0.0
+    periods = set()
+    with transaction.atomic():
+        for parsed in parsed_chunks:
+            started = time.monotonic()
+            created_count, updated_count, unchanged_count = upsert_records(parsed['records'])
+            periods.update(record['billing_period'] for record in parsed['records'])
+            write_elapsed += time.monotonic() - started
+            stats['rows'] += parsed['rows']
+            stats['created'] += created_count
+            stats['updated'] += updated_count
+            stats['unchanged'] += unchanged_count
+            stats['skipped'] += parsed['skipped']
+            stats['bad_dates'] += parsed['bad_dates']
+            stats['read_elapsed'] += parsed['read_elapsed']
+        # 有数据变化时，在同一事务中重算文件涉及账期的汇总行
+        started = time.monotonic()
+        if stats['created'] or stats['updated']:
+            refresh_period_rollups(periods)
+        save_manifest(fingerprint, stats['rows'])
+        write_elapsed += time.monotonic() - started
+
+    stats['elapsed'] = stats['read_elapsed'] + write_elapsed
+    stats['rows_per_second'] = stats['rows'] / stats['elapsed'] if stats['elapsed'] else 0
+    return stats
+
+
+def import_xlsx_file(file_path, fingerprint=None, stream=False):
+    """导入单个xlsx文件，stream=True时使用流式解析，返回导入统计"""
+    if fingerprint is None:
+        # 哈希在写入清单时计算
+        fingerprint = file_fingerprint(file_path)
+    if stream:
+        return write_parsed_file(iter_xlsx_chunks(file_path), fingerprint)
+    return write_parsed_file([parse_xlsx_file(file_path)], fingerprint)
+
+
+def print_file_stats(file_path, stats):
+    if stats['created'] > 0 or stats['updated'] > 0:
+        result_msg = f"成功导入文件 {file_path} 中的 {stats['created']} 条新记录"
+        if stats['updated'] > 0:
+            result_msg += f"，更新了 {stats['updated']} 条现有记录"
+    else:
+        result_msg = f"文件 {file_path} 中没有记录被导入"
+    if stats['unchanged'] > 0:
+        result_msg += f"，{stats['unchanged']} 条记录未变化"
+    if stats['skipped'] > 0:
+        result_msg += f"，跳过 {stats['skipped']} 条无效记录"
+    if stats['bad_dates'] > 0:
+        result_msg += f"，{stats['bad_dates']} 条记录的日期无法识别（已按空值导入）"
+    print(
+        f"{result_msg}（{stats['rows']} 行，读取 {stats['read_elapsed']:.2f}s，"
+        f"总计 {stats['elapsed']:.2f}s，{stats['rows_per_second']:.0f} 行/秒）"
+    )
+
+
+def import_all_xlsx_to_db(folder_path, workers=1, force=False, stream=False):
     """
     将指定文件夹下的所有xlsx文件（包括子文件夹中的）导入到DaikuanXlsxIndex模型中
     
     Args:
         folder_path: 要扫描的文件夹路径
+        workers: 解析Excel的进程数，大于1时多个进程并行解析，由当前进程统一写库
+        force: 为True时忽略导入清单，重新导入未变化的文件
+        stream: 为True时所有文件都使用流式解析；否则只有超过stream_min_file_size的文件使用流式解析
     
     Returns:
-        dict: 导入结果，包含成功数量和失败信息
+        dict: 导入结果，包含成功数量、跳过的未变化文件和失败信息
     """
-    # 字段映射：Excel中的中文列名到模型字段名
-    field_mapping = {
-        '账期': 'billing_period',
-        '账单大类': 'billing_category',
-        '业务大类': 'business_category',
-        '业务小类': 'business_subcategory',
-        '订单号': 'order_number',
-        '子订单号': 'sub_order_number',
-        '下单时间': 'order_time',
-        '确认收货时间': 'delivery_time',
-        '商品ID': 'product_id',
-        'sku': 'sku',
-        '商品名称': 'product_name',
-        '数量': 'quantity',
-        '单价（元）': 'unit_price',
-        '订单实际金额（元）': 'actual_amount',
-        '退款单号': 'refund_number',
-        '退款金额（元）': 'refund_amount',
-        '收/付渠道': 'payment_channel',
-        '业务流水号': 'transaction_id',
-        '商户订单号': 'merchant_order_number',
-        '打款时间': 'payment_time',
-        '打款更新时间': 'payment_update_time',
-        '备注': 'remarks'
-    }
-    
     total_imported = 0
+    total_rows = 0
     failed_files = []
+    skipped_files = []
+    started = time.monotonic()
     
-    # 遍历文件夹及其所有子文件夹
+    # 遍历文件夹及其所有子文件夹，对照导入清单筛选出需要导入的文件
+    manifests = {manifest.file_path: manifest for manifest in DaikuanImportManifest.objects.all()}
+    known_hashes = {manifest.sha256 for manifest in manifests.values()}
+    pending_files = []
     for root, dirs, files in os.walk(folder_path):
         for file in files:
             if file.lower().endswith('.xlsx'):
                 file_path = os.path.join(root, file)
                 try:
-                    # 读取Excel文件
-                    df = pd.read_excel(file_path)
-                    
-                    # 检查是否有必要的列
-                    missing_columns = [col for col in field_mapping.keys() if col not in df.columns]
-                    if missing_columns:
-                        failed_files.append({file_path: f"缺少必要列: {', '.join(missing_columns)}"})
+                    fingerprint = file_fingerprint(file_path)
+                    if force:
+                        # 不做变化检查；大小和修改时间与清单一致时沿用清单中的哈希，否则写入清单时再计算
+                        manifest = manifests.get(fingerprint['file_path'])
+                        if manifest and (manifest.file_size, manifest.file_mtime) == (fingerprint['file_size'], fingerprint['file_mtime']):
+                            fingerprint['sha256'] = manifest.sha256
+                    elif is_file_unchanged(fingerprint, manifests, known_hashes):
+                        # 内容未变化；大小或修改时间变了时刷新清单，下次无需再计算哈希
+                        manifest = manifests.get(fingerprint['file_path'])
+                        if not manifest or (manifest.file_size, manifest.file_mtime) != (fingerprint['file_size'], fingerprint['file_mtime']):
+                            save_manifest(fingerprint)
+                        skipped_files.append(file_path)
+                        print(f"文件 {file_path} 未变化，跳过")
                         continue
-                    
-                    records_to_create = []
-                    
-                    # 处理每一行数据
-                    for index, row in df.iterrows():
-                        # 检查子订单号是否为空，为空则跳过
-                        if pd.isna(row.get('子订单号')) or str(row.get('子订单号')).strip() == '':
-                            # print(f"第{index+2}行数据：子订单号为空，跳过处理")
-                            continue
-                        
-                        record_data = {}
-                        
-                        # 映射字段并处理数据类型
-                        for excel_col, model_field in field_mapping.items():
-                            value = row[excel_col]
-                            
-                            # 处理可能为空的情况
-                            if pd.isna(value):
-                                record_data[model_field] = None
-                                continue
-                            
-                            # 处理需要清除空格并转换类型的字段
-                            if excel_col == '数量':
-                                # 清除空格并转换为整数
-                                value_str = str(value).strip()
-                                record_data[model_field] = int(float(value_str)) if value_str else 0
-                            elif excel_col in ['单价（元）', '订单实际金额（元）', '退款金额（元）']:
-                                # 清除空格并转换为Decimal
-                                value_str = str(value).strip()
-                                if value_str:
-                                    try:
-                                        record_data[model_field] = Decimal(value_str)
-                                    except (ValueError, Decimal.InvalidOperation):
-                                        record_data[model_field] = Decimal('0')
-                                else:
-                                    record_data[model_field] = Decimal('0')
-                            elif excel_col in ['下单时间', '确认收货时间', '打款时间', '打款更新时间']:
-                                # 处理日期时间类型
-                                if isinstance(value, datetime):
-                                    # 检查是否有时区信息，没有则添加
-                                    if value.tzinfo is None or value.tzinfo.utcoffset(value) is None:
-                                        record_data[model_field] = timezone.make_aware(value)
-                                    else:
-                                        record_data[model_field] = value
-                                else:
-                                    try:
-                                        # 尝试转换字符串为日期时间
-                                        dt = pd.to_datetime(value)
-                                        # 检查是否有时区信息，没有则添加
-                                        if isinstance(dt, datetime) and (dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None):
-                                            record_data[model_field] = timezone.make_aware(dt)
-                                        else:
-                                            record_data[model_field] = dt
-                                    except:
-                                        record_data[model_field] = None
-                            elif model_field == 'sku':
-                                # sku字段可能为数字，需要转换为字符串
-                                record_data[model_field] = str(value) if value else ''
-                            else:
-                                # 其他字段直接转换为字符串
-                                record_data[model_field] = str(value)
-                        
-                        records_to_create.append(DaikuanXlsxIndex(**record_data))
-                    
-                    # 处理记录创建 - 允许重复子订单号的数据写入
-                    created_count = 0
-                    updated_count = 0
-                    
-                    # 每条记录单独处理，避免事务问题
-                    for record in records_to_create:
-                        try:
-                            # 每条记录单独使用事务
-                            with transaction.atomic():
-                                # 不检查重复，直接保存
-                                record.save()
-                                created_count += 1
-                        except Exception as e:
-                            if 'Duplicate entry' in str(e):
-                                # 遇到重复记录，根据订单实际金额决定是保留还是更新
-                                try:
-                                    # 查找已有记录
-                                    existing_record = DaikuanXlsxIndex.objects.get(sub_order_number=record.sub_order_number)
-                                    
-                                    # 获取新记录和已有记录的订单实际金额
-                                    new_actual_amount = getattr(record, 'actual_amount', Decimal('0'))
-                                    existing_actual_amount = getattr(existing_record, 'actual_amount', Decimal('0'))
-                                    
-                                    # 如果新记录的订单实际金额不为0，或者新记录金额大于已有记录金额，则更新
-                                    if new_actual_amount != Decimal('0') and new_actual_amount != existing_actual_amount:
-                                        # 更新其他字段
-                                        for field, value in record.__dict__.items():
-                                            if field != 'id' and field != '_state' and field != 'sub_order_number':
-                                                setattr(existing_record, field, value)
-                                        existing_record.save()
-                                        updated_count += 1
-                                except DaikuanXlsxIndex.DoesNotExist:
-                                    # 如果查找不到，说明是其他唯一性约束问题
-                                    print(f"创建记录时出错: {str(e)}")
-                            else:
-                                # 其他错误，记录但继续处理
-                                print(f"创建记录时出错: {str(e)}")
-                    
-                    if created_count > 0 or updated_count > 0:
-                        total_imported += created_count + updated_count
-                        result_msg = f"成功导入文件 {file_path} 中的 {created_count} 条新记录"
-                        if updated_count > 0:
-                            result_msg += f"，更新了 {updated_count} 条现有记录"
-                        print(result_msg)
-                    else:
-                        print(f"文件 {file_path} 中没有记录被导入")
-                        
+                    pending_files.append((file_path, fingerprint))
                 except Exception as e:
                     failed_files.append({file_path: str(e)})
                     print(f"导入文件 {file_path} 失败: {str(e)}")
-    
+
+    def write_file(file_path, fingerprint, parsed_chunks):
+        nonlocal total_imported, total_rows
+        stats = write_parsed_file(parsed_chunks, fingerprint)
+        total_imported += stats['created'] + stats['updated']
+        total_rows += stats['rows']
+        print_file_stats(file_path, stats)
+
+    # 大文件在当前进程中流式解析并逐块写库，其余文件整体解析（可并行）
+    streamed_files = [
+        (file_path, fingerprint) for file_path, fingerprint in pending_files
+        if stream or fingerprint['file_size'] >= stream_min_file_size
+    ]
+    parsed_files = [item for item in pending_files if item not in streamed_files]
+
+    if workers > 1 and len(parsed_files) > 1:
+        # 子进程只负责解析，不使用数据库连接；先关闭连接，避免fork后父子进程共用同一个连接
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            next_index = 0
+            while next_index < len(parsed_files) or pending:
+                # 最多保持2倍进程数的文件在途，避免解析结果堆积占用内存
+                while next_index < len(parsed_files) and len(pending) < workers * 2:
+                    file_path, fingerprint = parsed_files[next_index]
+                    pending[executor.submit(parse_xlsx_file, file_path)] = (file_path, fingerprint)
+                    next_index += 1
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path, fingerprint = pending.pop(future)
+                    try:
+                        write_file(file_path, fingerprint, [future.result()])
+                    except Exception as e:
+                        failed_files.append({file_path: str(e)})
+                        print(f"导入文件 {file_path} 失败: {str(e)}")
+    else:
+        for file_path, fingerprint in parsed_files:
+            try:
+                write_file(file_path, fingerprint, [parse_xlsx_file(file_path)])
+            except Exception as e:
+                failed_files.append({file_path: str(e)})
+                print(f"导入文件 {file_path} 失败: {str(e)}")
+
+    for file_path, fingerprint in streamed_files:
+        try:
+            write_file(file_path, fingerprint, iter_xlsx_chunks(file_path))
+        except Exception as e:
+            failed_files.append({file_path: str(e)})
+            print(f"导入文件 {file_path} 失败: {str(e)}")
+
+    elapsed = time.monotonic() - started
+    print(
+        f"处理 {len(pending_files)} 个文件，跳过 {len(skipped_files)} 个未变化的文件，"
+        f"共 {total_rows} 行，用时 {elapsed:.2f}s，{total_rows / elapsed if elapsed else 0:.0f} 行/秒"
+    )
     return {
         'total_imported': total_imported,
+        'skipped_files': skipped_files,
         'failed_files': failed_files
     }
 
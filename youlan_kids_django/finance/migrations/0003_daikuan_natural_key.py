@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:08
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def remove_duplicate_rows(apps, schema_editor):
+    """
+    添加唯一约束前合并自然键重复的记录
+    按导入顺序（id）依次套用导入规则：订单实际金额不为0且与当前保留记录不同时，以新记录为准
+    """
+    DaikuanXlsxIndex = apps.get_model('finance', 'DaikuanXlsxIndex')
+    duplicate_keys = (
+        DaikuanXlsxIndex.objects
+        .values('sub_order_number', 'billing_period', 'billing_category')
+        .annotate(row_count=models.Count('id'))
+        .filter(row_count__gt=1)
+    )
+    for key in duplicate_keys.iterator():
+        rows = (
+            DaikuanXlsxIndex.objects
+            .filter(
+                sub_order_number=key['sub_order_number'],
+                billing_period=key['billing_period'],
+                billing_category=key['billing_category'],
+            )
+            .order_by('id')
+            .values_list('id', 'actual_amount')
+        )
+        kept_id, kept_amount = None, None
+        for row_id, actual_amount in rows:
+            if kept_id is None or (actual_amount != Decimal('0') and actual_amount != kept_amount):
+                kept_id, kept_amount = row_id, actual_amount
+        DaikuanXlsxIndex.objects.filter(
+            sub_order_number=key['sub_order_number'],
+            billing_period=key['billing_period'],
+            billing_category=key['billing_category'],
+        ).exclude(id=kept_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_alter_daikuanxlsxindex_sub_order_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='daikuanxlsxindex',
+            constraint=models.UniqueConstraint(fields=('sub_order_number', 'billing_period', 'billing_category'), name='daikuan_natural_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_daikuan_natural_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaikuanImportManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(max_length=500, unique=True, verbose_name='文件路径')),
+                ('file_size', models.BigIntegerField(verbose_name='文件大小')),
+                ('file_mtime', models.FloatField(verbose_name='文件修改时间')),
+                ('sha256', models.CharField(db_index=True, max_length=64, verbose_name='文件SHA256')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='导入行数')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='导入时间')),
+            ],
+            options={
+                'verbose_name': '贷款Excel导入清单',
+                'verbose_name_plural': '贷款Excel导入清单',
+                'db_table': 'daikuan_import_manifest',
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:16
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_period_rollups(apps, schema_editor):
+    """根据已有的原始数据生成汇总行（规则与finance.rollup.refresh_period_rollups一致）"""
+    DaikuanXlsxIndex = apps.get_model('finance', 'DaikuanXlsxIndex')
+    DaikuanPeriodRollup = apps.get_model('finance', 'DaikuanPeriodRollup')
+    rows = (
+        DaikuanXlsxIndex.objects
+        .annotate(channel=Coalesce('payment_channel', models.Value('')))
+        .values('billing_period', 'billing_category', 'business_category', 'channel')
+        .annotate(
+            total_rows=models.Count('id'),
+            total_quantity=models.Sum('quantity'),
+            total_actual_amount=models.Sum('actual_amount'),
+            total_refund_amount=models.Sum('refund_amount'),
+        )
+        .order_by()
+    )
+    DaikuanPeriodRollup.objects.bulk_create([
+        DaikuanPeriodRollup(
+            billing_period=row['billing_period'],
+            billing_category=row['billing_category'],
+            business_category=row['business_category'],
+            payment_channel=row['channel'],
+            row_count=row['total_rows'],
+            quantity=row['total_quantity'] or 0,
+            actual_amount=row['total_actual_amount'] or 0,
+            refund_amount=row['total_refund_amount'] or 0,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_daikuan_import_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaikuanPeriodRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billing_period', models.CharField(max_length=20, verbose_name='账期')),
+                ('billing_category', models.CharField(max_length=50, verbose_name='账单大类')),
+                ('business_category', models.CharField(max_length=50, verbose_name='业务大类')),
+                ('payment_channel', models.CharField(blank=True, max_length=50, verbose_name='收/付渠道')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='记录数')),
+                ('quantity', models.BigIntegerField(default=0, verbose_name='数量合计')),
+                ('actual_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='订单实际金额合计（元）')),
+                ('refund_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='退款金额合计（元）')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '贷款账期汇总',
+                'verbose_name_plural': '贷款账期汇总',
+                'db_table': 'daikuan_period_rollup',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='daikuanxlsxindex',
+            index=models.Index(fields=['billing_period'], name='daikuan_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='daikuanperiodrollup',
+            constraint=models.UniqueConstraint(fields=('billing_period', 'billing_category', 'business_category', 'payment_channel'), name='daikuan_rollup_dimension_uniq'),
+        ),
+        migrations.RunPython(backfill_period_rollups, migrations.RunPython.noop),
+    ]
@@ -59,3 +59,54 @@ class DaikuanXlsxIndex(models.Model):
         db_table = 'daikuan_xlsx_index'
         verbose_name = '贷款Excel索引'
         verbose_name_plural = '贷款Excel索引管理'
+        # 导入后按账期重新汇算汇总表
+        indexes = [
+            models.Index(fields=['billing_period'], name='daikuan_period_idx'),
+        ]
+        # 自然键：同一子订单在同一账期、同一账单大类下只保留一条记录，导入时按此键更新
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sub_order_number', 'billing_period', 'billing_category'],
+                name='daikuan_natural_key_uniq',
+            ),
+        ]
+
+
+class DaikuanImportManifest(models.Model):
+    """已导入的贷款Excel文件清单，文件大小、修改时间和内容哈希都未变化时重复导入会直接跳过"""
+    file_path = models.CharField(max_length=500, unique=True, verbose_name='文件路径')
+    file_size = models.BigIntegerField(verbose_name='文件大小')
+    file_mtime = models.FloatField(verbose_name='文件修改时间')
+    sha256 = models.CharField(max_length=64, db_index=True, verbose_name='文件SHA256')
+    row_count = models.PositiveIntegerField(default=0, verbose_name='导入行数')
+    imported_at = models.DateTimeField(auto_now=True, verbose_name='导入时间')
+
+    class Meta:
+        db_table = 'daikuan_import_manifest'
+        verbose_name = '贷款Excel导入清单'
+        verbose_name_plural = '贷款Excel导入清单'
+
+
+class DaikuanPeriodRollup(models.Model):
+    """贷款数据按账期汇总表：每次导入后只重算受影响账期，报表查询直接读取汇总行"""
+    billing_period = models.CharField(max_length=20, verbose_name='账期')
+    billing_category = models.CharField(max_length=50, verbose_name='账单大类')
+    business_category = models.CharField(max_length=50, verbose_name='业务大类')
+    # 原始数据中收/付渠道为空时记为空字符串
+    payment_channel = models.CharField(max_length=50, blank=True, verbose_name='收/付渠道')
+    row_count = models.PositiveIntegerField(default=0, verbose_name='记录数')
+    quantity = models.BigIntegerField(default=0, verbose_name='数量合计')
+    actual_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='订单实际金额合计（元）')
+    refund_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='退款金额合计（元）')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'daikuan_period_rollup'
+        verbose_name = '贷款账期汇总'
+        verbose_name_plural = '贷款账期汇总'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['billing_period', 'billing_category', 'business_category', 'payment_channel'],
+                name='daikuan_rollup_dimension_uniq',
+            ),
+        ]
@@ -0,0 +1,62 @@
+"""
+贷款数据账期汇总
+
+DaikuanPeriodRollup按(账期, 账单大类, 业务大类, 收/付渠道)保存记录数、数量、订单实际金额和退款金额合计。
+导入文件后只重算文件涉及的账期，报表接口读取汇总表，不再扫描原始数据。
+"""
+from django.db import transaction
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import DaikuanPeriodRollup, DaikuanXlsxIndex
+
+# 汇总维度，与DaikuanPeriodRollup的唯一约束一致
+ROLLUP_DIMENSIONS = ['billing_period', 'billing_category', 'business_category', 'payment_channel']
+
+
+def aggregate_periods(periods):
+    """从原始数据汇总指定账期，收/付渠道为空的记录与空字符串合并"""
+    return (
+        DaikuanXlsxIndex.objects
+        .filter(billing_period__in=periods)
+        .annotate(channel=Coalesce('payment_channel', Value('')))
+        .values('billing_period', 'billing_category', 'business_category', 'channel')
+        .annotate(
+            total_rows=Count('id'),
+            total_quantity=Sum('quantity'),
+            total_actual_amount=Sum('actual_amount'),
+            total_refund_amount=Sum('refund_amount'),
+        )
+        .order_by()
+    )
+
+
+def refresh_period_rollups(periods=None):
+    """
+    重算指定账期的汇总行，periods为None时重算全部账期
+    在调用方的事务中执行时，汇总表与原始数据同时提交或回滚
+    返回写入的汇总行数
+    """
+    if periods is None:
+        periods = DaikuanXlsxIndex.objects.values_list('billing_period', flat=True).distinct().order_by()
+    periods = sorted(set(periods))
+    if not periods:
+        return 0
+
+    rollups = [
+        DaikuanPeriodRollup(
+            billing_period=row['billing_period'],
+            billing_category=row['billing_category'],
+            business_category=row['business_category'],
+            payment_channel=row['channel'],
+            row_count=row['total_rows'],
+            quantity=row['total_quantity'] or 0,
+            actual_amount=row['total_actual_amount'] or 0,
+            refund_amount=row['total_refund_amount'] or 0,
+        )
+        for row in aggregate_periods(periods)
+    ]
+    with transaction.atomic():
+        DaikuanPeriodRollup.objects.filter(billing_period__in=periods).delete()
+        DaikuanPeriodRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
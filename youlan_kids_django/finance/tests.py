@@ -1,3 +1,307 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+import pandas as pd
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from access_token.models import AccessToken
+from finance import demo
+from finance.models import DaikuanImportManifest, DaikuanPeriodRollup, DaikuanXlsxIndex
+
+
+def daikuan_row(sub_order_number, **fields):
+    """生成一行贷款数据，键为Excel中的中文列名，fields按模型字段名覆盖默认值"""
+    values = {
+        'billing_period': '2026-09', 'billing_category': '货款', 'business_category': '订单',
+        'business_subcategory': '普通订单', 'order_number': f'O{sub_order_number}', 'sub_order_number': sub_order_number,
+        'order_time': datetime(2026, 9, 1, 10, 0), 'delivery_time': '2026/09/05 12:00:00', 'product_id': 3001,
+        'sku': 2001, 'product_name': '儿童T恤', 'quantity': 1, 'unit_price': 59.9, 'actual_amount': 59.9,
+        'refund_number': None, 'refund_amount': None, 'payment_channel': '微信', 'transaction_id': None,
+        'merchant_order_number': None, 'payment_time': None, 'payment_update_time': None, 'remarks': None,
+    }
+    values.update(fields)
+    return {excel_col: values[model_field] for excel_col, model_field in demo.field_mapping.items()}
+
+
+class DaikuanImportTestCase(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+
+    def import_folder(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return demo.import_all_xlsx_to_db(self.folder, **kwargs)
+
+    def write_xlsx(self, name, rows):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(list(demo.field_mapping))
+        for row in rows:
+            sheet.append([row[column] for column in demo.field_mapping])
+        file_path = os.path.join(self.folder, name)
+        workbook.save(file_path)
+        return file_path
+
+
+class StreamParseTests(DaikuanImportTestCase):
+    """流式解析与整体解析的结果一致"""
+
+    def test_stream_and_whole_file_records_identical(self):
+        # 第二块中sku和子订单号有空值：按块推断类型时这一块会变成float，转换为'1004.0'
+        file_path = self.write_xlsx('parity.xlsx', [
+            daikuan_row(1001), daikuan_row(1002), daikuan_row(1003, delivery_time=datetime(2026, 9, 6)),
+            daikuan_row(1004, sku=None), daikuan_row(None), daikuan_row(1006, actual_amount='  12.5 '),
+        ])
+        whole = demo.parse_xlsx_file(file_path)
+        chunks = list(demo.iter_xlsx_chunks(file_path, chunk_size=3))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual([record for chunk in chunks for record in chunk['records']], whole['records'])
+        self.assertEqual(sum(chunk['skipped'] for chunk in chunks), whole['skipped'])
+        self.assertEqual(
+            [(record['sub_order_number'], record['sku'], record['product_id']) for record in whole['records']],
+            [('1001', '2001', '3001'), ('1002', '2001', '3001'), ('1003', '2001', '3001'),
+             ('1004', None, '3001'), ('1006', '2001', '3001')],
+        )
+
+    def test_stream_import_upserts_records_from_whole_file_import(self):
+        # 子订单号为空的行只出现在第二块，自然键在两种解析方式下必须相同，否则流式导入会插入重复记录
+        file_path = self.write_xlsx('upsert.xlsx', [daikuan_row(1001), daikuan_row(1002), daikuan_row(None), daikuan_row(1003)])
+        with redirect_stdout(io.StringIO()), mock.patch.object(demo, 'stream_chunk_size', 2):
+            demo.import_xlsx_file(file_path)
+            stats = demo.import_xlsx_file(file_path, stream=True)
+        self.assertEqual((stats['created'], stats['updated'], stats['unchanged']), (0, 0, 3))
+        self.assertEqual(
+            sorted(DaikuanXlsxIndex.objects.values_list('sub_order_number', flat=True)), ['1001', '1002', '1003'],
+        )
+
+
+    def test_process_pool_and_stream_imports_identical(self):
+        self.write_xlsx('a.xlsx', [daikuan_row(1001), daikuan_row(1002, sku=None), daikuan_row(None)])
+        self.write_xlsx('b.xlsx', [daikuan_row(2001, delivery_time='2026-09-07'), daikuan_row(2002, quantity=' 4 ')])
+        fields = list(demo.field_mapping.values())
+
+        result = self.import_folder(workers=2)
+        self.assertEqual((result['total_imported'], result['failed_files']), (4, []))
+        pooled = list(DaikuanXlsxIndex.objects.order_by('sub_order_number').values_list(*fields))
+
+        DaikuanXlsxIndex.objects.all().delete()
+        result = self.import_folder(force=True, stream=True)
+        self.assertEqual((result['total_imported'], result['failed_files']), (4, []))
+        self.assertEqual(list(DaikuanXlsxIndex.objects.order_by('sub_order_number').values_list(*fields)), pooled)
+
+class CoerceDataframeTests(TestCase):
+    """按列转换类型：数量和金额去除空格，日期逐个值识别格式，不符合模型约束的行跳过"""
+
+    def coerce(self, rows):
+        with redirect_stdout(io.StringIO()):
+            records, skipped, bad_dates = demo.coerce_dataframe(pd.DataFrame(rows, dtype=object))
+        return records.to_dict('records'), skipped, bad_dates
+
+    def test_values_converted(self):
+        records, skipped, bad_dates = self.coerce([
+            daikuan_row(1001, quantity=' 3 ', unit_price=' 12.3 ', actual_amount='abc', refund_amount=None),
+            daikuan_row(1002, order_time='2026-09-01 08:30:00', delivery_time='2026/09/05'),
+        ])
+        self.assertEqual((skipped, bad_dates), (0, 0))
+        self.assertEqual(records[0]['quantity'], 3)
+        self.assertEqual(records[0]['unit_price'], Decimal('12.30'))
+        self.assertEqual(records[0]['actual_amount'], Decimal('0.00'))
+        self.assertIsNone(records[0]['refund_amount'])
+        self.assertEqual(records[1]['order_time'].replace(tzinfo=None), datetime(2026, 9, 1, 8, 30))
+        self.assertEqual(records[1]['delivery_time'].replace(tzinfo=None), datetime(2026, 9, 5))
+
+    def test_invalid_rows_skipped_and_bad_dates_counted(self):
+        records, skipped, bad_dates = self.coerce([
+            daikuan_row(1001, delivery_time='不是日期'),
+            daikuan_row(1002, product_name='长' * 256),
+            daikuan_row(1003, quantity=None),
+            daikuan_row(None),
+        ])
+        self.assertEqual([record['sub_order_number'] for record in records], ['1001'])
+        self.assertIsNone(records[0]['delivery_time'])
+        self.assertEqual((skipped, bad_dates), (2, 1))
+
+
+class UpsertRecordsTests(DaikuanImportTestCase):
+    """按自然键写入：重复导入不产生写操作，金额变化且不为0时才更新"""
+
+    def records(self, *rows):
+        with redirect_stdout(io.StringIO()):
+            records, _, _ = demo.coerce_dataframe(pd.DataFrame(rows, dtype=object))
+        return records.to_dict('records')
+
+    def test_reimport_is_idempotent(self):
+        records = self.records(daikuan_row(1001), daikuan_row(1002), daikuan_row(1002, billing_category='退款'))
+        self.assertEqual(demo.upsert_records(records), (3, 0, 0))
+        self.assertEqual(demo.upsert_records(records), (0, 0, 3))
+        self.assertEqual(DaikuanXlsxIndex.objects.count(), 3)
+
+    def test_should_replace_rules(self):
+        demo.upsert_records(self.records(daikuan_row(1001), daikuan_row(1002), daikuan_row(1003)))
+        self.assertEqual(demo.upsert_records(self.records(
+            daikuan_row(1001, actual_amount=80, product_name='新名称'),
+            daikuan_row(1002, actual_amount=0),
+            daikuan_row(1003, actual_amount=59.9),
+        )), (0, 1, 2))
+        amounts = dict(DaikuanXlsxIndex.objects.values_list('sub_order_number', 'actual_amount'))
+        self.assertEqual(amounts, {'1001': Decimal('80.00'), '1002': Decimal('59.90'), '1003': Decimal('59.90')})
+        self.assertEqual(DaikuanXlsxIndex.objects.get(sub_order_number='1001').product_name, '新名称')
+
+    def test_duplicates_within_file(self):
+        # 文件内同一自然键：后出现的金额不为0且不同则替换，金额为0的不替换
+        created = demo.upsert_records(self.records(
+            daikuan_row(1001, actual_amount=10), daikuan_row(1001, actual_amount=20), daikuan_row(1001, actual_amount=0),
+        ))
+        self.assertEqual(created, (1, 0, 0))
+        self.assertEqual(DaikuanXlsxIndex.objects.get().actual_amount, Decimal('20.00'))
+
+
+class ImportManifestTests(DaikuanImportTestCase):
+    """导入清单：未变化的文件跳过且不计算哈希，内容相同的副本按哈希跳过，force重新导入"""
+
+    def setUp(self):
+        super().setUp()
+        self.file_path = self.write_xlsx('a.xlsx', [daikuan_row(1001), daikuan_row(1002)])
+        patcher = mock.patch.object(demo, 'file_sha256', wraps=demo.file_sha256)
+        self.file_sha256 = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unchanged_file_skipped_without_hashing(self):
+        self.assertEqual(self.import_folder()['total_imported'], 2)
+        self.assertEqual(self.file_sha256.call_count, 1)
+        self.assertEqual(DaikuanImportManifest.objects.get().row_count, 2)
+
+        self.file_sha256.reset_mock()
+        result = self.import_folder()
+        self.assertEqual(result['skipped_files'], [self.file_path])
+        self.assertEqual(result['total_imported'], 0)
+        self.file_sha256.assert_not_called()
+
+    def test_copied_file_skipped_by_hash(self):
+        self.import_folder()
+        copy_path = os.path.join(self.folder, 'copy.xlsx')
+        shutil.copyfile(self.file_path, copy_path)
+        result = self.import_folder()
+        self.assertEqual(sorted(result['skipped_files']), sorted([self.file_path, copy_path]))
+        # 副本的清单已写入，下次按大小和修改时间跳过
+        self.assertTrue(DaikuanImportManifest.objects.filter(file_path=os.path.abspath(copy_path)).exists())
+
+    def test_force_reimports_without_hashing(self):
+        self.import_folder()
+        self.file_sha256.reset_mock()
+        with mock.patch.object(demo, 'upsert_records', wraps=demo.upsert_records) as upsert:
+            result = self.import_folder(force=True)
+        self.assertEqual(result['skipped_files'], [])
+        self.assertEqual(upsert.call_count, 1)
+        self.file_sha256.assert_not_called()
+        self.assertEqual(DaikuanXlsxIndex.objects.count(), 2)
+
+    def test_changed_file_reimported(self):
+        self.import_folder()
+        self.write_xlsx('a.xlsx', [daikuan_row(1001, actual_amount=99), daikuan_row(1002), daikuan_row(1003)])
+        os.utime(self.file_path, (1, 1))
+        result = self.import_folder()
+        self.assertEqual(result['total_imported'], 2)
+        self.assertEqual(DaikuanImportManifest.objects.get().row_count, 3)
+
+
+class PeriodRollupTests(DaikuanImportTestCase):
+    """账期汇总：重新导入后只重算涉及的账期，汇总与原始数据一致，period_summary读取汇总表"""
+
+    def setUp(self):
+        super().setUp()
+        AccessToken.objects.create(ip_address='127.0.0.1', access_token='token-a')
+
+    def summary(self, **payload):
+        response = self.client.post(
+            '/finance/period_summary?access_token=token-a', json.dumps({'shopname': 'youlan_kids', **payload}),
+            content_type='application/json', REMOTE_ADDR='127.0.0.1',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_rollup_totals_after_reimport(self):
+        self.write_xlsx('a.xlsx', [
+            daikuan_row(1001, quantity=2, actual_amount=100),
+            daikuan_row(1002, actual_amount=50, payment_channel=None, refund_amount=10),
+            daikuan_row(1003, billing_period='2026-08', actual_amount=30),
+        ])
+        self.import_folder()
+        self.assertEqual(DaikuanPeriodRollup.objects.count(), 3)
+        self.assertEqual(self.summary()['summary'], {'row_count': 3, 'quantity': 4, 'actual_amount': 180.0, 'refund_amount': 10.0})
+
+        # 重新导入：1001金额变化，新增1004；汇总重算而不是累加
+        self.write_xlsx('a.xlsx', [
+            daikuan_row(1001, quantity=2, actual_amount=120),
+            daikuan_row(1002, actual_amount=50, payment_channel=None, refund_amount=10),
+            daikuan_row(1003, billing_period='2026-08', actual_amount=30),
+            daikuan_row(1004, actual_amount=5),
+        ])
+        os.utime(os.path.join(self.folder, 'a.xlsx'), (1, 1))
+        self.import_folder()
+        body = self.summary(group_by='billing_period')
+        self.assertEqual(body['data'], [
+            {'billing_period': '2026-08', 'row_count': 1, 'quantity': 1, 'actual_amount': 30.0, 'refund_amount': 0.0},
+            {'billing_period': '2026-09', 'row_count': 3, 'quantity': 4, 'actual_amount': 175.0, 'refund_amount': 10.0},
+        ])
+        self.assertEqual(
+            sorted(DaikuanPeriodRollup.objects.filter(billing_period='2026-09').values_list('payment_channel', 'row_count')),
+            [('', 1), ('微信', 2)],
+        )
+
+    def test_unchanged_reimport_keeps_rollups(self):
+        self.write_xlsx('a.xlsx', [daikuan_row(1001)])
+        self.import_folder()
+        rollup = DaikuanPeriodRollup.objects.get()
+        with mock.patch.object(demo, 'refresh_period_rollups') as refresh:
+            self.import_folder(force=True)
+        refresh.assert_not_called()
+        self.assertEqual(DaikuanPeriodRollup.objects.get().pk, rollup.pk)
+
+
+class RemoveDuplicateRowsMigrationTests(TransactionTestCase):
+    """0003迁移：添加唯一约束前按导入规则合并自然键重复的记录"""
+
+    def setUp(self):
+        # 临时去掉唯一约束以写入重复记录；SQLite修改表结构不能在事务中执行，使用TransactionTestCase
+        # SQLite按模型定义重建表，重建时模型定义中也不能有该约束
+        constraint = DaikuanXlsxIndex._meta.constraints[0]
+        with mock.patch.object(DaikuanXlsxIndex._meta, 'constraints', []), connection.schema_editor() as editor:
+            editor.remove_constraint(DaikuanXlsxIndex, constraint)
+        self.addCleanup(self.restore_constraint, constraint)
+
+    def restore_constraint(self, constraint):
+        with connection.schema_editor() as editor:
+            editor.add_constraint(DaikuanXlsxIndex, constraint)
+
+    def test_duplicates_merged_with_import_rules(self):
+        with redirect_stdout(io.StringIO()):
+            records, _, _ = demo.coerce_dataframe(pd.DataFrame([
+                daikuan_row(1001, actual_amount=10), daikuan_row(1001, actual_amount=0),
+                daikuan_row(1001, actual_amount=20), daikuan_row(1001, actual_amount=20),
+                daikuan_row(1002), daikuan_row(1001, billing_category='退款'),
+            ], dtype=object))
+        DaikuanXlsxIndex.objects.bulk_create([DaikuanXlsxIndex(**record) for record in records.to_dict('records')])
+        ids = list(DaikuanXlsxIndex.objects.order_by('id').values_list('id', flat=True))
+
+        migration = importlib.import_module('finance.migrations.0003_daikuan_natural_key')
+        migration.remove_duplicate_rows(apps, None)
+
+        # 1001/货款保留第一条金额为20的记录（第三行），其他自然键不受影响
+        self.assertEqual(
+            list(DaikuanXlsxIndex.objects.order_by('id').values_list('id', 'sub_order_number', 'billing_category', 'actual_amount')),
+            [(ids[2], '1001', '货款', Decimal('20.00')), (ids[4], '1002', '货款', Decimal('59.90')), (ids[5], '1001', '退款', Decimal('59.90'))],
+        )
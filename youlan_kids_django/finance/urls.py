@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('period_summary', views.period_summary, name='period_summary'),
+]
@@ -1,3 +1,91 @@
-from django.shortcuts import render
+import json
+import logging
 
-# Create your views here.
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .models import DaikuanPeriodRollup
+from .rollup import ROLLUP_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def period_summary(request):  # 按账期等维度查询贷款数据汇总
+    try:
+        data = json.loads(request.body)
+
+        # 验证shopname参数
+        if data.get('shopname') != 'youlan_kids':
+            return JsonResponse({
+                'status': 'error',
+                'message': '无效的店铺名称'
+            }, status=400)
+
+        # 分组维度，默认按全部维度分组
+        group_by = data.get('group_by') or ROLLUP_DIMENSIONS
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        invalid_dimensions = [dimension for dimension in group_by if dimension not in ROLLUP_DIMENSIONS]
+        if invalid_dimensions:
+            return JsonResponse({
+                'status': 'error',
+                'message': f"group_by只能包含: {', '.join(ROLLUP_DIMENSIONS)}"
+            }, status=400)
+
+        rollups = DaikuanPeriodRollup.objects.all()
+
+        # 维度过滤，支持单个值或列表
+        for dimension in ROLLUP_DIMENSIONS:
+            value = data.get(dimension)
+            if value is None:
+                continue
+            if isinstance(value, list):
+                rollups = rollups.filter(**{f'{dimension}__in': value})
+            else:
+                rollups = rollups.filter(**{dimension: value})
+
+        # 账期范围过滤（包含首尾）
+        if data.get('begin_period'):
+            rollups = rollups.filter(billing_period__gte=data['begin_period'])
+        if data.get('end_period'):
+            rollups = rollups.filter(billing_period__lte=data['end_period'])
+
+        totals = ('row_count', 'quantity', 'actual_amount', 'refund_amount')
+        rows = (
+            rollups
+            .values(*group_by)
+            .annotate(**{f'total_{field}': Sum(field) for field in totals})
+            .order_by(*group_by)
+        )
+
+        result = [
+            {
+                **{dimension: row[dimension] for dimension in group_by},
+                'row_count': row['total_row_count'],
+                'quantity': row['total_quantity'],
+                'actual_amount': float(row['total_actual_amount']),
+                'refund_amount': float(row['total_refund_amount']),
+            }
+            for row in rows
+        ]
+        summary = {
+            'row_count': sum(item['row_count'] for item in result),
+            'quantity': sum(item['quantity'] for item in result),
+            'actual_amount': round(sum(item['actual_amount'] for item in result), 2),
+            'refund_amount': round(sum(item['refund_amount'] for item in result), 2),
+        }
+
+        return JsonResponse({
+            'status': 'success',
+            'data': result,
+            'summary': summary,
+        })
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': '请求体格式不是有效的JSON'}, status=400)
+    except Exception as e:
+        logger.error(f'查询贷款汇总失败: {str(e)}')
+        return JsonResponse({'status': 'error', 'message': '服务器内部错误'}, status=500)
@@ -14,17 +14,28 @@ from finance.demo import import_all_xlsx_to_db
 
 
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='导入文件夹中的所有贷款Excel文件')
     # 设置要导入的文件夹路径
-    folder_path = r"C:\Users\易理志\Desktop\贷款数据导出列表\贷款数据导出列表"
+    parser.add_argument('folder_path', nargs='?', default=r"C:\Users\易理志\Desktop\贷款数据导出列表\贷款数据导出列表",
+                        help='要导入的文件夹路径')
+    parser.add_argument('--workers', type=int, default=1, help='并行解析Excel的进程数，默认1（不并行）')
+    parser.add_argument('--force', action='store_true', help='忽略导入清单，重新导入未变化的文件')
+    parser.add_argument('--stream', action='store_true', help='所有文件都用只读模式分块流式解析，降低内存占用')
+    args = parser.parse_args()
+    folder_path = args.folder_path
     
     print(f"开始导入文件夹 '{folder_path}' 中的所有Excel文件...")
     
     # 调用导入函数
-    result = import_all_xlsx_to_db(folder_path)
+    result = import_all_xlsx_to_db(folder_path, workers=args.workers, force=args.force, stream=args.stream)
     
     # 打印导入结果
     print(f"\n导入完成！")
     print(f"总导入记录数: {result['total_imported']}")
+    if result['skipped_files']:
+        print(f"跳过未变化的文件: {len(result['skipped_files'])} 个")
     
     if result['failed_files']:
         print("\n失败的文件:")
@@ -32,4 +43,4 @@ if __name__ == '__main__':
             for file_path, error_msg in file_info.items():
                 print(f"  - {file_path}: {error_msg}")
     else:
-        print("所有文件都成功导入！")
\ No newline at end of file
+        print("所有文件都成功导入！")
@@ -1,3 +1,4 @@
+import os
 import requests
 import json
 import hashlib
@@ -28,14 +29,15 @@ def encrypt(content, api_key):
     return url_encoded_result
 
 
-def get_kdniao_logistics(tracking_number):
+def get_kdniao_logistics(tracking_number, session=None):
     """
     发送请求到快递鸟API查询物流信息
     :param tracking_number: 快递单号
+    :param session: 可选的requests.Session，批量查询时复用连接
     :return: 格式化后的物流信息列表
     """
     # API配置信息
-    url = 'https://api.kdniao.com/api/dist'
+    url = os.environ.get('KDNIAO_API_URL', 'https://api.kdniao.com/api/dist')
     e_business_id = '1894943'
     request_type = '8002'
     data_type = '2'
@@ -63,7 +65,7 @@ def get_kdniao_logistics(tracking_number):
     
     try:
         # 发送POST请求
-        response = requests.post(url, data=payload, timeout=10)
+        response = (session or requests).post(url, data=payload, timeout=10)
         
         # 检查响应状态
         if response.status_code == 200:
@@ -0,0 +1,133 @@
+"""
+订单物流信息后台同步
+
+定时查找下次同步时间（logistics_next_sync_at）已到的已发货订单（以及从未同步过的已送达订单），多线程并发查询快递鸟（线程池由同步命令创建一次、各轮复用，每个线程复用一个连接池Session），
+查询经过tracking_cache按快递单号缓存（已签收的单号不再调用快递鸟），
+查询结果在主线程中批量写回logistics_process和logistics_synced_at，下次同步时间推迟LOGISTICS_MAX_AGE_MINUTES；
+查询失败的订单按连续失败次数指数退避，快递鸟故障或单号无效时不会每轮反复查询同一批订单。
+轨迹显示已签收的订单用一条UPDATE批量改为delivered。
+接口只读取已同步的结果或tracking_cache中的缓存，不调用快递鸟；尚未同步的订单返回pending，由本任务同步。
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import Order
+from .tracking_cache import get_tracking, is_signed_state
+
+audit_logger = logging.getLogger('audit')
+
+# 物流信息超过该时间未同步视为过期（分钟）
+LOGISTICS_MAX_AGE_MINUTES = 30
+# 查询失败后的重试间隔（分钟）：第n次连续失败后等待 LOGISTICS_RETRY_BASE_MINUTES * 2^(n-1)，最长LOGISTICS_RETRY_MAX_MINUTES
+LOGISTICS_RETRY_BASE_MINUTES = 5
+LOGISTICS_RETRY_MAX_MINUTES = 6 * 60
+# 每轮最多同步的订单数和并发查询线程数
+SYNC_BATCH_LIMIT = 200
+SYNC_WORKERS = 8
+
+thread_local = threading.local()
+
+
+def get_kdniao_session():
+    """每个查询线程复用自己的Session，保持与快递鸟的keep-alive连接"""
+    session = getattr(thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        thread_local.session = session
+    return session
+
+
+def query_logistics(express_number):
+    """在查询线程中执行，不访问数据库；成功返回tracking_cache的缓存条目（轨迹列表和物流状态），失败返回None"""
+    return get_tracking(express_number, session=get_kdniao_session())
+
+
+def retry_delay(failures):
+    """连续失败failures次后的重试间隔"""
+    minutes = LOGISTICS_RETRY_BASE_MINUTES * 2 ** min(failures - 1, 16)
+    return timedelta(minutes=min(minutes, LOGISTICS_RETRY_MAX_MINUTES))
+
+
+def get_stale_orders(limit=SYNC_BATCH_LIMIT):
+    """
+    有快递单号且从未同步或下次同步时间已到的已发货订单，从未同步的优先，其余按下次同步时间排序；
+    已送达的订单只同步一次，供接口展示轨迹
+    """
+    return list(
+        Order.objects
+        .filter(Q(status='shipped') | Q(status='delivered', logistics_synced_at__isnull=True))
+        .exclude(express_number__isnull=True)
+        .exclude(express_number='')
+        .filter(Q(logistics_next_sync_at__isnull=True) | Q(logistics_next_sync_at__lte=timezone.now()))
+        .order_by('logistics_next_sync_at')
+        .only(
+            'order_id', 'express_number', 'logistics_process', 'logistics_synced_at',
+            'logistics_next_sync_at', 'logistics_failures',
+        )[:limit]
+    )
+
+
+def sync_stale_logistics(max_age_minutes=LOGISTICS_MAX_AGE_MINUTES, limit=SYNC_BATCH_LIMIT, workers=SYNC_WORKERS,
+                         executor=None):
+    """
+    同步一轮到期的物流信息，返回(查询订单数, 成功数, 失败数, 自动签收数)
+    成功的订单下次同步时间推迟max_age_minutes分钟；查询失败的订单保留原有物流信息和同步时间，
+    连续失败次数加1并按retry_delay推迟下次同步
+    常驻运行时传入executor在各轮之间复用查询线程及其Session；未传入时本轮临时创建workers个线程
+    """
+    orders = get_stale_orders(limit)
+    if not orders:
+        return 0, 0, 0, 0
+
+    # 同一快递单号只查询一次
+    express_numbers = sorted({order.express_number for order in orders})
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(zip(express_numbers, executor.map(query_logistics, express_numbers)))
+    else:
+        results = dict(zip(express_numbers, executor.map(query_logistics, express_numbers)))
+
+    now = timezone.now()
+    synced_orders = []
+    failed_orders = []
+    delivered_ids = []
+    for order in orders:
+        tracking = results.get(order.express_number)
+        if tracking is None:
+            order.logistics_failures += 1
+            order.logistics_next_sync_at = now + retry_delay(order.logistics_failures)
+            failed_orders.append(order)
+            continue
+        order.logistics_process = json.dumps(tracking['logistics_info'])
+        order.logistics_synced_at = now
+        order.logistics_next_sync_at = now + timedelta(minutes=max_age_minutes)
+        order.logistics_failures = 0
+        synced_orders.append(order)
+        if is_signed_state(tracking['state']):
+            delivered_ids.append(order.order_id)
+
+    with transaction.atomic():
+        Order.objects.bulk_update(
+            synced_orders,
+            ['logistics_process', 'logistics_synced_at', 'logistics_next_sync_at', 'logistics_failures'],
+            batch_size=100,
+        )
+        Order.objects.bulk_update(failed_orders, ['logistics_next_sync_at', 'logistics_failures'], batch_size=100)
+        delivered = 0
+        if delivered_ids:
+            # 只推进仍处于shipped的订单，不覆盖同步期间被改为取消、售后等状态的订单
+            delivered = Order.objects.filter(order_id__in=delivered_ids, status='shipped').update(status='delivered')
+
+    if delivered:
+        audit_logger.info(f'物流签收自动变更订单状态: 旧状态=shipped, 新状态=delivered, 订单数={delivered}, order_ids={delivered_ids}')
+    return len(orders), len(synced_orders), len(failed_orders), delivered
@@ -0,0 +1,209 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from address.models import Address
+from commodity.models import Commodity, CommoditySituation
+from order.models import Order
+from users.models import User
+
+# 压测数据统一使用的前缀，便于清理
+BENCH_PREFIX = 'BENCH'
+
+# 本命令对比的复合索引（按名称）；只删除并恢复这些索引，模型上其他索引保持不变
+BENCHMARK_INDEXES = {
+    Order: ['order_user_status_time_idx', 'order_user_time_idx', 'order_status_time_idx', 'order_time_idx'],
+    Commodity: ['commodity_style_created_idx', 'commodity_cat_created_idx', 'commodity_created_idx'],
+    CommoditySituation: ['situation_status_idx', 'situation_style_status_idx'],
+    Address: ['address_user_default_idx'],
+}
+
+
+class Command(BaseCommand):
+    help = '在本地数据库中生成压测数据，并对比添加复合索引前后热点查询的EXPLAIN执行计划和耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help='先写入压测数据（默认只做EXPLAIN对比）')
+        parser.add_argument('--rows', type=int, default=1000000, help='写入的订单数量，默认100万')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create每批写入数量')
+        parser.add_argument('--cleanup', action='store_true', help='删除之前写入的压测数据后退出')
+        parser.add_argument('--confirm-database', metavar='NAME',
+                            help='必须与当前连接的数据库名一致，确认允许在该库中写入压测数据并临时删除索引')
+
+    def handle(self, *args, **options):
+        # DEBUG默认是True（docker-compose中也是），不能作为判断依据；必须显式写出要操作的数据库名
+        database = connection.settings_dict['NAME']
+        if options['confirm_database'] != str(database):
+            raise CommandError(
+                f'该命令会写入大量数据并临时删除索引，请只在压测库中执行，'
+                f'并通过 --confirm-database {database} 确认当前数据库'
+            )
+
+        if options['cleanup']:
+            self.cleanup()
+            return
+
+        if options['seed']:
+            self.seed(options['rows'], options['batch_size'])
+
+        queries = self.build_queries()
+
+        self.stdout.write(self.style.MIGRATE_HEADING('==== 删除复合索引后（before） ===='))
+        dropped = self.drop_indexes()
+        try:
+            before = self.explain_queries(queries)
+        finally:
+            self.stdout.write('正在恢复索引...')
+            self.create_indexes(dropped)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('==== 添加复合索引后（after） ===='))
+        after = self.explain_queries(queries)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('==== 耗时对比 ===='))
+        for label, _ in queries:
+            self.stdout.write(f'{label}: before {before[label]:.2f}ms -> after {after[label]:.2f}ms')
+
+    def seed(self, rows, batch_size):
+        """写入压测数据：订单rows条，商品与商品状态rows/10条，地址rows/10条"""
+        random.seed(20250101)
+        now = timezone.now()
+        statuses = [choice[0] for choice in Order.STATUS_CHOICES]
+        categories = [f'类目{i}' for i in range(20)]
+        catalog_rows = max(rows // 10, 1)
+
+        self.stdout.write(f'写入 {catalog_rows} 条商品和商品状态数据...')
+        started = time.monotonic()
+        for start in range(0, catalog_rows, batch_size):
+            end = min(start + batch_size, catalog_rows)
+            commodities = []
+            situations = []
+            for i in range(start, end):
+                commodity_id = f'{BENCH_PREFIX}{i:09d}'
+                style_code = f'{BENCH_PREFIX}S{i // 10:07d}'
+                commodities.append(Commodity(
+                    commodity_id=commodity_id,
+                    name=f'压测商品{i}',
+                    style_code=style_code,
+                    category=random.choice(categories),
+                    price=99.0,
+                    image='',
+                ))
+                situations.append(CommoditySituation(
+                    commodity_id=commodity_id,
+                    status=random.choice(['online', 'offline', 'pending']),
+                    style_code=style_code,
+                ))
+            # bulk_create不会触发post_save信号，不会生成图片等关联记录
+            Commodity.objects.bulk_create(commodities, batch_size=batch_size)
+            CommoditySituation.objects.bulk_create(situations, batch_size=batch_size)
+
+        self.stdout.write(f'写入 {rows} 条订单数据...')
+        for start in range(0, rows, batch_size):
+            end = min(start + batch_size, rows)
+            orders = [
+                Order(
+                    order_id=f'{BENCH_PREFIX}{i:012d}',
+                    user_id=random.randint(1, 50000),
+                    receiver_name='压测',
+                    province='省',
+                    city='市',
+                    county='县',
+                    detailed_address='地址',
+                    order_amount=99,
+                    product_list=[],
+                    status=random.choice(statuses),
+                )
+                for i in range(start, end)
+            ]
+            Order.objects.bulk_create(orders, batch_size=batch_size)
+            # order_time为auto_now_add，写入后再分散到过去一年内，模拟真实分布
+            for order in orders:
+                order.order_time = now - timedelta(minutes=random.randint(0, 525600))
+            Order.objects.bulk_update(orders, ['order_time'], batch_size=1000)
+            if (end // batch_size) % 20 == 0:
+                self.stdout.write(f'已写入 {end} 条订单...')
+
+        self.stdout.write('写入地址数据...')
+        bench_user, _ = User.objects.get_or_create(
+            openid=f'{BENCH_PREFIX}_user', defaults={'nickname': '压测用户'}
+        )
+        addresses = [
+            Address(
+                user=bench_user,
+                province='省',
+                city='市',
+                county='县',
+                detailed_address=f'地址{i}',
+                is_default=(i == 0),
+            )
+            for i in range(catalog_rows)
+        ]
+        Address.objects.bulk_create(addresses, batch_size=batch_size)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'压测数据写入完成，用时 {elapsed:.1f}s'))
+
+    def build_queries(self):
+        """与orders_query、goods_query、change_style_code_status_online、get_addresses一致的查询"""
+        since = timezone.now() - timedelta(days=30)
+        sample_style_code = f'{BENCH_PREFIX}S0000001'
+        bench_user = User.objects.filter(openid=f'{BENCH_PREFIX}_user').first()
+        online_ids = CommoditySituation.objects.filter(status='online').values_list('commodity_id', flat=True)
+
+        queries = [
+            ('orders_query(user_id)', Order.objects.filter(user_id=42).order_by('-order_time')[:20]),
+            ('orders_query(user_id+status)', Order.objects.filter(user_id=42, status='shipped').order_by('-order_time')[:20]),
+            ('orders_query(status+time)', Order.objects.filter(status='pending', order_time__gte=since).order_by('-order_time')[:20]),
+            ('orders_query(all)', Order.objects.order_by('-order_time')[:20]),
+            ('goods_query(category)', Commodity.objects.filter(category='类目3').order_by('-created_at')[:20]),
+            ('goods_query(style_code)', Commodity.objects.filter(style_code=sample_style_code).order_by('-created_at')[:1]),
+            ('goods_query(status)', Commodity.objects.filter(commodity_id__in=online_ids).order_by('-created_at')[:20]),
+            ('change_style_code_status_online', CommoditySituation.objects.filter(style_code=sample_style_code)),
+        ]
+        if bench_user:
+            queries.append(('get_addresses', Address.objects.filter(user=bench_user).order_by('-is_default', 'created_at')))
+        return queries
+
+    def explain_queries(self, queries):
+        timings = {}
+        for label, queryset in queries:
+            self.stdout.write(self.style.HTTP_INFO(f'-- {label}'))
+            self.stdout.write(queryset.explain())
+            started = time.perf_counter()
+            list(queryset.all())
+            timings[label] = (time.perf_counter() - started) * 1000
+        return timings
+
+    def drop_indexes(self):
+        """删除BENCHMARK_INDEXES中数据库里实际存在的索引，返回[(model, index)]供恢复使用"""
+        dropped = []
+        with connection.cursor() as cursor:
+            for model, names in BENCHMARK_INDEXES.items():
+                existing = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                dropped.extend(
+                    (model, index) for index in model._meta.indexes
+                    if index.name in names and index.name in existing
+                )
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.remove_index(model, index)
+        return dropped
+
+    def create_indexes(self, indexes):
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+
+    def cleanup(self):
+        deleted_orders = Order.objects.filter(order_id__startswith=BENCH_PREFIX).delete()[0]
+        deleted_situations = CommoditySituation.objects.filter(commodity_id__startswith=BENCH_PREFIX).delete()[0]
+        deleted_commodities = Commodity.objects.filter(commodity_id__startswith=BENCH_PREFIX).delete()[0]
+        deleted_users = User.objects.filter(openid=f'{BENCH_PREFIX}_user').delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'已删除压测数据：订单 {deleted_orders} 条，商品状态 {deleted_situations} 条，'
+            f'商品 {deleted_commodities} 条，用户及地址 {deleted_users} 条'
+        ))
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from order.logistics import LOGISTICS_MAX_AGE_MINUTES, SYNC_BATCH_LIMIT, SYNC_WORKERS, sync_stale_logistics
+
+
+class Command(BaseCommand):
+    help = '后台同步已发货订单的物流信息：并发查询快递鸟并批量写回，已签收的订单自动改为已送达，可使用--loop常驻定时执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='常驻运行，每隔--interval秒同步一轮')
+        parser.add_argument('--interval', type=int, default=60, help='常驻运行时两轮之间的间隔秒数，默认60')
+        parser.add_argument('--max-age', type=int, default=LOGISTICS_MAX_AGE_MINUTES,
+                            help=f'物流信息超过多少分钟未同步视为过期，默认{LOGISTICS_MAX_AGE_MINUTES}')
+        parser.add_argument('--limit', type=int, default=SYNC_BATCH_LIMIT, help=f'每轮最多同步的订单数，默认{SYNC_BATCH_LIMIT}')
+        parser.add_argument('--workers', type=int, default=SYNC_WORKERS, help=f'并发查询线程数，默认{SYNC_WORKERS}')
+
+    def handle(self, *args, **options):
+        # 查询线程池在整个命令运行期间只创建一次，各轮复用线程及其与快递鸟的keep-alive连接
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            self.sync_rounds(executor, options)
+
+    def sync_rounds(self, executor, options):
+        while True:
+            started = time.monotonic()
+            synced = 0
+            # 常驻进程中每轮开始前清理失效的数据库连接
+            close_old_connections()
+            try:
+                total, synced, failed, delivered = sync_stale_logistics(
+                    max_age_minutes=options['max_age'],
+                    limit=options['limit'],
+                    executor=executor,
+                )
+                self.stdout.write(self.style.SUCCESS(
+                    f'同步物流信息 {total} 个订单，成功 {synced} 个，失败 {failed} 个，自动签收 {delivered} 个，'
+                    f'用时 {time.monotonic() - started:.1f}s'
+                ))
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'同步物流信息失败: {str(e)}')
+
+            if not options['loop']:
+                break
+            # 本轮成功同步的订单达到上限说明还有积压，立即开始下一轮；
+            # 失败的订单已推迟下次同步时间，快递鸟故障时不会立即重试
+            if synced >= options['limit']:
+                continue
+            time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
@@ -0,0 +1,83 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:59
+
+import json
+from decimal import Decimal, InvalidOperation
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fix_invalid_product_list(apps, schema_editor):
+    """转换为JSON列之前，把无法解析的product_list重置为空列表，避免ALTER失败"""
+    Order = apps.get_model('order', 'Order')
+    invalid_ids = []
+    for order_id, product_list in Order.objects.values_list('order_id', 'product_list').iterator():
+        try:
+            json.loads(product_list)
+        except (TypeError, ValueError):
+            invalid_ids.append(order_id)
+    if invalid_ids:
+        Order.objects.filter(order_id__in=invalid_ids).update(product_list='[]')
+
+
+def backfill_order_items(apps, schema_editor):
+    """根据已有订单的product_list生成OrderItem明细（规则与OrderItem.build_from_product_list一致）"""
+    Order = apps.get_model('order', 'Order')
+    OrderItem = apps.get_model('order', 'OrderItem')
+    batch = []
+    for order_id, product_list in Order.objects.values_list('order_id', 'product_list').iterator():
+        for product in product_list or []:
+            if not isinstance(product, dict):
+                continue
+            commodity_id = product.get('commodity_id') or product.get('commodity_code') or product.get('sku_id')
+            if not commodity_id:
+                continue
+            try:
+                quantity = max(int(product.get('quantity', 1)), 1)
+            except (TypeError, ValueError):
+                quantity = 1
+            try:
+                price = Decimal(str(product['price'])) if product.get('price') not in (None, '') else None
+            except (InvalidOperation, ValueError):
+                price = None
+            batch.append(OrderItem(order_id=order_id, commodity_id=str(commodity_id), quantity=quantity, price=price))
+        if len(batch) >= 2000:
+            OrderItem.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        OrderItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0007_auto_20261018_2357'),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_invalid_product_list, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='product_list',
+            field=models.JSONField(default=list, verbose_name='商品列表'),
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity_id', models.CharField(max_length=100, verbose_name='商品ID')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='数量')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='单价')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='order.order', verbose_name='所属订单')),
+            ],
+            options={
+                'verbose_name': '订单商品明细',
+                'verbose_name_plural': '订单商品明细',
+                'db_table': 'order_item',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['commodity_id', 'order'], name='order_item_commodity_idx'),
+        ),
+        migrations.RunPython(backfill_order_items, migrations.RunPython.noop),
+    ]
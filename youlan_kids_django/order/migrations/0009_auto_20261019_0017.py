@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0008_order_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='logistics_synced_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='物流信息同步时间'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'logistics_synced_at'], name='order_status_synced_idx'),
+        ),
+    ]
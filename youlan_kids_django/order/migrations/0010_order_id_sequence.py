@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0009_auto_20261019_0017'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderIdSequence',
+            fields=[
+                ('day', models.CharField(max_length=8, primary_key=True, serialize=False, verbose_name='日期(YYYYMMDD)')),
+                ('next_value', models.BigIntegerField(default=0, verbose_name='下一个未分配的序号')),
+            ],
+            options={
+                'verbose_name': '订单号序号',
+                'verbose_name_plural': '订单号序号',
+                'db_table': 'order_id_sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:43
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def schedule_synced_orders(apps, schema_editor):
+    # 已同步过的订单沿用原来的过期规则（同步后30分钟），避免迁移后全部订单同时到期
+    Order = apps.get_model('order', 'Order')
+    Order.objects.filter(logistics_synced_at__isnull=False).update(
+        logistics_next_sync_at=F('logistics_synced_at') + timedelta(minutes=30)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0010_order_id_sequence'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_status_synced_idx',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='logistics_failures',
+            field=models.PositiveIntegerField(default=0, verbose_name='物流查询连续失败次数'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='logistics_next_sync_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='物流信息下次同步时间'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'logistics_next_sync_at'], name='order_status_next_sync_idx'),
+        ),
+        migrations.RunPython(schedule_synced_orders, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from decimal import Decimal, InvalidOperation
 from django.db import models
 from users.models import User
 
@@ -17,12 +18,18 @@ class Order(models.Model):
     express_company = models.CharField(max_length=50, blank=True, null=True, verbose_name='快递公司')
     express_number = models.CharField(max_length=50, blank=True, null=True, verbose_name='快递单号', help_text='支持字母和数字组合，如SF1234567890')
     logistics_process = models.TextField(blank=True, null=True, verbose_name='物流过程信息', help_text='存储物流跟踪信息，格式为JSON字符串：[{"time": "时间", "location": "位置", "description": "描述"}]')
+    # 后台同步任务最后一次成功查询快递鸟的时间，为空表示尚未同步
+    logistics_synced_at = models.DateTimeField(blank=True, null=True, verbose_name='物流信息同步时间')
+    # 后台同步任务下一次查询的时间：成功后为过期时间，失败后按连续失败次数退避，为空表示尽快同步
+    logistics_next_sync_at = models.DateTimeField(blank=True, null=True, verbose_name='物流信息下次同步时间')
+    logistics_failures = models.PositiveIntegerField(default=0, verbose_name='物流查询连续失败次数')
     province = models.CharField(max_length=50, verbose_name='收货省')
     city = models.CharField(max_length=50, verbose_name='市')
     county = models.CharField(max_length=50, verbose_name='县')
     detailed_address = models.CharField(max_length=255, verbose_name='详细地址')
     order_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='订单金额')
-    product_list = models.TextField(verbose_name='商品列表')
+    # 下单时提交的商品列表原始快照，按商品统计请使用OrderItem
+    product_list = models.JSONField(default=list, verbose_name='商品列表')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='订单状态')
     order_time = models.DateTimeField(auto_now_add=True, verbose_name='下单时间')
     remarks = models.TextField(blank=True, null=
@@ -32,3 +39,75 @@ class Order(models.Model):
         db_table = 'order_data'
         verbose_name = '订单信息'
         verbose_name_plural = '订单信息'
+        # 对应orders_query/batch_orders_query的过滤条件(user_id、status)和order_time倒序排序
+        indexes = [
+            models.Index(fields=['user_id', 'status', 'order_time'], name='order_user_status_time_idx'),
+            models.Index(fields=['user_id', 'order_time'], name='order_user_time_idx'),
+            models.Index(fields=['status', 'order_time'], name='order_status_time_idx'),
+            models.Index(fields=['order_time'], name='order_time_idx'),
+            # 后台物流同步按状态查找下次同步时间已到的订单
+            models.Index(fields=['status', 'logistics_next_sync_at'], name='order_status_next_sync_idx'),
+        ]
+
+
+class OrderItem(models.Model):
+    """
+    订单商品明细
+    下单时由product_list拆分写入，用于按商品/款式筛选和统计订单
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', verbose_name='所属订单')
+    commodity_id = models.CharField(max_length=100, verbose_name='商品ID')
+    quantity = models.PositiveIntegerField(default=1, verbose_name='数量')
+    price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='单价')
+
+    class Meta:
+        db_table = 'order_item'
+        verbose_name = '订单商品明细'
+        verbose_name_plural = '订单商品明细'
+        indexes = [
+            models.Index(fields=['commodity_id', 'order'], name='order_item_commodity_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id} - {self.commodity_id} x {self.quantity}'
+
+    @classmethod
+    def build_from_product_list(cls, order, product_list):
+        """
+        根据product_list生成未保存的OrderItem列表
+        商品编号依次取commodity_id、commodity_code、sku_id字段，缺少商品编号的条目只保留在快照中
+        """
+        items = []
+        for product in product_list or []:
+            if not isinstance(product, dict):
+                continue
+            commodity_id = product.get('commodity_id') or product.get('commodity_code') or product.get('sku_id')
+            if not commodity_id:
+                continue
+            try:
+                quantity = max(int(product.get('quantity', 1)), 1)
+            except (TypeError, ValueError):
+                quantity = 1
+            try:
+                price = Decimal(str(product['price'])) if product.get('price') not in (None, '') else None
+            except (InvalidOperation, ValueError):
+                price = None
+            items.append(cls(order=order, commodity_id=str(commodity_id), quantity=quantity, price=price))
+        return items
+
+
+class OrderIdSequence(models.Model):
+    """
+    订单号的每日序号
+    各worker按号段从这里领取序号，next_value为当天下一个未分配的序号
+    """
+    day = models.CharField(max_length=8, primary_key=True, verbose_name='日期(YYYYMMDD)')
+    next_value = models.BigIntegerField(default=0, verbose_name='下一个未分配的序号')
+
+    class Meta:
+        db_table = 'order_id_sequence'
+        verbose_name = '订单号序号'
+        verbose_name_plural = '订单号序号'
+
+    def __str__(self):
+        return f'{self.day}: {self.next_value}'
@@ -0,0 +1,85 @@
+"""
+订单号生成
+
+订单号格式保持为 Y + YYYYMMDD + 8位数字（共17位）。
+8位数字由当天的序号换算得到：每个worker从OrderIdSequence一次领取ORDER_ID_BLOCK_SIZE个序号，
+号段用完或跨天时再领取下一段。不同worker的号段互不重叠，同一天内的订单号不会重复，
+下单时不再需要exists()检查。
+
+序号经过与10^8互质的乘数映射（同余乘法是0~10^8-1上的一一映射），
+订单号仍然唯一，但相邻订单的号码不连续，不能直接推算出其他订单号和当天订单量。
+"""
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import OrderIdSequence
+
+ORDER_ID_PREFIX = 'Y'
+ORDER_ID_DIGITS = 8
+ORDER_ID_SPACE = 10 ** ORDER_ID_DIGITS
+# 每次从数据库领取的序号数量，进程重启时未用完的序号直接丢弃
+ORDER_ID_BLOCK_SIZE = getattr(settings, 'ORDER_ID_BLOCK_SIZE', 1000)
+# 与10^8互质（不含因子2和5）的乘数和偏移量
+ORDER_ID_MULTIPLIER = 73939133
+ORDER_ID_OFFSET = 20250101
+
+block_lock = threading.Lock()
+# 当前worker持有的号段：日期、下一个序号、号段结束（不含）
+current_block = {'day': None, 'next': 0, 'end': 0}
+
+
+def allocate_block(day, size):
+    """
+    从数据库领取day当天的size个序号，返回号段起始序号
+    UPDATE锁住当天的记录，多个worker并发领取时依次执行，号段不会重叠
+    """
+    while True:
+        with transaction.atomic():
+            updated = OrderIdSequence.objects.filter(day=day).update(next_value=F('next_value') + size)
+            if updated:
+                end = OrderIdSequence.objects.values_list('next_value', flat=True).get(day=day)
+                return end - size
+        try:
+            with transaction.atomic():
+                OrderIdSequence.objects.create(day=day, next_value=size)
+            return 0
+        except IntegrityError:
+            # 其他worker同时创建了当天的记录，重新走UPDATE
+            continue
+
+
+def format_order_id(day, sequence):
+    if sequence >= ORDER_ID_SPACE:
+        raise ValueError(f'{day}的订单号已用完')
+    number = (sequence * ORDER_ID_MULTIPLIER + ORDER_ID_OFFSET) % ORDER_ID_SPACE
+    return f'{ORDER_ID_PREFIX}{day}{number:0{ORDER_ID_DIGITS}d}'
+
+
+def generate_order_ids(count):
+    """
+    生成count个当天的订单号
+    必须在事务外调用：号段领取需要立即提交，否则外层事务回滚后本worker仍在使用的号段会被其他worker重新领取
+    """
+    if transaction.get_connection().in_atomic_block:
+        raise RuntimeError('generate_order_ids不能在事务中调用')
+    day = datetime.now().strftime('%Y%m%d')
+    order_ids = []
+    with block_lock:
+        if current_block['day'] != day:
+            current_block.update(day=day, next=0, end=0)
+        while len(order_ids) < count:
+            if current_block['next'] >= current_block['end']:
+                size = max(ORDER_ID_BLOCK_SIZE, count - len(order_ids))
+                start = allocate_block(day, size)
+                current_block.update(next=start, end=start + size)
+            order_ids.append(format_order_id(day, current_block['next']))
+            current_block['next'] += 1
+    return order_ids
+
+
+def generate_order_id():
+    return generate_order_ids(1)[0]
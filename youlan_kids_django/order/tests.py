@@ -1,3 +1,371 @@
-from django.test import TestCase
+import io
+import json
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import DataError, IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from access_token.models import AccessToken
+
+from . import logistics, tracking_cache, views
+from .management.commands.benchmark_query_indexes import Command as BenchmarkQueryIndexesCommand
+from .models import Order, OrderItem
+from .order_id import generate_order_ids
+
+
+class FakeCarrierHandler(BaseHTTPRequestHandler):
+    """
+    本地快递鸟桩：ERR开头的单号查询失败，SIGNED开头的单号返回已签收，其他单号返回在途
+    server.requests记录收到的快递单号，server.delay为每次查询的响应延迟（秒）
+    """
+
+    def do_POST(self):
+        form = urllib.parse.parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        express_number = json.loads(form['RequestData'][0])['LogisticCode']
+        self.server.requests.append(express_number)
+        time.sleep(self.server.delay)
+        if express_number.startswith('ERR'):
+            result = {'Success': False, 'Reason': '单号不存在'}
+        else:
+            result = {
+                'Success': True,
+                'LogisticCode': express_number,
+                'State': '3' if express_number.startswith('SIGNED') else '2',
+                'Traces': [{'AcceptTime': '2026-10-18 10:00:00', 'Location': '深圳', 'AcceptStation': f'{express_number}已揽收'}],
+            }
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCarrierTestCase(TestCase):
+    """启动本地快递鸟桩，通过KDNIAO_API_URL让get_kdniao_logistics请求桩服务"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.carrier = ThreadingHTTPServer(('127.0.0.1', 0), FakeCarrierHandler)
+        threading.Thread(target=cls.carrier.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.carrier.shutdown()
+        cls.carrier.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.carrier.requests = []
+        self.carrier.delay = 0
+        for name in tracking_cache.cache_stats:
+            tracking_cache.cache_stats[name] = 0
+        patcher = mock.patch.dict(os.environ, {'KDNIAO_API_URL': f'http://127.0.0.1:{self.carrier.server_port}/'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_orders(self, *express_numbers, status='shipped', **fields):
+        Order.objects.bulk_create([
+            Order(
+                order_id=f'T{index:04d}', express_number=express_number, status=status, receiver_name='张三',
+                province='广东省', city='深圳市', county='南山区', detailed_address='科技园', order_amount=100,
+                **fields,
+            )
+            for index, express_number in enumerate(express_numbers)
+        ])
+
+
+class LogisticsSyncBackoffTests(FakeCarrierTestCase):
+    """查询失败的订单按连续失败次数退避，不会挤占其他订单"""
+
+    def test_failed_orders_do_not_block_others(self):
+        self.create_orders(*[f'ERR{i}' for i in range(5)], *[f'SF{i}' for i in range(5)])
+
+        rounds = [logistics.sync_stale_logistics(limit=5, workers=2) for _ in range(3)]
+        # 前两轮处理全部订单，失败的订单已推迟，第三轮没有到期的订单
+        self.assertEqual(sum(total for total, _, _, _ in rounds), 10)
+        self.assertEqual(rounds[2], (0, 0, 0, 0))
+        self.assertEqual(sum(synced for _, synced, _, _ in rounds), 5)
+        self.assertEqual(sorted(self.carrier.requests), sorted([f'ERR{i}' for i in range(5)] + [f'SF{i}' for i in range(5)]))
+        self.assertFalse(Order.objects.filter(express_number__startswith='SF', logistics_synced_at__isnull=True).exists())
+
+    def test_shared_executor_reuses_sessions(self):
+        self.create_orders(*[f'SF{i}' for i in range(6)])
+        with mock.patch.object(logistics.requests, 'Session', wraps=logistics.requests.Session) as session_class:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                rounds = [logistics.sync_stale_logistics(limit=2, executor=executor) for _ in range(3)]
+        self.assertEqual([synced for _, synced, _, _ in rounds], [2, 2, 2])
+        # 三轮查询复用同一个线程池，每个线程只创建一次Session
+        self.assertLessEqual(session_class.call_count, 2)
+
+    def test_retry_delay_grows_and_is_capped(self):
+        self.create_orders('ERR1')
+        for failures, minutes in [(1, 5), (2, 10), (3, 20)]:
+            Order.objects.update(logistics_next_sync_at=timezone.now() - timedelta(seconds=1))
+            started = timezone.now()
+            self.assertEqual(logistics.sync_stale_logistics(), (1, 0, 1, 0))
+            order = Order.objects.get()
+            self.assertEqual(order.logistics_failures, failures)
+            self.assertIsNone(order.logistics_synced_at)
+            self.assertAlmostEqual(
+                (order.logistics_next_sync_at - started).total_seconds(), minutes * 60, delta=5,
+            )
+        self.assertEqual(logistics.retry_delay(30), timedelta(minutes=logistics.LOGISTICS_RETRY_MAX_MINUTES))
+
+    def test_success_resets_failures(self):
+        self.create_orders('SF1', logistics_failures=4, logistics_next_sync_at=timezone.now() - timedelta(seconds=1))
+        started = timezone.now()
+        self.assertEqual(logistics.sync_stale_logistics(max_age_minutes=30), (1, 1, 0, 0))
+        order = Order.objects.get()
+        self.assertEqual(order.logistics_failures, 0)
+        self.assertEqual(json.loads(order.logistics_process)[0]['description'], 'SF1已揽收')
+        self.assertAlmostEqual((order.logistics_next_sync_at - started).total_seconds(), 30 * 60, delta=5)
+
+    def test_signed_orders_delivered(self):
+        self.create_orders('SIGNED1', 'SF1')
+        self.assertEqual(logistics.sync_stale_logistics(), (2, 2, 0, 1))
+        self.assertEqual(dict(Order.objects.values_list('express_number', 'status')), {'SIGNED1': 'delivered', 'SF1': 'shipped'})
+
+
+class TrackingCacheTests(FakeCarrierTestCase):
+    """物流轨迹缓存：按物流状态设置过期时间、并发请求合并、命中统计"""
+
+    def test_timeout_depends_on_state(self):
+        shared_cache = mock.MagicMock(wraps=caches['default'])
+        with mock.patch.object(tracking_cache, 'get_tracking_cache', return_value=shared_cache):
+            tracking_cache.get_tracking('SIGNED1')
+            tracking_cache.get_tracking('SF1')
+            tracking_cache.get_tracking('ERR1')
+        timeouts = {call.args[0]: call.args[2] for call in shared_cache.set.call_args_list}
+        # 已签收永久缓存，在途缓存10分钟，查询失败不缓存
+        self.assertEqual(timeouts, {'logistics_SIGNED1': None, 'logistics_SF1': 600})
+
+    def test_concurrent_lookups_coalesced(self):
+        self.carrier.delay = 0.3
+        barrier = threading.Barrier(8)
+        results = []
+
+        def lookup():
+            barrier.wait()
+            results.append(tracking_cache.get_tracking('SF1'))
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.carrier.requests, ['SF1'])
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result == results[0] for result in results))
+        stats = tracking_cache.get_cache_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['upstream_calls'], 1)
+        self.assertEqual(stats['coalesced'] + stats['hits'], 7)
+
+    def test_hit_after_miss(self):
+        tracking_cache.get_tracking('SF1')
+        tracking_cache.get_tracking('SF1')
+        tracking_cache.get_tracking('ERR1')
+        stats = tracking_cache.get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['upstream_errors']), (1, 2, 1))
+        self.assertEqual(stats['hit_rate'], round(1 / 3, 4))
+        self.assertEqual(self.carrier.requests, ['SF1', 'ERR1'])
+
+
+class SyncLogisticsInfoViewTests(FakeCarrierTestCase):
+    """物流查询接口只读取同步结果和缓存，不调用快递鸟"""
+
+    def setUp(self):
+        super().setUp()
+        AccessToken.objects.create(ip_address='127.0.0.1', access_token='token-a')
+
+    def request(self, order_id):
+        response = self.client.post(
+            '/order/sync_logistics_info?access_token=token-a', json.dumps({'order_id': order_id}),
+            content_type='application/json', REMOTE_ADDR='127.0.0.1',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_unsynced_order_pending_without_upstream_call(self):
+        self.create_orders('SF1', logistics_process=json.dumps([{'time': '2026-10-18 09:00:00', 'description': '手动录入'}]))
+        data = self.request('T0000')
+        self.assertTrue(data['pending'])
+        self.assertIsNone(data['synced_at'])
+        self.assertEqual(data['logistics_process'][0]['description'], '手动录入')
+        self.assertEqual(self.carrier.requests, [])
+
+    def test_background_sync_fills_pending_order(self):
+        self.create_orders('SF1', 'SIGNED1', status='delivered')
+        self.assertTrue(self.request('T0000')['pending'])
+
+        self.assertEqual(logistics.sync_stale_logistics(), (2, 2, 0, 0))
+        data = self.request('T0000')
+        self.assertFalse(data['pending'])
+        self.assertIsNotNone(data['synced_at'])
+        self.assertEqual(data['logistics_process'][0]['description'], 'SF1已揽收')
+        # 已送达的订单同步一次后不再同步
+        self.assertEqual(logistics.sync_stale_logistics(), (0, 0, 0, 0))
+        self.assertEqual(sorted(self.carrier.requests), ['SF1', 'SIGNED1'])
+
+    def test_cached_tracking_returned_before_sync(self):
+        self.create_orders('SF1')
+        tracking_cache.get_tracking('SF1')
+        self.carrier.requests = []
+        data = self.request('T0000')
+        self.assertFalse(data['pending'])
+        self.assertEqual(data['logistics_process'][0]['description'], 'SF1已揽收')
+        self.assertEqual(self.carrier.requests, [])
+
+    def test_cached_tracking_time_in_beijing_time(self):
+        self.create_orders('SF1')
+        entry = tracking_cache.get_tracking('SF1')
+        # 缓存的查询时间戳为UTC 2025-10-18 08:00:00，接口按UTC+8返回
+        entry['fetched_at'] = 1760774400.0
+        tracking_cache.get_tracking_cache().set(tracking_cache.tracking_cache_key('SF1'), entry)
+        self.assertEqual(self.request('T0000')['synced_at'], '2025-10-18 16:00:00')
+
+
+class AddOrderTests(TransactionTestCase):
+    """
+    新增订单：按模型字段约束逐条校验，批量新增时错误的订单不影响其他订单，只有订单号冲突时重试
+    生成订单号不能在事务中调用，使用TransactionTestCase
+    """
+
+    def setUp(self):
+        AccessToken.objects.create(ip_address='127.0.0.1', access_token='token-a')
+
+    def order_data(self, **fields):
+        data = {
+            'user_id': 1, 'receiver_name': '张三', 'receiver_phone': '13800000000', 'province': '广东省',
+            'city': '深圳市', 'county': '南山区', 'detailed_address': '科技园', 'order_amount': 99.9,
+            'product_list': [{'commodity_id': 'C001', 'quantity': 2, 'price': '49.95'}],
+        }
+        data.update(fields)
+        return data
+
+    def post(self, path, data):
+        return self.client.post(
+            f'/order/{path}?access_token=token-a', json.dumps(data),
+            content_type='application/json', REMOTE_ADDR='127.0.0.1',
+        )
+
+    def test_batch_reports_invalid_items_and_creates_valid_ones(self):
+        response = self.post('batch_add_orders', {'orders': [
+            self.order_data(), self.order_data(), self.order_data(receiver_name=None),
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual((data['created'], data['failed']), (2, 1))
+        self.assertEqual([result['status'] for result in data['results']], ['success', 'success', 'error'])
+        self.assertEqual(data['results'][2]['message'], 'receiver_name不能为空')
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderItem.objects.count(), 2)
+
+    def test_model_constraints_validated(self):
+        cases = [
+            (self.order_data(receiver_phone='1' * 16), 'receiver_phone长度不能超过15'),
+            (self.order_data(receiver_name='张' * 101), 'receiver_name长度不能超过100'),
+            (self.order_data(order_amount='123456789.00'), 'order_amount超出范围，整数部分最多8位'),
+            (self.order_data(product_list=[{'commodity_id': 'C001', 'price': '1e9'}]), 'product_list中商品C001的price超出范围，整数部分最多8位'),
+        ]
+        response = self.post('batch_add_orders', {'orders': [order for order, _ in cases]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['message'] for result in response.json()['data']['results']], [message for _, message in cases])
+        for order, message in cases:
+            response = self.post('add_order', order)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['message'], message)
+        self.assertFalse(Order.objects.exists())
+
+    def test_amount_rounded_to_decimal_places(self):
+        response = self.post('add_order', self.order_data(order_amount=0.1 + 0.2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(str(Order.objects.get().order_amount), '0.30')
+
+    def test_retry_on_order_id_conflict(self):
+        taken, fresh = generate_order_ids(2)
+        Order.objects.create(order_id=taken, receiver_name='李四', province='广东省', city='深圳市', county='南山区', detailed_address='科技园', order_amount=1)
+        with mock.patch.object(views, 'generate_order_id', side_effect=[taken, fresh]) as generate:
+            response = self.post('add_order', self.order_data())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['order_id'], fresh)
+        self.assertEqual(generate.call_count, 2)
+
+    def test_other_integrity_errors_not_retried(self):
+        with mock.patch.object(views, 'generate_order_id', wraps=views.generate_order_id) as generate, \
+                mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=IntegrityError('外键约束')):
+            response = self.post('add_order', self.order_data())
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(generate.call_count, 1)
+        self.assertFalse(Order.objects.exists())
+
+    def test_batch_falls_back_to_single_inserts(self):
+        save_orders = views.save_orders
+
+        def fail_on_bad_order(orders):
+            # 模拟数据库拒绝某个订单（如字符集不支持的字符）
+            if any(order.receiver_name == '坏数据' for order in orders):
+                raise DataError('Incorrect string value')
+            save_orders(orders)
+
+        with mock.patch.object(views, 'save_orders', side_effect=fail_on_bad_order) as save, \
+                mock.patch.object(views, 'generate_order_ids', wraps=views.generate_order_ids) as generate:
+            response = self.post('batch_add_orders', {'orders': [
+                self.order_data(), self.order_data(receiver_name='坏数据'), self.order_data(),
+            ]})
+        data = response.json()['data']
+        self.assertEqual((data['created'], data['failed']), (2, 1))
+        self.assertEqual([result['status'] for result in data['results']], ['success', 'error', 'success'])
+        self.assertEqual(set(Order.objects.values_list('order_id', flat=True)), {data['results'][0]['order_id'], data['results'][2]['order_id']})
+        # 不是订单号冲突，不换订单号重试：整批写入一次，逐个写入三次
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(save.call_count, 4)
+
+
+class BenchmarkQueryIndexesTests(TransactionTestCase):
+    """索引压测命令：必须确认数据库名，只删除并恢复它对比的索引"""
+
+    def order_indexes(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, Order._meta.db_table))
+
+    def test_requires_confirmed_database(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_query_indexes', stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_query_indexes', confirm_database='wechat_member', stdout=io.StringIO())
+        self.assertIn('order_time_idx', self.order_indexes())
+
+    def test_drops_only_benchmark_indexes(self):
+        command = BenchmarkQueryIndexesCommand(stdout=io.StringIO())
+        dropped = command.drop_indexes()
+        try:
+            indexes = self.order_indexes()
+            self.assertNotIn('order_time_idx', indexes)
+            self.assertNotIn('order_user_status_time_idx', indexes)
+            # 其他功能添加的索引不受影响
+            self.assertIn('order_status_next_sync_idx', indexes)
+        finally:
+            command.create_indexes(dropped)
+        self.assertIn('order_time_idx', self.order_indexes())
+
+    def test_restores_indexes_after_run(self):
+        call_command('benchmark_query_indexes', confirm_database=connection.settings_dict['NAME'], stdout=io.StringIO())
+        self.assertTrue({'order_time_idx', 'order_status_next_sync_idx'} <= self.order_indexes())
@@ -0,0 +1,145 @@
+"""
+快递鸟物流轨迹缓存
+
+按快递单号缓存get_kdniao_logistics的查询结果，过期时间取决于物流状态：
+在途的轨迹很快会变化，只缓存几分钟；已签收的轨迹不会再变化，永久缓存。
+查询失败的结果不缓存。
+
+同一worker内多个线程同时查询同一个未缓存的单号时，只有第一个线程调用快递鸟，
+其他线程等待并共享它的结果（请求合并）。命中/未命中次数按worker（进程）单独统计。
+接口请求只通过peek_tracking读取缓存，不调用快递鸟；get_tracking由后台同步任务调用。
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .demo import get_kdniao_logistics
+
+logger = logging.getLogger(__name__)
+
+# 快递鸟物流状态：0暂无轨迹 1已揽收 2在途中 3已签收 4问题件
+TRACKING_STATE_SIGNED = '3'
+# 各物流状态的缓存时间（秒），None表示永久缓存
+TRACKING_CACHE_TIMEOUTS = {
+    '0': 300,
+    '1': 600,
+    '2': 600,
+    TRACKING_STATE_SIGNED: None,
+    '4': 1800,
+}
+# 未知状态的缓存时间（秒）
+TRACKING_CACHE_DEFAULT_TIMEOUT = getattr(settings, 'LOGISTICS_CACHE_DEFAULT_TIMEOUT', 600)
+
+stats_lock = threading.Lock()
+cache_stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'upstream_calls': 0, 'upstream_errors': 0}
+
+inflight_lock = threading.Lock()
+# 快递单号 -> 正在进行的快递鸟查询
+inflight_queries = {}
+
+
+def get_tracking_cache():
+    return caches[getattr(settings, 'LOGISTICS_CACHE_ALIAS', 'default')]
+
+
+def tracking_cache_key(express_number):
+    return f'logistics_{express_number}'
+
+
+def record_stat(name):
+    with stats_lock:
+        cache_stats[name] += 1
+
+
+def is_signed_state(state):
+    """快递鸟的签收状态为3，细分状态（301正常签收、304代收签收等）同样以3开头"""
+    return str(state).startswith(TRACKING_STATE_SIGNED)
+
+
+def tracking_cache_timeout(state):
+    if is_signed_state(state):
+        return None
+    return TRACKING_CACHE_TIMEOUTS.get(str(state), TRACKING_CACHE_DEFAULT_TIMEOUT)
+
+
+def fetch_tracking(express_number, session=None):
+    """调用快递鸟并写入缓存；成功返回缓存条目，失败返回None"""
+    record_stat('upstream_calls')
+    try:
+        result = get_kdniao_logistics(express_number, session=session)
+    except Exception as e:
+        record_stat('upstream_errors')
+        logger.error(f'调用物流API异常: express_number={express_number}, {str(e)}')
+        return None
+    if not result.get('success'):
+        record_stat('upstream_errors')
+        logger.error(f'调用快递鸟API失败: express_number={express_number}, {result.get("message", "未知错误")}')
+        return None
+
+    state = str(result['data'].get('state', ''))
+    entry = {
+        'logistics_info': result['data']['logistics_info'],
+        'state': state,
+        'fetched_at': time.time(),
+    }
+    get_tracking_cache().set(tracking_cache_key(express_number), entry, tracking_cache_timeout(state))
+    return entry
+
+
+def peek_tracking(express_number):
+    """只读取缓存，不调用快递鸟；未缓存返回None"""
+    entry = get_tracking_cache().get(tracking_cache_key(express_number))
+    if entry is not None:
+        record_stat('hits')
+    return entry
+
+
+def get_tracking(express_number, session=None):
+    """
+    查询快递单号的物流轨迹，优先读取缓存
+    返回{'logistics_info': 轨迹列表, 'state': 物流状态, 'fetched_at': 查询时间戳}，查询失败返回None
+    """
+    entry = get_tracking_cache().get(tracking_cache_key(express_number))
+    if entry is not None:
+        record_stat('hits')
+        return entry
+
+    with inflight_lock:
+        future = inflight_queries.get(express_number)
+        leader = future is None
+        if leader:
+            future = Future()
+            inflight_queries[express_number] = future
+
+    if not leader:
+        record_stat('coalesced')
+        return future.result()
+
+    record_stat('misses')
+    entry = None
+    try:
+        entry = fetch_tracking(express_number, session)
+    finally:
+        # 先写缓存再移除，之后的调用直接命中缓存
+        with inflight_lock:
+            inflight_queries.pop(express_number, None)
+        future.set_result(entry)
+    return entry
+
+
+def get_cache_stats():
+    """当前worker的物流缓存统计"""
+    with stats_lock:
+        stats = dict(cache_stats)
+    lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+    stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0
+    with inflight_lock:
+        stats['inflight'] = len(inflight_queries)
+    stats['pid'] = os.getpid()
+    stats['backend'] = type(get_tracking_cache()).__name__
+    return stats
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('add_order', views.add_order, name='add_order'),
+    path('batch_add_orders', views.batch_add_orders, name='batch_add_orders'),
     path('query_order_data', views.query_order_data, name='query_order_data'),
     path('change_receiving_data', views.change_receiving_data, name='change_receiving_data'),
     path('change_status', views.change_status, name='change_status'),
@@ -10,4 +11,5 @@ urlpatterns = [
     path('batch_orders_query', views.batch_orders_query, name='batch_orders_query'),
     path('update_express_info', views.update_express_info, name='update_express_info'),
     path('sync_logistics_info', views.sync_logistics_info, name='sync_logistics_info'),
+    path('logistics_cache_stats', views.logistics_cache_stats, name='logistics_cache_stats'),
 ]
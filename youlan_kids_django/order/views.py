@@ -1,33 +1,185 @@
+import base64
+import binascii
 import random
 from dataclasses import field
 import re
-from datetime import datetime
-import secrets
+from datetime import datetime, timezone
 from django.http import JsonResponse, HttpResponseNotFound
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.hashers import make_password
-from  .models import Order
+from  .models import Order, OrderItem
 from django.shortcuts import render
 from django.http import HttpResponse
 from django.views.decorators.http import require_http_methods
-from django.db import IntegrityError
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError
 import logging
 import json
 from django.db import transaction
+from django.db.models import Q
 from django.urls import reverse
-from order.demo import get_kdniao_logistics
+from commodity.models import Commodity
 from django.http import JsonResponse
 import json
 import logging
 from django.forms.models import model_to_dict
 from django.core.serializers.json import DjangoJSONEncoder
 from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from .order_id import generate_order_id, generate_order_ids
+from .tracking_cache import get_cache_stats as get_logistics_cache_stats, peek_tracking
 
 # 初始化审计日志
 logger = logging.getLogger(__name__)
 audit_logger = logging.getLogger('audit')
 
 
+def encode_order_cursor(order):
+    """将订单的(order_time, order_id)编码为不透明的游标字符串"""
+    raw = json.dumps([order.order_time.isoformat(), order.order_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_order_cursor(cursor):
+    """解析游标字符串，返回(order_time, order_id)；游标无效时抛出ValueError"""
+    try:
+        order_time, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return datetime.fromisoformat(order_time), str(order_id)
+    except (AttributeError, TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValueError('cursor无效')
+
+
+def paginate_orders(queryset, data, page, page_size):
+    """
+    订单列表分页
+
+    默认按page/page_size做偏移分页；请求体中包含cursor参数时（首页传null或空字符串）
+    改为按(order_time, order_id)倒序的游标分页，深翻页不再随OFFSET变慢。
+    need_total为false时跳过COUNT查询，total返回null。
+
+    Returns:
+        tuple: (当前页订单列表, 需要合并到响应中的分页字段)
+    """
+    need_total = data.get('need_total', True) is not False
+    pagination = {'page_size': page_size}
+
+    if 'cursor' in data:
+        cursor = data.get('cursor')
+        orders_qs = queryset.order_by('-order_time', '-order_id')
+        if cursor:
+            cursor_time, cursor_id = decode_order_cursor(cursor)
+            orders_qs = orders_qs.filter(
+                Q(order_time__lt=cursor_time) | Q(order_time=cursor_time, order_id__lt=cursor_id)
+            )
+        # 多取一条用于判断是否还有下一页
+        orders = list(orders_qs[:page_size + 1])
+        has_more = len(orders) > page_size
+        orders = orders[:page_size]
+        pagination['next_cursor'] = encode_order_cursor(orders[-1]) if has_more else None
+    else:
+        offset = (page - 1) * page_size
+        orders = list(queryset.order_by('-order_time')[offset:offset+page_size])
+        pagination['page'] = page
+
+    pagination['total'] = queryset.count() if need_total else None
+    return orders, pagination
+
+
+# 新增订单的必填参数
+ORDER_REQUIRED_FIELDS = ['receiver_name', 'province', 'city', 'county', 'detailed_address', 'order_amount', 'product_list', 'user_id']
+# 批量新增订单每次最多提交的订单数
+BATCH_ADD_ORDER_LIMIT = 500
+
+
+def validate_order_data(data):
+    """校验新增订单的参数，返回错误信息，校验通过返回None"""
+    if not isinstance(data, dict):
+        return '订单数据必须是对象'
+    for field in ORDER_REQUIRED_FIELDS:
+        if field not in data:
+            return f'缺少必填参数: {field}'
+    # 验证product_list是否为列表
+    if not isinstance(data.get('product_list'), list):
+        return 'product_list必须是列表类型'
+    # 金额和用户ID不合法时整批bulk_create都会失败，写入前逐条校验
+    try:
+        if not Decimal(str(data['order_amount'])).is_finite():
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        return 'order_amount必须是数字'
+    try:
+        int(data['user_id'])
+    except (TypeError, ValueError):
+        return 'user_id必须是整数'
+    # 按模型字段约束校验：为空、超长或超出精度的值写入时会报错，批量写入时会导致整批失败
+    order = build_order(None, data)
+    error = validate_model_fields(order, exclude={'order_id'})
+    if error:
+        return error
+    for item in OrderItem.build_from_product_list(order, data['product_list']):
+        error = validate_model_fields(item, exclude={'order'})
+        if error:
+            return f'product_list中商品{item.commodity_id[:20]}的{error}'
+    return None
+
+
+def validate_model_fields(instance, exclude=()):
+    """
+    按模型字段的null、max_length、max_digits和整数范围校验未保存的对象，返回错误信息，校验通过返回None
+    只校验写入数据库会失败的约束，不校验blank（空字符串可以写入）
+    """
+    for field in instance._meta.concrete_fields:
+        if field.name in exclude or field.primary_key or getattr(field, 'auto_now_add', False):
+            continue
+        value = getattr(instance, field.attname)
+        if value is None:
+            if field.null:
+                continue
+            return f'{field.name}不能为空'
+        try:
+            value = field.to_python(value)
+        except ValidationError:
+            return f'{field.name}格式不正确'
+        try:
+            if field.get_internal_type() == 'DecimalField':
+                # 写入时按decimal_places四舍五入，这里只校验四舍五入后的位数
+                value = value.quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP)
+            field.run_validators(value)
+        except (ValidationError, InvalidOperation):
+            if field.max_length:
+                return f'{field.name}长度不能超过{field.max_length}'
+            if field.get_internal_type() == 'DecimalField':
+                return f'{field.name}超出范围，整数部分最多{field.max_digits - field.decimal_places}位'
+            return f'{field.name}超出范围'
+    return None
+
+
+def order_id_conflict(order_ids):
+    """
+    写入失败后判断是否为订单号冲突（其他服务已写入相同的订单号）
+    写入事务已回滚，数据库中存在的订单号都是其他服务写入的
+    """
+    return Order.objects.filter(order_id__in=order_ids).exists()
+
+
+def build_order(order_id, data):
+    """根据请求参数生成未保存的订单"""
+    return Order(
+        order_id=order_id,
+        user_id=data['user_id'],
+        receiver_name=data['receiver_name'],
+        receiver_phone=data.get('receiver_phone', ''),
+        province=data['province'],
+        city=data['city'],
+        county=data['county'],
+        detailed_address=data['detailed_address'],
+        order_amount=data['order_amount'],
+        product_list=data['product_list'],  # 商品列表原始快照
+        express_company=data.get('express_company', ''),
+        express_number=data.get('express_number', '')
+    )
+
+
 @csrf_exempt
 @require_http_methods(['POST'])
 def add_order(request):  #新增订单
@@ -35,49 +187,29 @@ def add_order(request):  #新增订单
         # 解析请求体数据
         data = json.loads(request.body)
 
-        # 验证必填参数
-        required_fields = ['receiver_name', 'province', 'city', 'county', 'detailed_address', 'order_amount', 'product_list', 'user_id']
-        for field in required_fields:
-            if field not in data:
-                return JsonResponse({'status': 'error', 'message': f'缺少必填参数: {field}'}, status=400)
-
-        # 验证product_list是否为列表
-        if not isinstance(data.get('product_list'), list):
-            return JsonResponse({'status': 'error', 'message': 'product_list必须是列表类型'}, status=400)
+        # 验证必填参数和product_list类型
+        error = validate_order_data(data)
+        if error:
+            return JsonResponse({'status': 'error', 'message': error}, status=400)
 
-        # 生成order_id: Y+YYYYMMDD+8位随机数字
-
-        current_date = datetime.now().strftime('%Y%m%d')
+        # 生成order_id: Y+YYYYMMDD+8位数字，由每日序号号段生成，不会重复
+        # 兼容其他服务写入的订单号，主键冲突时换一个订单号重试
         max_retries = 5
-        retry_count = 0
-        order = None
-        while retry_count < max_retries:
+        for retry_count in range(max_retries):
+            order_id = generate_order_id()
+            # 创建订单，包含新增字段；订单与商品明细在同一事务中写入
+            order = build_order(order_id, data)
             try:
-                random_num = ''.join(secrets.choice('0123456789') for _ in range(8))
-                order_id = f'Y{current_date}{random_num}'
-                
-                # 检查order_id是否已存在
-                if not Order.objects.filter(order_id=order_id).exists():
-                    # 创建订单，包含新增字段
-                    order = Order(
-                        order_id=order_id,
-                        user_id=data['user_id'],
-                        receiver_name=data['receiver_name'],
-                        receiver_phone=data.get('receiver_phone', ''),
-                        province=data['province'],
-                        city=data['city'],
-                        county=data['county'],
-                        detailed_address=data['detailed_address'],
-                        order_amount=data['order_amount'],
-                        product_list=json.dumps(data['product_list']),  # 将列表转换为JSON字符串存储
-                        express_company=data.get('express_company', ''),
-                        express_number=data.get('express_number', '')
-                    )
-                    order.save()
-                    break
+                with transaction.atomic():
+                    # force_insert直接INSERT，不先按主键UPDATE
+                    order.save(force_insert=True)
+                    OrderItem.objects.bulk_create(OrderItem.build_from_product_list(order, data['product_list']))
+                break
             except IntegrityError:
-                retry_count += 1
-                if retry_count >= max_retries:
+                # 只有订单号冲突时换订单号重试，其他约束错误直接抛出
+                if not order_id_conflict([order_id]):
+                    raise
+                if retry_count + 1 >= max_retries:
                     raise Exception("生成订单号失败，重试次数过多")
 
         return JsonResponse({
@@ -100,6 +232,97 @@ def add_order(request):  #新增订单
         logger.error(f'创建订单失败: {str(e)}')
         return JsonResponse({'status': 'error', 'message': f'服务器内部错误: {str(e)}'}, status=500)
 
+
+def save_orders(orders):
+    """在同一个事务中写入订单和商品明细"""
+    items = []
+    for order in orders:
+        items.extend(OrderItem.build_from_product_list(order, order.product_list))
+    with transaction.atomic():
+        Order.objects.bulk_create(orders, batch_size=BATCH_ADD_ORDER_LIMIT)
+        OrderItem.objects.bulk_create(items, batch_size=1000)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def batch_add_orders(request):  # 批量新增订单
+    """
+    请求体：{"orders": [订单参数, ...]}，每个订单的参数与add_order相同
+    校验通过的订单批量分配订单号，在同一个事务中bulk_create写入订单和商品明细；
+    校验失败的订单不写入，在results中按下标返回失败原因。
+    整批写入因订单号冲突失败时换一批订单号重试；因其他数据库错误失败时改为逐个订单写入，
+    只有写入失败的订单返回错误，其他订单正常创建
+    """
+    try:
+        data = json.loads(request.body)
+        orders_data = data.get('orders') if isinstance(data, dict) else None
+
+        if not isinstance(orders_data, list) or not orders_data:
+            return JsonResponse({'status': 'error', 'message': 'orders必须是非空列表'}, status=400)
+        if len(orders_data) > BATCH_ADD_ORDER_LIMIT:
+            return JsonResponse({'status': 'error', 'message': f'每次最多提交{BATCH_ADD_ORDER_LIMIT}个订单'}, status=400)
+
+        results = []
+        valid_items = []
+        for index, order_data in enumerate(orders_data):
+            error = validate_order_data(order_data)
+            if error:
+                results.append({'index': index, 'status': 'error', 'message': error})
+            else:
+                results.append(None)
+                valid_items.append((index, order_data))
+
+        # 兼容其他服务写入的订单号，订单号冲突时整批换订单号重试
+        max_retries = 5
+        order_ids = []
+        # 逐个写入时失败的订单：下标 -> 错误信息
+        insert_errors = {}
+        for retry_count in range(max_retries if valid_items else 0):
+            order_ids = generate_order_ids(len(valid_items))
+            orders = [build_order(order_id, order_data) for order_id, (_, order_data) in zip(order_ids, valid_items)]
+            try:
+                save_orders(orders)
+                break
+            except (IntegrityError, DataError) as e:
+                if order_id_conflict(order_ids):
+                    if retry_count + 1 >= max_retries:
+                        raise Exception("生成订单号失败，重试次数过多")
+                    continue
+                # 不是订单号冲突：改为逐个写入，一个订单写入失败不影响其他订单
+                logger.warning(f'批量写入订单失败，改为逐个写入: {str(e)}')
+                for order, (index, _) in zip(orders, valid_items):
+                    try:
+                        save_orders([order])
+                    except (IntegrityError, DataError) as item_error:
+                        logger.error(f'写入订单失败: index={index}, {str(item_error)}')
+                        insert_errors[index] = '订单写入失败，请检查订单数据'
+                break
+
+        for order_id, (index, order_data) in zip(order_ids, valid_items):
+            if index in insert_errors:
+                results[index] = {'index': index, 'status': 'error', 'message': insert_errors[index]}
+            else:
+                results[index] = {'index': index, 'status': 'success', 'order_id': order_id, 'user_id': order_data['user_id']}
+
+        created = len(valid_items) - len(insert_errors)
+        failed = len(orders_data) - created
+        return JsonResponse({
+            'status': 'success' if created else 'error',
+            'message': f'批量创建订单完成，成功{created}个，失败{failed}个',
+            'data': {
+                'total': len(orders_data),
+                'created': created,
+                'failed': failed,
+                'results': results
+            }
+        }, status=200 if created else 400)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': '请求体格式不是有效的JSON'}, status=400)
+    except Exception as e:
+        logger.error(f'批量创建订单失败: {str(e)}')
+        return JsonResponse({'status': 'error', 'message': f'服务器内部错误: {str(e)}'}, status=500)
+
 @csrf_exempt
 @require_http_methods(['POST'])
 def query_order_data(request):  # 查询订单信息
@@ -124,11 +347,8 @@ def query_order_data(request):  # 查询订单信息
         except Order.DoesNotExist:
             return JsonResponse({'status': 'error', 'message': '订单不存在'}, status=404)
 
-        # 解析商品列表
-        try:
-            product_list = json.loads(order.product_list)
-        except json.JSONDecodeError:
-            product_list = []
+        # 商品列表（JSONField，已是列表）
+        product_list = order.product_list or []
 
         # 转换下单时间为UTC+8并格式化
         order_time_cn = order.order_time + timedelta(hours=8)
@@ -269,6 +489,11 @@ def update_express_info(request):  # 修改订单物流信息
             order.express_company = express_company
             updated_fields['express_company'] = express_company
         if express_number is not None:
+            if express_number != order.express_number:
+                # 快递单号变更后旧的同步结果和失败次数失效，后台任务会优先同步
+                order.logistics_synced_at = None
+                order.logistics_next_sync_at = None
+                order.logistics_failures = 0
             order.express_number = express_number
             updated_fields['express_number'] = express_number
         if logistics_process is not None:
@@ -284,11 +509,8 @@ def update_express_info(request):  # 修改订单物流信息
         # 记录物流信息变更日志
         audit_logger.info(f'订单物流信息变更: order_id={order_id}, 更新字段={updated_fields}')
 
-        # 解析商品列表用于返回
-        try:
-            product_list = json.loads(order.product_list)
-        except json.JSONDecodeError:
-            product_list = []
+        # 商品列表（JSONField，已是列表）用于返回
+        product_list = order.product_list or []
 
         # 转换下单时间为UTC+8并格式化
         order_time_cn = order.order_time + timedelta(hours=8)
@@ -322,6 +544,14 @@ def update_express_info(request):  # 修改订单物流信息
         return JsonResponse({'status': 'error', 'message': '服务器内部错误'}, status=500)
 
 
+def load_logistics_process(logistics_process):
+    """解析保存的物流信息JSON，为空或格式错误时返回空列表"""
+    try:
+        return json.loads(logistics_process) if logistics_process else []
+    except ValueError:
+        return []
+
+
 @csrf_exempt
 @require_http_methods(['POST'])
 def sync_logistics_info(request):  # 同步物流信息
@@ -329,8 +559,6 @@ def sync_logistics_info(request):  # 同步物流信息
         # 解析请求体数据
         data = json.loads(request.body)
         order_id = data.get('order_id')
-        express_company = data.get('express_company')
-        express_number = data.get('express_number')
 
         # 验证必要参数
         if not order_id:
@@ -346,47 +574,38 @@ def sync_logistics_info(request):  # 同步物流信息
         if order.status not in ['shipped', 'delivered']:
             return JsonResponse({'status': 'error', 'message': '只有已发货和已送达状态的订单才支持同步物流信息'}, status=400)
 
-        # 从订单中获取物流信息
-        express_company = order.express_company
-        express_number = order.express_number
-
         # 检查是否有物流单号
-        if not express_number:
+        if not order.express_number:
             return JsonResponse({'status': 'error', 'message': '订单没有物流单号，无法同步物流信息'}, status=400)
 
-
-
-        # 实际物流信息查询逻辑 - 使用快递鸟API
-        logistics_process = []
-        try:
-            # 直接调用快递鸟API查询真实物流信息
-            result = get_kdniao_logistics(express_number)
-            if result.get('success'):
-                logistics_process = result['data']['logistics_info']
+        # 物流信息由后台任务（manage.py sync_logistics）定时同步，这里返回已同步的结果和同步时间，不调用快递鸟
+        synced_at = None
+        pending = False
+        if order.logistics_synced_at:
+            logistics_process = load_logistics_process(order.logistics_process)
+            # 转换同步时间为UTC+8并格式化
+            synced_at = (order.logistics_synced_at + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            # 后台任务尚未同步的订单只读取物流缓存，缓存中没有时返回已保存的物流信息并标记为同步中
+            tracking = peek_tracking(order.express_number)
+            if tracking:
+                logistics_process = tracking['logistics_info']
+                synced_at = (datetime.fromtimestamp(tracking['fetched_at'], tz=timezone.utc) + timedelta(hours=8)).strftime('%Y-%m-%d %H:%M:%S')
             else:
-                logger.error(f'调用快递鸟API失败: {result.get("message", "未知错误")}')
-        except Exception as e:
-            logger.error(f'调用物流API异常: {str(e)}')
-            # 如果API调用失败，返回空列表
-
-        # 更新订单的物流信息
-        order.express_company = express_company
-        order.express_number = express_number
-        order.logistics_process = json.dumps(logistics_process)
-        order.save()
-
-        # 记录物流信息同步日志
-        audit_logger.info(f'订单物流信息同步: order_id={order_id}, express_company={express_company}, express_number={express_number}')
+                logistics_process = load_logistics_process(order.logistics_process)
+                pending = True
 
         # 返回物流信息（只包含订单号和物流相关信息）
         return JsonResponse({
             'status': 'success', 
-            'message': '物流信息同步成功',
+            'message': '物流信息正在同步，请稍后再试' if pending else '物流信息查询成功',
             'data': {
                 'order_id': order.order_id,
                 'express_company': order.express_company or '',
                 'express_number': order.express_number or '',
-                'logistics_process': logistics_process
+                'logistics_process': logistics_process,
+                'synced_at': synced_at,
+                'pending': pending
             }
         })
 
@@ -450,11 +669,8 @@ def change_status(request):  # 修改订单状态
         # 记录状态变更日志
         audit_logger.info(f'订单状态变更: order_id={order_id}, 旧状态={old_status}, 新状态={status}')
 
-        # 解析商品列表用于返回
-        try:
-            product_list = json.loads(order.product_list)
-        except json.JSONDecodeError:
-            product_list = []
+        # 商品列表（JSONField，已是列表）用于返回
+        product_list = order.product_list or []
 
         # 转换下单时间为UTC+8并格式化
         order_time_cn = order.order_time + timedelta(hours=8)
@@ -581,6 +797,20 @@ def orders_query(request):
                 }, status=400)
             queryset = queryset.filter(status=order_status)
         
+        # 按商品或款式筛选订单：通过OrderItem明细表关联，走order_item_commodity_idx索引
+        commodity_id = data.get('commodity_id')
+        style_code = data.get('style_code')
+        if commodity_id:
+            queryset = queryset.filter(
+                order_id__in=OrderItem.objects.filter(commodity_id=commodity_id).values('order_id')
+            )
+        if style_code:
+            queryset = queryset.filter(
+                order_id__in=OrderItem.objects.filter(
+                    commodity_id__in=Commodity.objects.filter(style_code=style_code).values('commodity_id')
+                ).values('order_id')
+            )
+        
         # 应用日期过滤
         if begin_utc and end_utc:
             queryset = queryset.filter(order_time__range=(begin_utc, end_utc))
@@ -589,11 +819,14 @@ def orders_query(request):
         elif end_utc:
             queryset = queryset.filter(order_time__lt=end_utc)
         
-        # 计算查询偏移量
-        offset = (page - 1) * page_size
-        
-        # 查询订单数据并分页
-        orders = queryset.order_by('-order_time')[offset:offset+page_size]
+        # 查询订单数据并分页（支持偏移分页和游标分页）
+        try:
+            orders, pagination = paginate_orders(queryset, data, page, page_size)
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error', 
+                'message': str(e)
+            }, status=400)
         
         # 处理订单数据
         result = []
@@ -602,11 +835,8 @@ def orders_query(request):
             order_time_cn = order.order_time + timedelta(hours=8)
             formatted_time = order_time_cn.strftime('%Y-%m-%d %H:%M:%S')
             
-            # 解析商品列表
-            try:
-                product_list = json.loads(order.product_list)
-            except json.JSONDecodeError:
-                product_list = []
+            # 商品列表（JSONField，已是列表）
+            product_list = order.product_list or []
             
             result.append({
                 'order_id': order.order_id,
@@ -625,9 +855,7 @@ def orders_query(request):
         return JsonResponse({
             'status': 'success',
             'data': result,
-            'page': page,
-            'page_size': page_size,
-            'total': queryset.count()
+            **pagination
         })
         
     except json.JSONDecodeError:
@@ -747,11 +975,14 @@ def batch_orders_query(request):
         elif end_utc:
             queryset = queryset.filter(order_time__lt=end_utc)
         
-        # 计算查询偏移量
-        offset = (page - 1) * page_size
-        
-        # 查询订单数据并分页
-        orders = queryset.order_by('-order_time')[offset:offset+page_size]
+        # 查询订单数据并分页（支持偏移分页和游标分页）
+        try:
+            orders, pagination = paginate_orders(queryset, data, page, page_size)
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error', 
+                'message': str(e)
+            }, status=400)
         
         # 处理订单数据
         result = []
@@ -760,11 +991,8 @@ def batch_orders_query(request):
             order_time_cn = order.order_time + timedelta(hours=8)
             formatted_time = order_time_cn.strftime('%Y-%m-%d %H:%M:%S')
             
-            # 解析商品列表
-            try:
-                product_list = json.loads(order.product_list)
-            except json.JSONDecodeError:
-                product_list = []
+            # 商品列表（JSONField，已是列表）
+            product_list = order.product_list or []
             
             result.append({
                 'order_id': order.order_id,
@@ -783,9 +1011,7 @@ def batch_orders_query(request):
         return JsonResponse({
             'status': 'success',
             'data': result,
-            'page': page,
-            'page_size': page_size,
-            'total': queryset.count()
+            **pagination
         })
         
     except json.JSONDecodeError:
@@ -800,3 +1026,12 @@ def batch_orders_query(request):
             'message': f'服务器内部错误: {str(e)}'
         }, status=500)
 
+
+@csrf_exempt
+def logistics_cache_stats(request):
+    """返回处理本次请求的worker的物流缓存命中统计"""
+    return JsonResponse({
+        'status': 'success',
+        'message': '物流缓存统计查询成功',
+        'data': get_logistics_cache_stats()
+    })
@@ -0,0 +1,130 @@
+"""
+JSON响应压缩
+
+按请求的Accept-Encoding协商压缩方式：安装了brotli时优先使用br，否则使用gzip；
+小于COMPRESSION_MIN_LENGTH字节的响应不压缩（压缩收益抵不过CPU开销）。
+压缩级别可以按接口（url name）在COMPRESSION_LEVELS中配置，未配置的接口使用DEFAULT_COMPRESSION_LEVELS。
+
+热门且内容未变化的页面（如商品列表第一页、活动图）每次请求的响应体相同，
+压缩结果按（响应体MD5、压缩方式、级别）保存在当前worker的LRU缓存中，
+相同响应体直接复用压缩结果；计算MD5的开销远小于重新压缩。
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时只使用gzip
+    brotli = None
+
+COMPRESSION_MIN_LENGTH = getattr(settings, 'COMPRESSION_MIN_LENGTH', 1024)
+# 默认压缩级别：br为quality（0-11），gzip为compresslevel（1-9）
+DEFAULT_COMPRESSION_LEVELS = {'br': 4, 'gzip': 6}
+# url name -> {'br': 级别, 'gzip': 级别}，级别为0表示该接口不使用这种压缩方式
+COMPRESSION_LEVELS = getattr(settings, 'COMPRESSION_LEVELS', {})
+# 每个worker的压缩结果缓存上限（字节）
+COMPRESSION_CACHE_MAX_BYTES = getattr(settings, 'COMPRESSION_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+# 需要压缩的Content-Type前缀
+COMPRESSIBLE_CONTENT_TYPES = ('application/json', 'text/')
+
+
+def supported_encodings():
+    """服务端支持的压缩方式，按优先级排列"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """解析Accept-Encoding，返回{压缩方式: q值}"""
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def choose_encoding(header, levels):
+    """
+    根据Accept-Encoding和接口的压缩级别选择压缩方式，无可用方式时返回None
+    q值相同时按supported_encodings的顺序优先
+    """
+    weights = parse_accept_encoding(header)
+    best = None
+    best_q = 0.0
+    for encoding in supported_encodings():
+        if not levels.get(encoding):
+            continue
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def get_compression_levels(url_name):
+    levels = dict(DEFAULT_COMPRESSION_LEVELS)
+    levels.update(COMPRESSION_LEVELS.get(url_name, {}))
+    return levels
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    # mtime=0：相同响应体的压缩结果完全相同
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+compressed_cache = OrderedDict()
+compressed_cache_bytes = 0
+cache_lock = threading.Lock()
+compression_stats = {'compressed': 0, 'cache_hits': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+
+def get_compressed(body, encoding, level):
+    """返回压缩后的响应体，优先复用缓存中的压缩结果"""
+    global compressed_cache_bytes
+    key = (hashlib.md5(body).digest(), len(body), encoding, level)
+    with cache_lock:
+        compressed = compressed_cache.get(key)
+        if compressed is not None:
+            compressed_cache.move_to_end(key)
+            compression_stats['cache_hits'] += 1
+            compression_stats['bytes_in'] += len(body)
+            compression_stats['bytes_out'] += len(compressed)
+            return compressed
+
+    compressed = compress(body, encoding, level)
+    with cache_lock:
+        compression_stats['compressed'] += 1
+        compression_stats['bytes_in'] += len(body)
+        compression_stats['bytes_out'] += len(compressed)
+        if key not in compressed_cache and len(compressed) <= COMPRESSION_CACHE_MAX_BYTES:
+            compressed_cache[key] = compressed
+            compressed_cache_bytes += len(compressed)
+            # 超出上限时淘汰最久未使用的结果
+            while compressed_cache_bytes > COMPRESSION_CACHE_MAX_BYTES:
+                _, evicted = compressed_cache.popitem(last=False)
+                compressed_cache_bytes -= len(evicted)
+    return compressed
+
+
+def get_compression_stats():
+    """当前worker的压缩统计"""
+    with cache_lock:
+        stats = dict(compression_stats)
+        stats['cached_entries'] = len(compressed_cache)
+        stats['cached_bytes'] = compressed_cache_bytes
+    stats['encodings'] = list(supported_encodings())
+    return stats
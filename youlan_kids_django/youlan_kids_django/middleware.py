@@ -2,8 +2,15 @@ from django.http import HttpResponse, JsonResponse
 from django.db import DatabaseError
 from django.conf import settings
 from access_token.models import AccessToken
-from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from access_token.cache import (
+    TOKEN_NOT_FOUND, get_cached_token_ip, cache_token_ip, cache_token_missing, invalidate_token,
+)
+from .compression import (
+    COMPRESSIBLE_CONTENT_TYPES, COMPRESSION_MIN_LENGTH, choose_encoding, get_compressed, get_compression_levels,
+)
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -138,6 +145,46 @@ class CorsMiddleware:
         
         return response
 
+class CompressionMiddleware:
+    """按Accept-Encoding压缩JSON等文本响应，压缩方式和级别见compression模块"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < COMPRESSION_MIN_LENGTH
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_CONTENT_TYPES)
+        ):
+            return response
+
+        # 响应内容随Accept-Encoding变化，缓存代理需要区分
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        levels = get_compression_levels(resolver_match.url_name if resolver_match else None)
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), levels)
+        if encoding is None:
+            return response
+
+        body = response.content
+        compressed = get_compressed(body, encoding, levels[encoding])
+        if len(compressed) >= len(body):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # 压缩后字节不同，强ETag改为弱ETag（与django GZipMiddleware一致），条件请求按弱比较匹配
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
 class AccessTokenMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -148,12 +195,13 @@ class AccessTokenMiddleware:
             '/access_token/get_token',
             '/access_token/get_ips'
         ]
+        # 豁免路径前缀预编译为一个正则，每个请求只做一次匹配
+        self.exempt_path_pattern = re.compile('|'.join(re.escape(path) for path in self.exempt_paths))
 
     def __call__(self, request):
         # 检查是否为豁免路径
-        for path in self.exempt_paths:
-            if request.path.startswith(path):
-                return self.get_response(request)
+        if self.exempt_path_pattern.match(request.path):
+            return self.get_response(request)
         
         # 从GET或POST参数中获取access_token
         access_token = request.GET.get('access_token') or request.POST.get('access_token')
@@ -166,18 +214,23 @@ class AccessTokenMiddleware:
             }, status=401)
 
         try:
-            # 尝试从缓存获取token信息
-            cache_key = f'token_{access_token}'
-            cached_token = cache.get(cache_key)
+            # 依次从进程内缓存和共享缓存获取token信息
+            cached_token = get_cached_token_ip(access_token)
             
-            if cached_token:
+            if cached_token == TOKEN_NOT_FOUND:
+                # 负缓存命中：token近期已确认不存在，直接拒绝，不再查库
+                return JsonResponse({
+                    'code': 401,
+                    'message': 'Invalid access token'
+                }, status=401)
+            elif cached_token:
                 token_ip = cached_token
             else:
                 # 从数据库查询有效的token
                 token_obj = AccessToken.objects.get(access_token=access_token)
                 token_ip = token_obj.ip_address
                 # 将token信息存入缓存，过期时间设为10分钟
-                cache.set(cache_key, token_ip, 600)
+                cache_token_ip(access_token, token_ip)
             
             # 获取请求IP地址（支持代理）
             x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR', '')
@@ -189,8 +242,8 @@ class AccessTokenMiddleware:
             # 验证IP是否与token绑定
             if token_ip != ip_address:
                 logger.warning(f'IP验证失败: token绑定IP={token_ip}, 请求IP={ip_address}')
-                # 清除缓存中的无效token
-                cache.delete(cache_key)
+                # 清除缓存中的无效token（共享缓存，对所有worker生效）
+                invalidate_token(access_token)
                 return JsonResponse({
                     'code': 401,
                     'message': 'IP address does not match token'
@@ -198,6 +251,8 @@ class AccessTokenMiddleware:
                 
         except AccessToken.DoesNotExist:
             logger.warning(f'无效的access_token: {access_token}')
+            # 写入负缓存，短时间内同一个无效token不再查库
+            cache_token_missing(access_token)
             return JsonResponse({
                 'code': 401,
                 'message': 'Invalid access token'
@@ -29,12 +29,36 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-m89*e)$=h*0a#6!$=e+r@
 # 安全警告：生产环境必须关闭DEBUG
 DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
+# 缓存配置
+# 默认使用进程内的LocMemCache，本地调试、运行测试和执行管理命令都不依赖外部服务。
+# gunicorn多worker部署时必须使用共享缓存，否则每个worker各自缓存、各自失效：docker-compose通过
+# CACHE_BACKEND/CACHE_LOCATION切换到memcached服务，incr是原子操作，数据表版本号（table_versions）
+# 在多个worker并发递增时不会丢失；只在内存不足时按LRU淘汰，常用的版本号和token不会被随机清理。
+# 也可以切换为文件缓存，例如 CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# CACHE_LOCATION=/tmp/youlan_kids_cache；文件缓存的incr不是原子操作，不要在多worker的生产环境使用。
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'youlan_kids'),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 600)),
     }
 }
+if 'memcached' not in CACHES['default']['BACKEND']:
+    # 文件缓存/LocMemCache默认只保留300条，超出后随机删除三分之一（包括永久保存的版本号和已签收物流），调高上限
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 100000))}
+
+# 响应压缩：不小于COMPRESSION_MIN_LENGTH字节的JSON响应按Accept-Encoding使用br（需安装brotli）或gzip压缩
+COMPRESSION_MIN_LENGTH = int(os.environ.get('COMPRESSION_MIN_LENGTH', 1024))
+# 按url name配置压缩级别（br: 0-11，gzip: 1-9），未配置的接口使用默认级别br 4 / gzip 6，级别为0表示不使用该方式
+# 商品列表、活动图的热门页面压缩结果会被复用，可以使用较高级别；订单查询按用户返回、很少重复，使用较低级别
+COMPRESSION_LEVELS = {
+    'goods_query': {'br': 6, 'gzip': 6},
+    'batch_query_activity_images': {'br': 6, 'gzip': 6},
+    'batch_orders_query': {'br': 3, 'gzip': 4},
+}
+
+# access_token缓存使用的缓存别名
+ACCESS_TOKEN_CACHE_ALIAS = os.environ.get('ACCESS_TOKEN_CACHE_ALIAS', 'default')
 
 # 添加日志配置
 LOGGING = {
@@ -93,16 +117,21 @@ CORS_ALLOW_HEADERS = ['accept',
                     'authorization',
                     'content-type',
                     'dnt',
+                    'if-none-match',
                     'origin',
                     'user-agent',
                     'x-csrftoken',
                     'x-requested-with',]
+# 条件请求：浏览器端需要读取ETag响应头
+CORS_EXPOSE_HEADERS = ['etag']
 CORS_MAX_AGE = 86400
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALWAYS_SEND_ORIGIN = True
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    # 需要在读写响应体的中间件之前，最后处理响应
+    'youlan_kids_django.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -0,0 +1,108 @@
+"""
+数据版本号与条件请求
+
+按数据集（如商品目录、款式数据、活动图）在共享缓存中保存版本号，
+相关表写入后（post_save/post_delete信号或批量写入后手动调用）递增。
+
+etag_from_versions根据版本号、请求地址和请求体生成ETag，不需要执行视图或计算响应体的哈希：
+客户端携带的If-None-Match与ETag一致时直接返回304。
+Go服务等绕过Django的写入不会递增版本号，ETag中加入按ETAG_MAX_AGE秒滚动的时间段，
+每个时间段结束后客户端都会重新下载一次完整响应。
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+# ETag的最长有效时间（秒），与商品目录快照的最长使用时间一致
+ETAG_MAX_AGE = getattr(settings, 'ETAG_MAX_AGE', 300)
+
+
+def get_version_cache():
+    return caches[getattr(settings, 'TABLE_VERSION_CACHE_ALIAS', 'default')]
+
+
+def version_key(name):
+    return f'table_version_{name}'
+
+
+def initial_version():
+    # 缓存被清空或首次使用：以当前时间作为初始版本，保证与之前的版本号都不相同
+    return int(time.time() * 1000)
+
+
+def get_versions(*names):
+    """返回{数据集: 版本号}，缺失的版本号会被初始化"""
+    cache = get_version_cache()
+    keys = {version_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    for key in keys:
+        if key not in found:
+            cache.add(key, initial_version(), None)
+            found[key] = cache.get(key)
+    return {name: found[key] for key, name in keys.items()}
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def increment_version(name):
+    cache = get_version_cache()
+    try:
+        cache.incr(version_key(name))
+    except ValueError:
+        cache.add(version_key(name), initial_version(), None)
+
+
+def bump_version(name):
+    """递增版本号；在事务中调用时等事务提交后再递增，避免其他worker读到提交前的数据"""
+    transaction.on_commit(lambda: increment_version(name))
+
+
+def compute_etag(request, names):
+    versions = get_versions(*names)
+    parts = [
+        request.method,
+        request.build_absolute_uri(),
+        ','.join(f'{name}:{versions[name]}' for name in names),
+        str(int(time.time() // ETAG_MAX_AGE)),
+    ]
+    digest = hashlib.md5('|'.join(parts).encode('utf-8'))
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def etag_from_versions(*names):
+    """
+    视图装饰器，用于响应内容只取决于请求参数和names对应数据集的读接口
+    支持POST接口（请求参数在请求体中），客户端在If-None-Match中带上次响应的ETag即可
+    只有HTTP状态码为200的响应带ETag，视图的错误响应必须返回对应的非200状态码，否则临时错误会被客户端缓存
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            etag = quote_etag(compute_etag(request, names))
+            # 弱比较：压缩后的响应返回的是弱ETag（W/前缀）
+            client_etags = [
+                tag[2:] if tag.startswith('W/') else tag
+                for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            ]
+            if etag in client_etags:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                # 客户端可以缓存，但每次使用前需要携带ETag重新验证
+                response['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
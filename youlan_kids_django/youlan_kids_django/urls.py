@@ -16,6 +16,7 @@ urlpatterns = [
     path('activity/', include('activity.urls')),
     path('address/', include('address.urls')),
     path('cart/', include('cart.urls')),
+    path('finance/', include('finance.urls')),
 
 ]
 